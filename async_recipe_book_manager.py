@@ -0,0 +1,255 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+import firebase_admin
+from firebase_admin import credentials, firestore_async
+from google.api_core.exceptions import AlreadyExists
+
+from recipe_book_manager import MAX_ID_ALLOCATION_ATTEMPTS, SUMMARY_FIELDS, RecipeBookManager
+from recipe_storage import (GET_ALL_CHUNK_SIZE, WRITE_BATCH_SIZE, PreconditionFailedError, chunked,
+                            recipe_id_prefix_query)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRecipeBookManager:
+    """RecipeBookManager's API as coroutines on the Firestore AsyncClient.
+
+    Independent reads are issued together with asyncio.gather, so one
+    event loop can serve many users without a thread per request. This
+    class always talks to Firestore; use RecipeBookManager with a storage
+    engine for offline work.
+    """
+
+    def __init__(self, credentials_path: str):
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(credentials_path)
+            firebase_admin.initialize_app(cred)
+
+        self.db = firestore_async.client()
+        self.recipes_ref = self.db.collection('recipes')
+        self.favorites_ref = self.db.collection('favorites')
+
+    @staticmethod
+    def _to_dict(doc) -> Dict:
+        data = doc.to_dict()
+        data['id'] = doc.id
+        return data
+
+    @classmethod
+    def _to_versioned_dict(cls, doc) -> Dict:
+        data = cls._to_dict(doc)
+        data['updateTime'] = doc.update_time
+        return data
+
+    def _recipes_query(self, user_id: str, category: str = None, tag: str = None):
+        query = self.recipes_ref.where('userId', '==', user_id)
+        if category:
+            query = query.where('category', '==', category)
+        if tag:
+            query = query.where('tags', 'array_contains', tag)
+        return query
+
+    async def _get_all(self, collection_ref, doc_ids: List[str],
+                       field_paths: List[str] = None) -> Dict[str, Dict]:
+        """Batched get_all() with every chunk in flight at once"""
+        async def fetch_chunk(chunk: List[str]) -> List[Dict]:
+            refs = [collection_ref.document(doc_id) for doc_id in chunk]
+            return [self._to_versioned_dict(doc)
+                    async for doc in self.db.get_all(refs, field_paths=field_paths)
+                    if doc.exists]
+
+        chunks = list(chunked(list(dict.fromkeys(doc_ids)), GET_ALL_CHUNK_SIZE))
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+        return {doc['id']: doc for chunk in results for doc in chunk}
+
+    async def generate_recipe_id(self, title: str, user_id: str) -> str:
+        base_id = RecipeBookManager.slugify_title(title)
+        prefix_query = recipe_id_prefix_query(self.recipes_ref, base_id)
+        taken_ids = {doc.id async for doc in prefix_query.stream()}
+        return RecipeBookManager.next_free_id(base_id, taken_ids)
+
+    async def recipe_exists(self, recipe_id: str) -> bool:
+        doc = await self.recipes_ref.document(recipe_id).get(field_paths=[])
+        return doc.exists
+
+    async def create_recipe(self, user_id: str, title: str, description: str,
+                            prep_time: int, cook_time: int, servings: int,
+                            ingredients: List[str], instructions: List[str],
+                            category: str, tags: List[str] = None) -> str:
+        recipe_data = {
+            'title': title,
+            'description': description,
+            'prepTime': prep_time,
+            'cookTime': cook_time,
+            'servings': servings,
+            'ingredients': ingredients,
+            'instructions': instructions,
+            'category': category,
+            'tags': tags or [],
+            'userId': user_id,
+            'createdAt': firestore_async.SERVER_TIMESTAMP
+        }
+
+        for attempt in range(MAX_ID_ALLOCATION_ATTEMPTS):
+            recipe_id = await self.generate_recipe_id(title, user_id)
+            try:
+                await self.recipes_ref.document(recipe_id).create(recipe_data)
+                return recipe_id
+            except AlreadyExists:
+                if attempt == MAX_ID_ALLOCATION_ATTEMPTS - 1:
+                    raise
+
+    async def get_recipe(self, recipe_id: str) -> Optional[Dict]:
+        doc = await self.recipes_ref.document(recipe_id).get()
+        return self._to_versioned_dict(doc) if doc.exists else None
+
+    async def _owner_transaction(self, recipe_id: str, user_id: str,
+                                 expected_update_time: Optional[datetime], apply) -> bool:
+        recipe_ref = self.recipes_ref.document(recipe_id)
+
+        @firestore_async.async_transactional
+        async def run(transaction):
+            snapshot = await recipe_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get('userId') != user_id:
+                return False
+            if expected_update_time is not None and snapshot.update_time != expected_update_time:
+                raise PreconditionFailedError(recipe_id)
+            apply(transaction, recipe_ref)
+            return True
+
+        return await run(self.db.transaction())
+
+    async def update_recipe(self, recipe_id: str, user_id: str,
+                            expected_update_time: datetime = None, **updates) -> bool:
+        try:
+            return await self._owner_transaction(
+                recipe_id, user_id, expected_update_time,
+                lambda transaction, recipe_ref: transaction.update(recipe_ref, updates))
+        except Exception:
+            return False
+
+    async def delete_recipe(self, recipe_id: str, user_id: str,
+                            expected_update_time: datetime = None) -> bool:
+        try:
+            deleted = await self._owner_transaction(
+                recipe_id, user_id, expected_update_time,
+                lambda transaction, recipe_ref: transaction.delete(recipe_ref))
+        except Exception:
+            return False
+
+        if deleted:
+            # The recipe is gone either way; favorites left behind are
+            # orphans that RecipeBookManager.sweep_orphan_favorites removes
+            try:
+                await self._delete_favorites_for_recipe(recipe_id)
+            except Exception:
+                logger.exception("Could not remove the favorites of deleted recipe %s", recipe_id)
+        return deleted
+
+    async def _delete_favorites_for_recipe(self, recipe_id: str) -> int:
+        query = self.favorites_ref.where('recipeId', '==', recipe_id).select([])
+        refs = [doc.reference async for doc in query.stream()]
+
+        async def commit(chunk) -> None:
+            batch = self.db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            await batch.commit()
+
+        await asyncio.gather(*(commit(chunk) for chunk in chunked(refs, WRITE_BATCH_SIZE)))
+        return len(refs)
+
+    async def get_user_recipes(self, user_id: str, category: str = None,
+                               tag: str = None, summary: bool = False) -> List[Dict]:
+        query = self._recipes_query(user_id, category, tag)
+        if summary:
+            query = query.select(SUMMARY_FIELDS)
+        return [self._to_dict(doc) async for doc in query.stream()]
+
+    async def count_user_recipes(self, user_id: str, category: str = None, tag: str = None) -> int:
+        result = await self._recipes_query(user_id, category, tag).count().get()
+        return int(result[0][0].value)
+
+    async def search_recipes_by_title(self, user_id: str, search_term: str) -> List[Dict]:
+        """Match on a titles-only query, then fetch just the matching recipes"""
+        search_term_lower = search_term.lower()
+        query = self.recipes_ref.where('userId', '==', user_id).select(['title'])
+        matching_ids = sorted([
+            doc.id async for doc in query.stream()
+            if search_term_lower in (doc.get('title') or '').lower()
+        ])
+        recipes = await self._get_all(self.recipes_ref, matching_ids)
+        return [recipes[recipe_id] for recipe_id in matching_ids if recipe_id in recipes]
+
+    async def add_to_favorites(self, recipe_id: str, user_id: str, notes: str = "") -> bool:
+        try:
+            recipe_exists, already_favorited = await asyncio.gather(
+                self.recipe_exists(recipe_id),
+                self.is_favorited(recipe_id, user_id),
+            )
+            if not recipe_exists or already_favorited:
+                return False
+
+            favorite_data = {
+                'recipeId': recipe_id,
+                'userId': user_id,
+                'notes': notes,
+                'addedDate': firestore_async.SERVER_TIMESTAMP
+            }
+            favorite_id = RecipeBookManager.favorite_id(recipe_id, user_id)
+            await self.favorites_ref.document(favorite_id).set(favorite_data)
+            return True
+        except Exception:
+            return False
+
+    async def remove_from_favorites(self, recipe_id: str, user_id: str) -> bool:
+        try:
+            favorite_ref = self.favorites_ref.document(RecipeBookManager.favorite_id(recipe_id, user_id))
+            if (await favorite_ref.get(field_paths=[])).exists:
+                await favorite_ref.delete()
+                return True
+            return False
+        except Exception:
+            return False
+
+    async def is_favorited(self, recipe_id: str, user_id: str) -> bool:
+        favorite_ref = self.favorites_ref.document(RecipeBookManager.favorite_id(recipe_id, user_id))
+        return (await favorite_ref.get(field_paths=[])).exists
+
+    async def get_favorite_ids(self, user_id: str) -> Set[str]:
+        query = self.favorites_ref.where('userId', '==', user_id).select(['recipeId'])
+        return {doc.get('recipeId') async for doc in query.stream()}
+
+    async def are_favorited(self, recipe_ids: Iterable[str], user_id: str) -> Set[str]:
+        favorite_ids = {RecipeBookManager.favorite_id(recipe_id, user_id): recipe_id
+                        for recipe_id in recipe_ids}
+        found = await self._get_all(self.favorites_ref, list(favorite_ids), field_paths=['recipeId'])
+        return {favorite_ids[favorite_id] for favorite_id in found}
+
+    async def count_user_favorites(self, user_id: str) -> int:
+        result = await self.favorites_ref.where('userId', '==', user_id).count().get()
+        return int(result[0][0].value)
+
+    async def get_user_favorites(self, user_id: str) -> List[Dict]:
+        query = self.favorites_ref.where('userId', '==', user_id)
+        fav_entries = [doc.to_dict() async for doc in query.stream()]
+        recipes = await self._get_all(self.recipes_ref, [fav['recipeId'] for fav in fav_entries])
+
+        favorites = []
+        for fav_data in fav_entries:
+            recipe = recipes.get(fav_data['recipeId'])
+            if recipe:
+                recipe['favoriteNotes'] = fav_data.get('notes', '')
+                recipe['favoritedDate'] = fav_data.get('addedDate')
+                favorites.append(recipe)
+
+        return favorites
+
+    async def toggle_favorite(self, recipe_id: str, user_id: str) -> bool:
+        if await self.is_favorited(recipe_id, user_id):
+            return await self.remove_from_favorites(recipe_id, user_id)
+        else:
+            return await self.add_to_favorites(recipe_id, user_id)
@@ -0,0 +1,225 @@
+import bisect
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Completions cached at every trie node; also the most complete() returns
+TOP_COMPLETIONS = 10
+
+# (-score, text, value) as cached at each node: plain tuple order puts the
+# best completion first, ties broken by text
+Completion = Tuple[float, str, str]
+
+
+class _Node:
+    __slots__ = ('label', 'edges', 'entries', 'top')
+
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.edges: Dict[str, '_Node'] = {}
+        # value -> (score, text) of the keys ending at this node
+        self.entries: Dict[str, Tuple[float, str]] = {}
+        self.top: List[Completion] = []
+
+
+class PrefixTrie:
+    """Radix trie whose nodes cache their best TOP_COMPLETIONS completions.
+
+    Chains of single-child nodes are merged into one edge, so the trie
+    stays small for long keys such as titles. Every node keeps the
+    highest-scoring entries of its subtree, one per value even when the
+    value is stored under several keys; a lookup walks the prefix and
+    returns that list, so it costs the same however many keys sit below.
+    Writes refresh the caches along the key's path only.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def _path(self, key: str, create: bool) -> Optional[List[_Node]]:
+        """Nodes from the root to the node for key, splitting edges as needed"""
+        node = self._root
+        path = [node]
+        remaining = key
+        while remaining:
+            child = node.edges.get(remaining[0])
+            if child is None:
+                if not create:
+                    return None
+                child = node.edges[remaining[0]] = _Node(remaining)
+                path.append(child)
+                return path
+
+            common = 0
+            limit = min(len(child.label), len(remaining))
+            while common < limit and child.label[common] == remaining[common]:
+                common += 1
+
+            if common < len(child.label):
+                if not create:
+                    return None
+                middle = _Node(child.label[:common])
+                child.label = child.label[common:]
+                middle.edges[child.label[0]] = child
+                middle.top = list(child.top)
+                node.edges[remaining[0]] = middle
+                child = middle
+
+            node = child
+            path.append(node)
+            remaining = remaining[common:]
+        return path
+
+    @staticmethod
+    def _refresh(node: _Node) -> None:
+        best: Dict[str, Completion] = {}
+        candidates = [(-score, text, value) for value, (score, text) in node.entries.items()]
+        for child in node.edges.values():
+            candidates.extend(child.top)
+        for completion in candidates:
+            value = completion[2]
+            if value not in best or completion < best[value]:
+                best[value] = completion
+        node.top = heapq.nsmallest(TOP_COMPLETIONS, best.values())
+
+    def insert(self, key: str, value: str, score: float, text: str) -> None:
+        """Store value under key, or change its score and text if already there"""
+        path = self._path(key, create=True)
+        node = path[-1]
+        replaced = value in node.entries
+        node.entries[value] = (score, text)
+
+        if replaced:
+            for node in reversed(path):
+                self._refresh(node)
+            return
+
+        # A new entry can only push others down, so each cache on the path
+        # just has to take it in if it ranks high enough, in place of the
+        # value's own completion under another key if it beats that
+        completion = (-score, text, value)
+        for node in path:
+            current = next((cached for cached in node.top if cached[2] == value), None)
+            if current is not None:
+                if completion < current:
+                    node.top.remove(current)
+                    bisect.insort(node.top, completion)
+            elif len(node.top) < TOP_COMPLETIONS or completion < node.top[-1]:
+                bisect.insort(node.top, completion)
+                del node.top[TOP_COMPLETIONS:]
+
+    def remove(self, key: str, value: str) -> None:
+        path = self._path(key, create=False)
+        if path is None or value not in path[-1].entries:
+            return
+        del path[-1].entries[value]
+
+        # Drop the node if nothing is left under it, then fold a parent left
+        # with one child and no entries of its own into that child
+        node = path[-1]
+        if not node.entries and not node.edges and len(path) > 1:
+            del path[-2].edges[node.label[0]]
+            path.pop()
+        node = path[-1]
+        if not node.entries and len(node.edges) == 1 and len(path) > 1:
+            (child,) = node.edges.values()
+            child.label = node.label + child.label
+            path[-2].edges[child.label[0]] = child
+            path[-1] = child
+
+        for node in reversed(path):
+            self._refresh(node)
+
+    def complete(self, prefix: str, limit: int = TOP_COMPLETIONS) -> List[Completion]:
+        """Best-scoring entries whose key starts with prefix, best first"""
+        node = self._root
+        remaining = prefix
+        while remaining:
+            child = node.edges.get(remaining[0])
+            if child is None:
+                return []
+            if child.label.startswith(remaining):
+                node = child
+                break
+            if not remaining.startswith(child.label):
+                return []
+            remaining = remaining[len(child.label):]
+            node = child
+        return node.top[:limit]
+
+
+def recency(created) -> float:
+    """Sort key for a recipe's 'createdAt'; not-yet-resolved server timestamps count as now"""
+    if isinstance(created, datetime):
+        return created.timestamp()
+    return time.time()
+
+
+class AutocompleteIndex:
+    """Prefix completions over one user's recipe IDs, titles, tags and categories.
+
+    IDs and titles complete to recipes, newest first; tags and categories
+    complete to themselves, most used first.
+    """
+
+    def __init__(self):
+        self._recipes = PrefixTrie()
+        self._labels = PrefixTrie()
+        self._entries: Dict[str, Tuple[str, float, List[str]]] = {}
+        self._label_counts: Dict[str, int] = {}
+        self._label_texts: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._entries
+
+    def add(self, recipe_id: str, title: str, tags: Iterable[str], category: str,
+            created=None) -> None:
+        """Index a recipe, replacing any previous entry for recipe_id"""
+        self.remove(recipe_id)
+        score = recency(created)
+        labels = {}
+        for label in list(tags) + [category or '']:
+            if label.strip():
+                labels.setdefault(label.strip().lower(), label.strip())
+        self._entries[recipe_id] = (title, score, list(labels))
+
+        self._recipes.insert(recipe_id.lower(), recipe_id, score, recipe_id)
+        if title.strip():
+            self._recipes.insert(title.strip().lower(), recipe_id, score, title)
+        for key, text in labels.items():
+            self._label_texts.setdefault(key, text)
+            self._label_counts[key] = self._label_counts.get(key, 0) + 1
+            self._labels.insert(key, key, self._label_counts[key], self._label_texts[key])
+
+    def remove(self, recipe_id: str) -> None:
+        entry = self._entries.pop(recipe_id, None)
+        if entry is None:
+            return
+        title, _, labels = entry
+
+        self._recipes.remove(recipe_id.lower(), recipe_id)
+        if title.strip():
+            self._recipes.remove(title.strip().lower(), recipe_id)
+        for key in labels:
+            self._label_counts[key] -= 1
+            if self._label_counts[key]:
+                self._labels.insert(key, key, self._label_counts[key], self._label_texts[key])
+            else:
+                del self._label_counts[key]
+                del self._label_texts[key]
+                self._labels.remove(key, key)
+
+    def complete_recipes(self, prefix: str, limit: int = 5) -> List[Tuple[str, str]]:
+        """(recipe ID, title) of the newest recipes whose ID or title starts with prefix"""
+        return [(recipe_id, self._entries[recipe_id][0])
+                for _, _, recipe_id in self._recipes.complete(prefix.lower(), limit)
+                if recipe_id in self._entries]
+
+    def complete_labels(self, prefix: str, limit: int = 5) -> List[str]:
+        """The most used tags and categories starting with prefix"""
+        return [text for _, text, _ in self._labels.complete(prefix.lower(), limit)]
@@ -0,0 +1,149 @@
+import hashlib
+import random
+from typing import Dict, Iterable, List, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pantry_index import TOKEN_PATTERN, ingredient_key
+
+
+NUM_PERMUTATIONS = 64
+
+# 16 bands of 4 rows: pairs with Jaccard similarity around 0.5 and above
+# share at least one band with high probability.
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+DEFAULT_DUPLICATE_THRESHOLD = 0.6
+
+# Largest prime below 2**32: with 32-bit shingle hashes, (a * x + b) mod p
+# never overflows uint64.
+_PRIME = 4294967291
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures are comparable across runs
+_rng = random.Random(20240521)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(NUM_PERMUTATIONS)]
+
+if np is not None:
+    _A = np.array([a for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+
+
+def recipe_shingles(title: str, ingredients: Iterable[str]) -> Set[str]:
+    """Normalised title words and ingredient names, tagged by source"""
+    shingles = {'t:' + token for token in TOKEN_PATTERN.findall((title or '').lower())}
+    for line in ingredients:
+        key = ingredient_key(line)
+        if key:
+            shingles.add('i:' + key)
+    return shingles
+
+
+def _shingle_hash(shingle: str) -> int:
+    # Python's hash() of a str changes between processes; this does not
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'big')
+
+
+def minhash_signature(shingles: Iterable[str]) -> Tuple[int, ...]:
+    """Minimum of every permutation over the shingle hashes, all permutations at once"""
+    if np is None:
+        raise ImportError("Duplicate detection requires numpy: pip install numpy")
+    hashes = np.array([_shingle_hash(shingle) for shingle in shingles], dtype=np.uint64)
+    if not hashes.size:
+        return (_MAX_HASH,) * NUM_PERMUTATIONS
+    return tuple(((_A * hashes + _B) % np.uint64(_PRIME)).min(axis=1).tolist())
+
+
+def signature_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity: the fraction of positions that agree"""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_PERMUTATIONS
+
+
+class DuplicateIndex:
+    """MinHash signatures of one user's recipes, bucketed by LSH bands.
+
+    A lookup only compares signatures with recipes sharing at least one
+    band bucket, so finding near-duplicates of a recipe does not scan the
+    library.
+    """
+
+    def __init__(self):
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._signatures
+
+    @staticmethod
+    def _bands(signature: Tuple[int, ...]):
+        for band in range(LSH_BANDS):
+            yield band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+
+    def add(self, recipe_id: str, title: str, ingredients: Iterable[str]) -> None:
+        """Index a recipe, replacing any previous entry for recipe_id"""
+        self.remove(recipe_id)
+        signature = minhash_signature(recipe_shingles(title, ingredients))
+        self._signatures[recipe_id] = signature
+        for bucket in self._bands(signature):
+            self._buckets.setdefault(bucket, set()).add(recipe_id)
+
+    def remove(self, recipe_id: str) -> None:
+        signature = self._signatures.pop(recipe_id, None)
+        if signature is None:
+            return
+        for bucket in self._bands(signature):
+            ids = self._buckets.get(bucket)
+            if ids is not None:
+                ids.discard(recipe_id)
+                if not ids:
+                    del self._buckets[bucket]
+
+    def _candidates(self, signature: Tuple[int, ...], threshold: float,
+                    exclude: str = None) -> List[Tuple[str, float]]:
+        candidate_ids = set()
+        for bucket in self._bands(signature):
+            candidate_ids.update(self._buckets.get(bucket, ()))
+        candidate_ids.discard(exclude)
+
+        matches = []
+        for recipe_id in candidate_ids:
+            similarity = signature_similarity(signature, self._signatures[recipe_id])
+            if similarity >= threshold:
+                matches.append((recipe_id, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches
+
+    def similar_to(self, title: str, ingredients: Iterable[str],
+                   threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> List[Tuple[str, float]]:
+        """(recipe ID, estimated similarity) of likely duplicates, most similar first"""
+        signature = minhash_signature(recipe_shingles(title, ingredients))
+        return self._candidates(signature, threshold)
+
+    def duplicate_groups(self, threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> List[List[str]]:
+        """Recipes linked by similarity >= threshold, as sorted groups of IDs"""
+        parents = {}
+
+        def find(recipe_id: str) -> str:
+            root = recipe_id
+            while parents.get(root, root) != root:
+                root = parents[root]
+            parents[recipe_id] = root
+            return root
+
+        for recipe_id, signature in self._signatures.items():
+            for other_id, _ in self._candidates(signature, threshold, exclude=recipe_id):
+                parents[find(other_id)] = find(recipe_id)
+
+        groups: Dict[str, List[str]] = {}
+        for recipe_id in parents:
+            groups.setdefault(find(recipe_id), []).append(recipe_id)
+        return sorted((sorted(ids) for ids in groups.values() if len(ids) > 1),
+                      key=lambda ids: ids[0])
@@ -0,0 +1,102 @@
+import json
+import os
+import time
+from typing import Callable, Dict
+
+from recipe_storage import StorageEngine
+
+
+class FavoritesSweeper:
+    """Deletes favorites whose recipe no longer exists.
+
+    The favorites collection is scanned in ID order one page at a time.
+    Each page costs one batched existence check for its recipes and one
+    batched delete for its orphans. With a checkpoint_path, the cursor and
+    running totals are saved after every page, so an interrupted sweep
+    carries on where it stopped. The checkpoint is removed once the sweep
+    reaches the end.
+    """
+
+    def __init__(self, storage: StorageEngine, checkpoint_path: str = None,
+                 page_size: int = 500):
+        self.storage = storage
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size
+
+    def _load_checkpoint(self) -> Dict:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as checkpoint_file:
+                return json.load(checkpoint_file)
+        return {'cursor': None, 'scanned': 0, 'removed': 0}
+
+    def _save_checkpoint(self, checkpoint: Dict) -> None:
+        if not self.checkpoint_path:
+            return
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _clear_checkpoint(self) -> None:
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def run(self, max_pages: int = None,
+            progress: Callable[[Dict], None] = None) -> Dict:
+        """Sweep until the end of the collection or max_pages pages.
+
+        Returns (and passes to progress after each page) a report with the
+        rows scanned and removed in this run, their per-second rates, the
+        totals since the sweep began, and whether the sweep is complete.
+        """
+        checkpoint = self._load_checkpoint()
+        started = time.monotonic()
+        scanned = removed = pages = 0
+        complete = False
+
+        while max_pages is None or pages < max_pages:
+            page = self.storage.page_favorites(self.page_size, start_after=checkpoint['cursor'])
+            if not page:
+                complete = True
+                break
+
+            existing = self.storage.existing_recipe_ids([fav['recipeId'] for fav in page])
+            orphan_ids = [fav['id'] for fav in page if fav['recipeId'] not in existing]
+            if orphan_ids:
+                self.storage.delete_favorites(orphan_ids)
+
+            pages += 1
+            scanned += len(page)
+            removed += len(orphan_ids)
+            checkpoint = {
+                'cursor': page[-1]['id'],
+                'scanned': checkpoint['scanned'] + len(page),
+                'removed': checkpoint['removed'] + len(orphan_ids),
+            }
+            self._save_checkpoint(checkpoint)
+
+            complete = len(page) < self.page_size
+            if progress:
+                progress(self._report(checkpoint, scanned, removed, started, complete))
+            if complete:
+                break
+
+        if complete:
+            self._clear_checkpoint()
+        return self._report(checkpoint, scanned, removed, started, complete)
+
+    @staticmethod
+    def _report(checkpoint: Dict, scanned: int, removed: int,
+                started: float, complete: bool) -> Dict:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        return {
+            'scanned': scanned,
+            'removed': removed,
+            'scannedPerSecond': scanned / elapsed,
+            'removedPerSecond': removed / elapsed,
+            'elapsedSeconds': elapsed,
+            'totalScanned': checkpoint['scanned'],
+            'totalRemoved': checkpoint['removed'],
+            'cursor': checkpoint['cursor'],
+            'complete': complete,
+        }
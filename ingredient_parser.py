@@ -0,0 +1,125 @@
+import re
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+# Distinct raw lines remembered by parse_ingredient
+PARSE_CACHE_SIZE = 65536
+
+# Canonical unit -> spellings accepted in ingredient lines
+UNIT_ALIASES = {
+    'cup': ['cups', 'cup', 'c'],
+    'tbsp': ['tablespoons', 'tablespoon', 'tbsps', 'tbsp', 'tbs', 'tbl'],
+    'tsp': ['teaspoons', 'teaspoon', 'tsps', 'tsp'],
+    'fl oz': ['fluid ounces', 'fluid ounce', 'fl oz', 'fl. oz'],
+    'oz': ['ounces', 'ounce', 'oz'],
+    'lb': ['pounds', 'pound', 'lbs', 'lb'],
+    'g': ['grams', 'gram', 'g'],
+    'kg': ['kilograms', 'kilogram', 'kg'],
+    'ml': ['milliliters', 'millilitres', 'milliliter', 'millilitre', 'ml'],
+    'l': ['liters', 'litres', 'liter', 'litre', 'l'],
+    'pint': ['pints', 'pint', 'pt'],
+    'quart': ['quarts', 'quart', 'qt'],
+    'gallon': ['gallons', 'gallon', 'gal'],
+    'pinch': ['pinches', 'pinch'],
+    'dash': ['dashes', 'dash'],
+    'clove': ['cloves', 'clove'],
+    'can': ['cans', 'can'],
+    'package': ['packages', 'package', 'pkgs', 'pkg'],
+    'slice': ['slices', 'slice'],
+    'stick': ['sticks', 'stick'],
+}
+
+_UNIT_BY_ALIAS = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+
+_UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅕': '1/5',
+    '⅖': '2/5', '⅗': '3/5', '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅛': '1/8',
+    '⅜': '3/8', '⅝': '5/8', '⅞': '7/8',
+}
+
+_UNICODE_FRACTION_PATTERN = re.compile('(\\d?)([' + ''.join(_UNICODE_FRACTIONS) + '])')
+
+# Fractions need a non-zero denominator, and a quantity must not run into
+# more digits or a slash: '1/0 cup' has no quantity rather than a quantity of 1
+_QUANTITY = r'(?:\d+\s+\d+/0*[1-9]\d*|\d+/0*[1-9]\d*|\d*\.\d+|\d+)(?![\d/.])'
+
+# Longest spellings first, so "fl oz" wins over "oz" and "tbsp" over "tbs"
+_UNIT = '|'.join(re.escape(alias) for alias in sorted(_UNIT_BY_ALIAS, key=len, reverse=True))
+
+LINE_PATTERN = re.compile(
+    rf'^(?P<quantity>{_QUANTITY})'
+    rf'(?:\s*(?:-|–|to)\s*(?P<quantity_max>{_QUANTITY}))?'
+    rf'\s*(?:(?P<unit>{_UNIT})\.?(?=[\s,(]|$))?'
+    r'\s*(?:of\s+)?(?P<rest>.*)$',
+    re.IGNORECASE
+)
+
+_PARENTHETICAL_PATTERN = re.compile(r'\s*\(([^)]*)\)')
+
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class ParsedIngredient(NamedTuple):
+    quantity: Optional[float]
+    unit: Optional[str]
+    item: str
+    note: Optional[str]
+    quantity_max: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        """The stored form, named like the other recipe fields"""
+        return {
+            'quantity': self.quantity,
+            'quantityMax': self.quantity_max,
+            'unit': self.unit,
+            'item': self.item,
+            'note': self.note,
+        }
+
+
+def parse_quantity(text: str) -> float:
+    """'2 1/2' -> 2.5, '3/4' -> 0.75, '.5' -> 0.5"""
+    return float(sum(Fraction(part) for part in text.split()))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ingredient(line: str) -> ParsedIngredient:
+    """Split an ingredient line into quantity, unit, item and note.
+
+    "2 1/2 cups all-purpose flour, sifted" gives quantity 2.5, unit 'cup',
+    item 'all-purpose flour' and note 'sifted'. Lines without a leading
+    quantity keep the whole text as the item. Results are cached by line.
+    """
+    text = _UNICODE_FRACTION_PATTERN.sub(
+        lambda match: f"{match.group(1)} {_UNICODE_FRACTIONS[match.group(2)]}", line)
+    notes = _PARENTHETICAL_PATTERN.findall(text)
+    text = _WHITESPACE_PATTERN.sub(' ', _PARENTHETICAL_PATTERN.sub('', text)).strip()
+
+    quantity = quantity_max = unit = None
+    match = LINE_PATTERN.match(text)
+    if match:
+        quantity = parse_quantity(match.group('quantity'))
+        if match.group('quantity_max'):
+            quantity_max = parse_quantity(match.group('quantity_max'))
+        if match.group('unit'):
+            unit = _UNIT_BY_ALIAS[match.group('unit').lower()]
+        text = match.group('rest')
+
+    item, _, trailing_note = text.partition(',')
+    if trailing_note.strip():
+        notes.append(trailing_note.strip())
+
+    return ParsedIngredient(
+        quantity=quantity,
+        unit=unit,
+        item=item.strip(),
+        note=', '.join(notes) or None,
+        quantity_max=quantity_max,
+    )
+
+
+def parse_ingredients(lines: Iterable[str]) -> List[Dict]:
+    """Stored form of each line, as written next to 'ingredients'"""
+    return [parse_ingredient(line).to_dict() for line in lines]
@@ -0,0 +1,110 @@
+import copy
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from recipe_storage import project_fields
+
+
+# A change event: ('ADDED' | 'MODIFIED' | 'REMOVED', document dict with 'id')
+Change = Tuple[str, Dict]
+
+
+class LiveMirror:
+    """Local copy of one user's recipes and favorites.
+
+    The mirror is patched from storage change events (Firestore snapshot
+    listeners), so reads served from it also reflect writes made by other
+    processes.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._recipes: Dict[str, Dict] = {}
+        self._favorites: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._recipes_ready = threading.Event()
+        self._favorites_ready = threading.Event()
+        self._unsubscribes: List[Callable[[], None]] = []
+
+    def add_subscription(self, unsubscribe: Callable[[], None]) -> None:
+        self._unsubscribes.append(unsubscribe)
+
+    def close(self) -> None:
+        for unsubscribe in self._unsubscribes:
+            unsubscribe()
+        self._unsubscribes = []
+
+    def wait_until_ready(self, timeout: float = None) -> bool:
+        """Block until both listeners have delivered their initial snapshot"""
+        return (self._recipes_ready.wait(timeout)
+                and self._favorites_ready.wait(timeout))
+
+    def apply_recipe_changes(self, changes: List[Change]) -> None:
+        with self._lock:
+            for change_type, recipe in changes:
+                if change_type == 'REMOVED':
+                    self._recipes.pop(recipe['id'], None)
+                else:
+                    self._recipes[recipe['id']] = copy.deepcopy(recipe)
+        self._recipes_ready.set()
+
+    def apply_favorite_changes(self, changes: List[Change]) -> None:
+        with self._lock:
+            for change_type, favorite in changes:
+                if change_type == 'REMOVED':
+                    self._favorites.pop(favorite['recipeId'], None)
+                else:
+                    self._favorites[favorite['recipeId']] = copy.deepcopy(favorite)
+        self._favorites_ready.set()
+
+    def get_recipe(self, recipe_id: str) -> Optional[Dict]:
+        with self._lock:
+            recipe = self._recipes.get(recipe_id)
+            return copy.deepcopy(recipe) if recipe is not None else None
+
+    def query_recipes(self, category: str = None, tag: str = None,
+                      start_after: str = None, limit: int = None,
+                      fields: List[str] = None) -> List[Dict]:
+        """Matching recipes in ID order, optionally after an ID and capped at limit"""
+        with self._lock:
+            matches = []
+            for recipe_id in sorted(self._recipes):
+                if limit is not None and len(matches) >= limit:
+                    break
+                if start_after is not None and recipe_id <= start_after:
+                    continue
+                recipe = self._recipes[recipe_id]
+                if category and recipe.get('category') != category:
+                    continue
+                if tag and tag not in recipe.get('tags', []):
+                    continue
+                matches.append(copy.deepcopy(project_fields(recipe, fields)))
+            return matches
+
+    def count_recipes(self, category: str = None, tag: str = None) -> int:
+        with self._lock:
+            return sum(
+                1 for recipe in self._recipes.values()
+                if (not category or recipe.get('category') == category)
+                and (not tag or tag in recipe.get('tags', []))
+            )
+
+    def count_favorites(self) -> int:
+        with self._lock:
+            return len(self._favorites)
+
+    def recipe_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._recipes)
+
+    def is_favorited(self, recipe_id: str) -> bool:
+        with self._lock:
+            return recipe_id in self._favorites
+
+    def favorite_recipe_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._favorites)
+
+    def favorites(self) -> List[Dict]:
+        with self._lock:
+            return [copy.deepcopy(favorite) for _, favorite in sorted(self._favorites.items())]
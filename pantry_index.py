@@ -0,0 +1,134 @@
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from ingredient_parser import parse_ingredient
+
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Words that describe how an ingredient is prepared or sized rather than
+# what it is; "2 large eggs, beaten" and "eggs" both become "egg".
+DESCRIPTOR_WORDS = {
+    'a', 'an', 'and', 'or', 'of', 'to', 'for', 'the', 'taste', 'optional',
+    'fresh', 'freshly', 'large', 'medium', 'small', 'whole', 'extra',
+    'chopped', 'diced', 'minced', 'sliced', 'grated', 'shredded', 'crushed',
+    'ground', 'peeled', 'softened', 'melted', 'beaten', 'sifted', 'packed',
+    'finely', 'roughly', 'thinly', 'cut', 'into', 'pieces', 'divided',
+    'pinch', 'dash', 'warm', 'cold',
+}
+
+# Assumed to be in every kitchen unless assume_staples=False. Unlike pantry
+# entries these only cover ingredients made up of nothing but their words,
+# so "salt and pepper to taste" is on hand but "salt pork" is not, nor
+# "pepper" a red bell pepper.
+PANTRY_STAPLES = {'salt', 'kosher salt', 'sea salt', 'pepper', 'black pepper', 'water'}
+
+_STAPLE_WORDS = {word for staple in PANTRY_STAPLES for word in staple.split()}
+
+
+def _singular(token: str) -> str:
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('oes') and len(token) > 4:
+        return token[:-2]
+    if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def ingredient_key(line: str) -> str:
+    """Normalised ingredient name: '2 large eggs, beaten' -> 'egg'"""
+    item = parse_ingredient(line).item.lower()
+    tokens = [_singular(token) for token in TOKEN_PATTERN.findall(item)
+              if token not in DESCRIPTOR_WORDS]
+    return ' '.join(tokens)
+
+
+class PantryIndex:
+    """Per-recipe bitsets over a vocabulary of ingredient names.
+
+    Each distinct ingredient name gets a bit; a recipe is the OR of its
+    ingredients' bits, held in a Python int. A pantry query turns what the
+    user has into a mask once, after which each recipe costs one AND-NOT
+    and one population count.
+    """
+
+    def __init__(self):
+        self._vocabulary: Dict[str, int] = {}
+        self._terms: List[str] = []
+        # token -> mask of every vocabulary term containing it
+        self._token_masks: Dict[str, int] = {}
+        self._recipe_masks: Dict[str, int] = {}
+        # Bits of every term made only of staple words
+        self._staple_mask = 0
+
+    def __len__(self) -> int:
+        return len(self._recipe_masks)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._recipe_masks
+
+    def _term_bit(self, term: str) -> int:
+        bit = self._vocabulary.get(term)
+        if bit is None:
+            bit = self._vocabulary[term] = len(self._terms)
+            self._terms.append(term)
+            for token in term.split():
+                self._token_masks[token] = self._token_masks.get(token, 0) | (1 << bit)
+            if set(term.split()) <= _STAPLE_WORDS:
+                self._staple_mask |= 1 << bit
+        return bit
+
+    def add(self, recipe_id: str, ingredients: Iterable[str]) -> None:
+        """Index a recipe's ingredient lines, replacing any previous entry"""
+        mask = 0
+        for line in ingredients:
+            term = ingredient_key(line)
+            if term:
+                mask |= 1 << self._term_bit(term)
+        self._recipe_masks[recipe_id] = mask
+
+    def remove(self, recipe_id: str) -> None:
+        self._recipe_masks.pop(recipe_id, None)
+
+    def pantry_mask(self, pantry: Iterable[str], assume_staples: bool = True) -> int:
+        """Bits of every vocabulary term the pantry covers.
+
+        A pantry entry covers each term containing all of its words, so
+        "flour" covers "all-purpose flour" and "bread flour". Staples only
+        cover terms made of staple words.
+        """
+        mask = self._staple_mask if assume_staples else 0
+        for entry in pantry:
+            tokens = ingredient_key(entry).split()
+            if not tokens:
+                continue
+            entry_mask = -1
+            for token in tokens:
+                entry_mask &= self._token_masks.get(token, 0)
+                if not entry_mask:
+                    break
+            mask |= entry_mask
+        return mask
+
+    def missing_terms(self, recipe_id: str, pantry_mask: int) -> List[str]:
+        missing = self._recipe_masks.get(recipe_id, 0) & ~pantry_mask
+        terms = []
+        while missing:
+            low_bit = missing & -missing
+            terms.append(self._terms[low_bit.bit_length() - 1])
+            missing ^= low_bit
+        return terms
+
+    def match(self, pantry_mask: int, max_missing: int = None) -> List[Tuple[str, int, int]]:
+        """(recipe ID, ingredients missing, ingredients on hand) for every recipe,
+        fewest missing first, then most on hand"""
+        absent_mask = ~pantry_mask
+        matches = []
+        for recipe_id, mask in self._recipe_masks.items():
+            # bin().count() rather than int.bit_count(), which needs Python 3.10
+            missing = bin(mask & absent_mask).count('1')
+            if max_missing is None or missing <= max_missing:
+                matches.append((recipe_id, missing, bin(mask & pantry_mask).count('1')))
+        matches.sort(key=lambda match: (match[1], -match[2], match[0]))
+        return matches
@@ -1,43 +1,201 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from datetime import datetime
+import base64
+import logging
 import os
 import re
+import threading
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+
+from autocomplete_index import AutocompleteIndex
+from duplicate_index import DEFAULT_DUPLICATE_THRESHOLD, DuplicateIndex
+from favorites_sweeper import FavoritesSweeper
+from ingredient_parser import parse_ingredients
+from live_mirror import LiveMirror
+from pantry_index import PantryIndex
+from recipe_cache import RecipeCache
+from recipe_scaling import scale_recipes, shopping_list
+from recipe_storage import (WRITE_BATCH_SIZE, FirestoreStorage, PreconditionFailedError,
+                            RecipeExistsError, SQLiteStorage, StorageEngine)
+from recipe_transfer import RecipeTransfer
+from search_index import SEARCH_FIELDS, SearchIndex
+from similar_recipes import SimilarityIndex
+from suggestion_index import SuggestionIndex
+from title_index import TitleIndex
+
+try:
+    import readline
+except ImportError:
+    # Not available on Windows; the UI works without tab completion
+    readline = None
+
+
+logger = logging.getLogger(__name__)
+
+# How many times create_recipe re-allocates an ID when another writer
+# claims the same one between the allocation query and the write.
+MAX_ID_ALLOCATION_ATTEMPTS = 5
+
+DEFAULT_PAGE_SIZE = 20
+
+# Where the command-line app keeps its full-text search indexes of
+# Firestore recipes; a SQLite database keeps them next to its file
+SEARCH_INDEX_DIR = os.path.join(os.path.expanduser('~'), '.recipe_book', 'search')
+
+# Stale recipes a saved search index is caught up with one by one; past
+# this and half the library it is rebuilt from a single query instead
+MIN_SEARCH_REBUILD = 100
+
+# Fields shown by the list screens; summary=True reads only these
+SUMMARY_FIELDS = ['title', 'category', 'prepTime', 'cookTime', 'servings', 'tags', 'userId']
 
 
 class RecipeBookManager:
-    def __init__(self, credentials_path: str):
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(credentials_path)
-            firebase_admin.initialize_app(cred)
+    def __init__(self, credentials_path: str = None, storage: StorageEngine = None,
+                 cache_size: int = 256, cache_ttl: float = 300.0,
+                 search_index_dir: str = None):
+        """search_index_dir is where full-text indexes are kept between runs;
+        without one they are rebuilt in memory on first search."""
+        self.storage = storage or FirestoreStorage(credentials_path)
+        self.search_index_dir = search_index_dir
+        self.recipe_cache = RecipeCache(max_size=cache_size, ttl=cache_ttl)
+        # name -> (builder, add, remove) of each per-user index: builder(user_id, add)
+        # makes it on first use, add(index, recipe_id, recipe) and
+        # remove(index, recipe_id) keep it current with every write
+        self._index_types: Dict[str, Tuple[Callable, Callable, Callable]] = {
+            'title': (
+                self._build_title_index,
+                lambda index, recipe_id, recipe: index.add(recipe_id, recipe['title']),
+                TitleIndex.remove),
+            'pantry': (
+                partial(self._build_projected_index, PantryIndex, ['ingredients']),
+                lambda index, recipe_id, recipe: index.add(recipe_id, recipe.get('ingredients') or []),
+                PantryIndex.remove),
+            'duplicate': (
+                partial(self._build_projected_index, DuplicateIndex, ['title', 'ingredients']),
+                lambda index, recipe_id, recipe: index.add(recipe_id, recipe.get('title'),
+                                                           recipe.get('ingredients') or []),
+                DuplicateIndex.remove),
+            'similarity': (
+                partial(self._build_projected_index, SimilarityIndex, ['ingredients', 'tags', 'category']),
+                lambda index, recipe_id, recipe: index.add(recipe_id, recipe.get('ingredients') or [],
+                                                           recipe.get('tags') or [], recipe.get('category')),
+                SimilarityIndex.remove),
+            'search': (
+                self._build_search_index,
+                SearchIndex.add,
+                SearchIndex.remove),
+            'suggestion': (
+                partial(self._build_projected_index, SuggestionIndex, ['title']),
+                lambda index, recipe_id, recipe: index.add(recipe_id, recipe.get('title') or ''),
+                SuggestionIndex.remove),
+            'autocomplete': (
+                partial(self._build_projected_index, AutocompleteIndex,
+                        ['title', 'tags', 'category', 'createdAt']),
+                lambda index, recipe_id, recipe: index.add(recipe_id, recipe.get('title') or '',
+                                                           recipe.get('tags') or [], recipe.get('category'),
+                                                           recipe.get('createdAt')),
+                AutocompleteIndex.remove),
+        }
+        self._indexes: Dict[str, Dict[str, object]] = {name: {} for name in self._index_types}
+        self._index_lock = threading.RLock()
+        self._mirrors: Dict[str, LiveMirror] = {}
+        self._cleanup_executor: Optional[ThreadPoolExecutor] = None
+        self._cleanup_futures: List[Future] = []
+    
+    def enable_live_mirror(self, user_id: str, timeout: float = 10.0) -> bool:
+        """Serve the user's reads from a local mirror kept current by change listeners.
+        
+        Returns False if the initial snapshots did not arrive within timeout;
+        the mirror stays subscribed and fills in when they do.
+        """
+        if user_id in self._mirrors:
+            return True
+        
+        mirror = LiveMirror(user_id)
+        mirror.add_subscription(self.storage.watch_recipes(
+            user_id, lambda changes: self._on_recipe_changes(mirror, changes)))
+        mirror.add_subscription(self.storage.watch_favorites(
+            user_id, mirror.apply_favorite_changes))
+        
+        with self._index_lock:
+            self._mirrors[user_id] = mirror
+            # Rebuilt from the mirror on next use
+            for name in self._index_types:
+                self._indexes[name].pop(user_id, None)
         
-        self.db = firestore.client()
-        self.recipes_ref = self.db.collection('recipes')
-        self.favorites_ref = self.db.collection('favorites')
+        return mirror.wait_until_ready(timeout)
+    
+    def disable_live_mirror(self, user_id: str) -> None:
+        mirror = self._mirrors.pop(user_id, None)
+        if mirror:
+            mirror.close()
+    
+    def _on_recipe_changes(self, mirror: LiveMirror, changes) -> None:
+        with self._index_lock:
+            mirror.apply_recipe_changes(changes)
+            for change_type, recipe in changes:
+                self.recipe_cache.invalidate(recipe['id'])
+                if change_type == 'REMOVED':
+                    self._unindex_recipe(recipe['id'], mirror.user_id)
+                else:
+                    self._index_recipe(recipe['id'], recipe)
+    
+    def _mirrored_recipe(self, recipe_id: str) -> Optional[Dict]:
+        for mirror in list(self._mirrors.values()):
+            recipe = mirror.get_recipe(recipe_id)
+            if recipe:
+                return recipe
+        return None
     
     def generate_recipe_id(self, title: str, user_id: str) -> str:
+        """Find the first free ID for a title from a single prefix lookup"""
+        base_id = self.slugify_title(title)
+        taken_ids = self.storage.recipe_ids_with_prefix(base_id)
+        return self.next_free_id(base_id, taken_ids)
+    
+    @staticmethod
+    def slugify_title(title: str) -> str:
         clean_title = re.sub(r'[^a-z0-9\s-]', '', title.lower())
         clean_title = re.sub(r'\s+', '-', clean_title.strip())
         clean_title = re.sub(r'-+', '-', clean_title)
         
-        base_id = clean_title[:50]
+        return clean_title[:50]
+    
+    @staticmethod
+    def next_free_id(base_id: str, taken_ids) -> str:
+        """Return base_id, or base_id-N with the smallest free N >= 1"""
+        if base_id not in taken_ids:
+            return base_id
+        
+        suffix_pattern = re.compile(re.escape(base_id) + r'-(\d+)$')
+        used_suffixes = set()
+        for taken_id in taken_ids:
+            match = suffix_pattern.match(taken_id)
+            if match:
+                used_suffixes.add(int(match.group(1)))
         
-        recipe_id = base_id
         counter = 1
-        while self.recipe_exists(recipe_id):
-            recipe_id = f"{base_id}-{counter}"
+        while counter in used_suffixes:
             counter += 1
         
-        return recipe_id
+        return f"{base_id}-{counter}"
     
     def recipe_exists(self, recipe_id: str) -> bool:
-        doc = self.recipes_ref.document(recipe_id).get()
-        return doc.exists
+        return self.storage.get_recipe(recipe_id) is not None
     
     def create_recipe(self, user_id: str, title: str, description: str,
                      prep_time: int, cook_time: int, servings: int,
                      ingredients: List[str], instructions: List[str],
-                     category: str, tags: List[str] = None) -> str:
+                     category: str, tags: List[str] = None,
+                     store_parsed_ingredients: bool = False) -> str:
+        """Create a recipe and return its ID.
+        
+        With store_parsed_ingredients=True the quantity/unit/item/note form
+        of each ingredient line is saved as 'parsedIngredients' as well.
+        """
         recipe_data = {
             'title': title,
             'description': description,
@@ -49,88 +207,586 @@ class RecipeBookManager:
             'category': category,
             'tags': tags or [],
             'userId': user_id,
-            'createdAt': firestore.SERVER_TIMESTAMP
+            'createdAt': self.storage.server_timestamp()
         }
+        if store_parsed_ingredients:
+            recipe_data['parsedIngredients'] = parse_ingredients(ingredients)
         
-        recipe_id = self.generate_recipe_id(title, user_id)
+        # create_recipe fails if the document already exists, so a writer
+        # that raced us to the same ID makes us allocate again instead of
+        # silently overwriting its recipe.
+        for attempt in range(MAX_ID_ALLOCATION_ATTEMPTS):
+            recipe_id = self.generate_recipe_id(title, user_id)
+            try:
+                self.storage.create_recipe(recipe_id, recipe_data)
+                self.recipe_cache.invalidate(recipe_id)
+                self._index_recipe(recipe_id, recipe_data)
+                return recipe_id
+            except RecipeExistsError:
+                if attempt == MAX_ID_ALLOCATION_ATTEMPTS - 1:
+                    raise
+    
+    def allocate_recipe_ids(self, titles: List[str]) -> List[str]:
+        """Free IDs for many titles at once, distinct from each other and the store.
         
-        doc_ref = self.recipes_ref.document(recipe_id)
-        doc_ref.set(recipe_data)
+        Base slugs are checked with one batched existence lookup; the prefix
+        ranges of slugs that are taken or repeated in titles are then read
+        together, in one query on SQLite and concurrently on Firestore.
+        """
+        base_ids = [self.slugify_title(title) for title in titles]
+        occurrences: Dict[str, int] = {}
+        for base_id in base_ids:
+            occurrences[base_id] = occurrences.get(base_id, 0) + 1
         
-        return recipe_id
+        existing = self.storage.existing_recipe_ids(list(occurrences))
+        taken_ids: Dict[str, Set[str]] = {base_id: set() for base_id in occurrences}
+        taken_ids.update(self.storage.recipe_ids_with_prefixes(
+            [base_id for base_id, count in occurrences.items() if base_id in existing or count > 1]))
+        
+        recipe_ids = []
+        for base_id in base_ids:
+            recipe_id = self.next_free_id(base_id, taken_ids[base_id])
+            taken_ids[base_id].add(recipe_id)
+            recipe_ids.append(recipe_id)
+        return recipe_ids
+    
+    def create_recipes(self, user_id: str, recipes: Iterable[Dict]) -> List[Dict]:
+        """Create many recipes in bulk.
+        
+        Each recipe dict uses the stored field names ('title', 'prepTime',
+        'ingredients', ...). Returns one result per input, in order, with the
+        'title', the allocated 'id' (None if it was not created) and an
+        'error' message or None. IDs that another writer claims first are
+        re-allocated, as in create_recipe.
+        """
+        results = []
+        pending: Dict[int, Dict] = {}
+        for recipe in recipes:
+            title = recipe.get('title')
+            results.append({'title': title, 'id': None, 'error': None})
+            if not title:
+                results[-1]['error'] = "Recipe has no title"
+                continue
+            
+            recipe_data = {key: value for key, value in recipe.items()
+                           if key not in ('id', 'updateTime')}
+            recipe_data['tags'] = recipe_data.get('tags') or []
+            recipe_data['userId'] = user_id
+            recipe_data['createdAt'] = self.storage.server_timestamp()
+            pending[len(results) - 1] = recipe_data
+        
+        for attempt in range(MAX_ID_ALLOCATION_ATTEMPTS):
+            if not pending:
+                break
+            
+            positions = list(pending)
+            recipe_ids = self.allocate_recipe_ids([pending[pos]['title'] for pos in positions])
+            errors = self.storage.create_recipes(
+                {recipe_id: pending[pos] for pos, recipe_id in zip(positions, recipe_ids)})
+            
+            retry = {}
+            for pos, recipe_id in zip(positions, recipe_ids):
+                error = errors.get(recipe_id)
+                if error is None:
+                    results[pos]['id'] = recipe_id
+                    self.recipe_cache.invalidate(recipe_id)
+                    self._index_recipe(recipe_id, pending[pos])
+                elif isinstance(error, RecipeExistsError) and attempt < MAX_ID_ALLOCATION_ATTEMPTS - 1:
+                    retry[pos] = pending[pos]
+                else:
+                    results[pos]['error'] = str(error) or type(error).__name__
+            pending = retry
+        
+        return results
     
     def get_recipe(self, recipe_id: str) -> Optional[Dict]:
-        doc = self.recipes_ref.document(recipe_id).get()
-        if doc.exists:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            return data
-        return None
+        if self._mirrors:
+            recipe = self._mirrored_recipe(recipe_id)
+            if recipe:
+                return recipe
+        
+        recipe = self.recipe_cache.get(recipe_id)
+        if recipe is None:
+            recipe = self.storage.get_recipe(recipe_id)
+            if recipe:
+                self.recipe_cache.put(recipe_id, recipe)
+        return recipe
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters and current size of the recipe cache"""
+        return self.recipe_cache.stats()
     
-    def update_recipe(self, recipe_id: str, user_id: str, **updates) -> bool:
+    def update_recipe(self, recipe_id: str, user_id: str,
+                      expected_update_time: datetime = None, **updates) -> bool:
+        """Update a recipe the user owns.
+        
+        Pass the 'updateTime' from get_recipe as expected_update_time to fail
+        instead of overwriting changes someone else made in the meantime.
+        New 'ingredients' also replace 'parsedIngredients', so the parsed
+        form never describes an older ingredient list.
+        """
         try:
-            recipe_ref = self.recipes_ref.document(recipe_id)
-            current = recipe_ref.get()
-            
-            if not current.exists:
-                return False
+            if 'ingredients' in updates and 'parsedIngredients' not in updates:
+                updates['parsedIngredients'] = parse_ingredients(updates['ingredients'])
             
-            if current.to_dict().get('userId') != user_id:
+            recipe = self._owner_guarded_write(
+                recipe_id, user_id, expected_update_time,
+                lambda version: self.storage.update_recipe(recipe_id, updates, expected_update_time=version),
+                lambda: self.storage.update_recipe_if_owner(recipe_id, user_id, updates, expected_update_time)
+            )
+            if recipe is None:
                 return False
             
-            recipe_ref.update(updates)
+            self.recipe_cache.invalidate(recipe_id)
+            self._index_recipe(recipe_id, {**recipe, **updates})
             
             return True
         except:
             return False
     
-    def delete_recipe(self, recipe_id: str, user_id: str) -> bool:
+    def delete_recipe(self, recipe_id: str, user_id: str,
+                      expected_update_time: datetime = None,
+                      background_cleanup: bool = False) -> bool:
+        """Delete a recipe the user owns and remove it from every user's favorites.
+        
+        With background_cleanup=True the favorites are cleaned up on a worker
+        thread and this returns as soon as the recipe itself is gone. Once
+        the recipe is deleted this returns True: a failed cleanup is retried
+        in the background, and favorites it still misses are left for
+        sweep_orphan_favorites.
+        """
         try:
-            recipe_ref = self.recipes_ref.document(recipe_id)
-            current = recipe_ref.get()
-            
-            if not current.exists:
-                return False
-            
-            if current.to_dict().get('userId') != user_id:
+            recipe = self._owner_guarded_write(
+                recipe_id, user_id, expected_update_time,
+                lambda version: self.storage.delete_recipe(recipe_id, expected_update_time=version),
+                lambda: self.storage.delete_recipe_if_owner(recipe_id, user_id, expected_update_time)
+            )
+            if recipe is None:
                 return False
             
-            recipe_ref.delete()
-        
-            self.remove_from_favorites(recipe_id, user_id)
-            
-            return True
+            self.recipe_cache.invalidate(recipe_id)
+            self._unindex_recipe(recipe_id, user_id)
         except:
             return False
+        
+        if not background_cleanup:
+            try:
+                self.storage.delete_favorites_for_recipe(recipe_id)
+                return True
+            except Exception:
+                pass
+        
+        if self._cleanup_executor is None:
+            self._cleanup_executor = ThreadPoolExecutor(max_workers=1)
+        self._cleanup_futures = [f for f in self._cleanup_futures if not f.done()]
+        self._cleanup_futures.append(
+            self._cleanup_executor.submit(self._delete_favorites_for_recipe, recipe_id))
+        return True
+    
+    def _delete_favorites_for_recipe(self, recipe_id: str) -> None:
+        try:
+            self.storage.delete_favorites_for_recipe(recipe_id)
+        except Exception:
+            logger.exception("Could not remove the favorites of deleted recipe %s;"
+                             " sweep_orphan_favorites will", recipe_id)
+    
+    def wait_for_background_cleanup(self, timeout: float = None) -> bool:
+        """Wait for favorites cleanups started by delete_recipe(background_cleanup=True)"""
+        done, not_done = wait(self._cleanup_futures, timeout=timeout)
+        self._cleanup_futures = list(not_done)
+        return not not_done
+    
+    def _owner_guarded_write(self, recipe_id: str, user_id: str,
+                             expected_update_time: Optional[datetime],
+                             versioned_write, transactional_write) -> Optional[Dict]:
+        """Run a write only if user_id owns the recipe, in as few round trips as possible.
+        
+        When the cache holds the recipe with its version and it belongs to
+        user_id, the write is sent once with that version as a precondition:
+        if it succeeds, nothing changed since ownership was checked. Otherwise
+        the store checks ownership and writes in one transaction.
+        """
+        cached = self.recipe_cache.get(recipe_id)
+        version = cached.get('updateTime') if cached else None
+        
+        if (version is not None and cached.get('userId') == user_id
+                and expected_update_time in (None, version)):
+            try:
+                versioned_write(version)
+                return cached
+            except PreconditionFailedError:
+                if expected_update_time is not None:
+                    raise
+                # Our cached copy is out of date; let the transaction decide
+        
+        return transactional_write()
     
     def get_user_recipes(self, user_id: str, category: str = None, 
-                        tag: str = None) -> List[Dict]:
-        query = self.recipes_ref.where('userId', '==', user_id)
+                        tag: str = None, summary: bool = False) -> List[Dict]:
+        """The user's recipes; summary=True reads only SUMMARY_FIELDS"""
+        fields = SUMMARY_FIELDS if summary else None
         
-        if category:
-            query = query.where('category', '==', category)
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.query_recipes(category=category, tag=tag, fields=fields)
         
-        if tag:
-            query = query.where('tags', 'array_contains', tag)
+        return list(self.storage.query_recipes(user_id, category=category, tag=tag, fields=fields))
+    
+    def count_user_recipes(self, user_id: str, category: str = None, tag: str = None) -> int:
+        """Number of matching recipes, counted by the store without reading them"""
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.count_recipes(category=category, tag=tag)
         
-        recipes = []
-        for doc in query.stream():
-            data = doc.to_dict()
-            data['id'] = doc.id
-            recipes.append(data)
+        return self.storage.count_recipes(user_id, category=category, tag=tag)
+    
+    def count_user_favorites(self, user_id: str) -> int:
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.count_favorites()
         
-        return recipes
+        return self.storage.count_favorites(user_id)
     
-    def search_recipes_by_title(self, user_id: str, search_term: str) -> List[Dict]:
-        all_recipes = self.get_user_recipes(user_id)
-        search_term_lower = search_term.lower()
+    def get_user_recipes_page(self, user_id: str, page_token: str = None,
+                              page_size: int = DEFAULT_PAGE_SIZE, category: str = None,
+                              tag: str = None, summary: bool = False) -> Tuple[List[Dict], Optional[str]]:
+        """One page of the user's recipes in ID order.
+        
+        Returns the page and a token for the next one, or None on the last page.
+        """
+        start_after = self._decode_page_token(page_token) if page_token else None
+        fields = SUMMARY_FIELDS if summary else None
         
-        matching_recipes = [
-            recipe for recipe in all_recipes 
-            if search_term_lower in recipe['title'].lower()
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            page = mirror.query_recipes(category=category, tag=tag, start_after=start_after,
+                                        limit=page_size, fields=fields)
+        else:
+            page = self.storage.page_recipes(user_id, page_size, start_after=start_after,
+                                             category=category, tag=tag, fields=fields)
+        
+        next_token = self._encode_page_token(page[-1]['id']) if len(page) == page_size else None
+        return page, next_token
+    
+    def iter_user_recipes(self, user_id: str, category: str = None, tag: str = None,
+                          page_size: int = DEFAULT_PAGE_SIZE,
+                          summary: bool = False) -> Iterator[Dict]:
+        """Stream the user's recipes page by page, holding one page in memory"""
+        page_token = None
+        while True:
+            page, page_token = self.get_user_recipes_page(
+                user_id, page_token, page_size, category=category, tag=tag, summary=summary)
+            yield from page
+            if not page_token:
+                return
+    
+    @staticmethod
+    def _encode_page_token(last_id: str) -> str:
+        return base64.urlsafe_b64encode(last_id.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def _decode_page_token(page_token: str) -> str:
+        return base64.urlsafe_b64decode(page_token.encode('ascii')).decode('utf-8')
+    
+    def search_recipes_by_title(self, user_id: str, search_term: str,
+                                keywords: bool = False) -> List[Dict]:
+        """Find the user's recipes whose title contains search_term.
+        
+        With keywords=True, every word of search_term must appear in the
+        title instead. Only the matching recipes are fetched.
+        """
+        index = self._index('title', user_id)
+        with self._index_lock:
+            if keywords:
+                matching_ids = index.search_keywords(search_term)
+            else:
+                matching_ids = index.search(search_term)
+        
+        recipes = self._get_recipes(matching_ids)
+        return [
+            recipes[recipe_id] for recipe_id in matching_ids
+            if recipe_id in recipes and recipes[recipe_id].get('userId') == user_id
         ]
+    
+    def search_recipes_by_pantry(self, user_id: str, pantry: Iterable[str],
+                                 max_missing: int = None, limit: int = None,
+                                 assume_staples: bool = True) -> List[Dict]:
+        """The user's recipes ranked by how few ingredients are missing from pantry.
+        
+        Each recipe carries 'missingCount' and 'missingIngredients'. A pantry
+        entry such as "flour" also covers "all-purpose flour"; salt, pepper
+        and water count as on hand unless assume_staples=False.
+        """
+        index = self._index('pantry', user_id)
+        with self._index_lock:
+            pantry_mask = index.pantry_mask(pantry, assume_staples)
+            matches = index.match(pantry_mask, max_missing)[:limit]
+            missing = {recipe_id: index.missing_terms(recipe_id, pantry_mask)
+                       for recipe_id, _, _ in matches}
         
-        return matching_recipes
+        recipes = self._get_recipes([recipe_id for recipe_id, _, _ in matches])
+        results = []
+        for recipe_id, missing_count, _ in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe and recipe.get('userId') == user_id:
+                recipe['missingCount'] = missing_count
+                recipe['missingIngredients'] = missing[recipe_id]
+                results.append(recipe)
+        return results
+    
+    def find_duplicate_recipes(self, user_id: str, title: str, ingredients: List[str],
+                               threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> List[Dict]:
+        """The user's recipes that look like the same dish as title/ingredients.
+        
+        Meant to be called before create_recipe. Each match carries its
+        estimated 'similarity' (0-1), most similar first.
+        """
+        index = self._index('duplicate', user_id)
+        with self._index_lock:
+            matches = index.similar_to(title, ingredients, threshold)
+        
+        recipes = self._get_recipes([recipe_id for recipe_id, _ in matches])
+        results = []
+        for recipe_id, similarity in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe and recipe.get('userId') == user_id:
+                recipe['similarity'] = similarity
+                results.append(recipe)
+        return results
+    
+    def similar_recipes(self, recipe_id: str, user_id: str, limit: int = 5) -> List[Dict]:
+        """Up to limit of the user's recipes most like recipe_id, each with its 'similarity'"""
+        index = self._index('similarity', user_id)
+        with self._index_lock:
+            matches = index.most_similar(recipe_id, limit)
+        
+        recipes = self._get_recipes([match_id for match_id, _ in matches])
+        results = []
+        for match_id, similarity in matches:
+            recipe = recipes.get(match_id)
+            if recipe and recipe.get('userId') == user_id:
+                recipe['similarity'] = similarity
+                results.append(recipe)
+        return results
+    
+    def search_recipes(self, user_id: str, query: str, limit: int = 20) -> List[Dict]:
+        """The user's recipes ranked by BM25 relevance to query, each with its 'score'.
+        
+        Title, description, ingredients and instructions are all searched,
+        title matches counting most. Words are matched by stem ("baking"
+        finds "baked"), and "quoted phrases" must appear word for word.
+        """
+        index = self._index('search', user_id)
+        with self._index_lock:
+            matches = index.search(query, limit)
+        
+        recipes = self._get_recipes([recipe_id for recipe_id, _ in matches])
+        results = []
+        for recipe_id, score in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe and recipe.get('userId') == user_id:
+                recipe['score'] = score
+                results.append(recipe)
+        return results
+    
+    def suggest_recipes(self, user_id: str, text: str, limit: int = 5,
+                        max_distance: int = None) -> List[Dict]:
+        """The user's recipes whose ID or title is a few typos away from text.
+        
+        Answered from memory without reading any recipe: each suggestion
+        is {'id', 'title', 'distance'}, closest first. An exact ID comes
+        back with distance 0.
+        """
+        index = self._index('suggestion', user_id)
+        with self._index_lock:
+            matches = index.suggest(text, limit, max_distance)
+        return [{'id': recipe_id, 'title': title, 'distance': distance}
+                for recipe_id, title, distance in matches]
+    
+    def complete_recipe_ids(self, user_id: str, prefix: str, limit: int = 5) -> List[Dict]:
+        """{'id', 'title'} of the user's newest recipes whose ID or title starts with prefix.
+        
+        Served from a trie that caches the best completions at every node,
+        so the cost does not grow with the size of the library.
+        """
+        index = self._index('autocomplete', user_id)
+        with self._index_lock:
+            matches = index.complete_recipes(prefix, limit)
+        return [{'id': recipe_id, 'title': title} for recipe_id, title in matches]
+    
+    def complete_labels(self, user_id: str, prefix: str, limit: int = 5) -> List[str]:
+        """The user's most used tags and categories that start with prefix"""
+        index = self._index('autocomplete', user_id)
+        with self._index_lock:
+            return index.complete_labels(prefix, limit)
+    
+    def rebuild_search_index(self, user_id: str) -> None:
+        """Re-read the user's recipes into a fresh full-text index.
+        
+        A saved index is already reconciled with the store when loaded;
+        this is for one whose files were damaged or edited by hand.
+        """
+        with self._index_lock:
+            self._indexes['search'].pop(user_id, None)
+            self._index('search', user_id, reuse_saved=False)
+    
+    def duplicate_report(self, user_id: str,
+                         threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> List[List[Dict]]:
+        """Groups of the user's recipes that look like copies of each other"""
+        index = self._index('duplicate', user_id)
+        with self._index_lock:
+            groups = index.duplicate_groups(threshold)
+        
+        recipes = self._get_recipes([recipe_id for group in groups for recipe_id in group])
+        return [[recipes[recipe_id] for recipe_id in group if recipe_id in recipes]
+                for group in groups]
+    
+    def scale_recipe(self, recipe_id: str, target_servings: float,
+                     normalize_units: bool = False) -> Optional[Dict]:
+        """The recipe's ingredients rescaled from its servings to target_servings.
+        
+        Returns None if the recipe does not exist; see scale_recipes for the
+        shape of the result.
+        """
+        scaled = self.scale_meal_plan({recipe_id: target_servings}, normalize_units)
+        return scaled[0] if scaled else None
+    
+    def scale_meal_plan(self, plan: Dict[str, float],
+                        normalize_units: bool = False) -> List[Dict]:
+        """Scale many recipes at once; plan maps recipe ID to target servings.
+        
+        The recipes are fetched in one batch and scaled together in a single
+        vectorized pass. Recipes that no longer exist are left out.
+        """
+        recipes, targets = self._planned_recipes(plan)
+        return scale_recipes(recipes, targets, normalize_units)
+    
+    def shopping_list(self, plan: Dict[str, float]) -> List[Dict]:
+        """Ingredients of a meal plan, scaled and added up across units"""
+        return shopping_list(*self._planned_recipes(plan))
+    
+    def _planned_recipes(self, plan: Dict[str, float]) -> Tuple[List[Dict], List[float]]:
+        recipes = self._get_recipes(list(plan))
+        recipe_ids = [recipe_id for recipe_id in plan if recipe_id in recipes]
+        return [recipes[recipe_id] for recipe_id in recipe_ids], [plan[recipe_id] for recipe_id in recipe_ids]
+    
+    def _get_recipes(self, recipe_ids: List[str]) -> Dict[str, Dict]:
+        """Batched get_recipe: cached recipes are reused, the rest fetched in one go"""
+        recipes = {}
+        missing_ids = []
+        for recipe_id in recipe_ids:
+            recipe = self._mirrored_recipe(recipe_id) if self._mirrors else None
+            if recipe is None:
+                recipe = self.recipe_cache.get(recipe_id)
+            if recipe is None:
+                missing_ids.append(recipe_id)
+            else:
+                recipes[recipe_id] = recipe
+        
+        for recipe_id, recipe in self.storage.get_recipes(missing_ids).items():
+            self.recipe_cache.put(recipe_id, recipe)
+            recipes[recipe_id] = recipe
+        
+        return recipes
+    
+    def _index(self, name: str, user_id: str, **options):
+        """The user's index of the given kind, built on first use"""
+        with self._index_lock:
+            index = self._indexes[name].get(user_id)
+            if index is None:
+                builder, add, _ = self._index_types[name]
+                index = self._indexes[name][user_id] = builder(user_id, add, **options)
+            return index
+    
+    def _build_title_index(self, user_id: str, add: Callable) -> TitleIndex:
+        """From a titles-only query, or the mirror if there is one"""
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            titles = {recipe['id']: recipe['title'] for recipe in mirror.query_recipes()}
+        else:
+            titles = self.storage.recipe_titles(user_id)
+        
+        index = TitleIndex()
+        for recipe_id, title in titles.items():
+            add(index, recipe_id, {'title': title})
+        return index
+    
+    def _projected_recipes(self, user_id: str, fields: List[str]) -> Iterable[Dict]:
+        """The user's recipes with only fields, from the mirror if there is one"""
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.query_recipes(fields=fields)
+        return self.storage.query_recipes(user_id, fields=fields)
+    
+    def _build_projected_index(self, index_type: type, fields: List[str], user_id: str, add: Callable):
+        """A new index_type over the user's recipes, read with only the fields it needs"""
+        index = index_type()
+        for recipe in self._projected_recipes(user_id, fields):
+            add(index, recipe['id'], recipe)
+        return index
+    
+    def _search_index_path(self, user_id: str) -> Optional[str]:
+        if not self.search_index_dir:
+            return None
+        return os.path.join(self.search_index_dir, urllib.parse.quote(user_id, safe='') + '.search.json')
+    
+    def _build_search_index(self, user_id: str, add: Callable, reuse_saved: bool = True) -> SearchIndex:
+        """The saved index if there is one, caught up with the store, else one
+        built from a text-fields query and saved. A live mirror always rebuilds it."""
+        path = self._search_index_path(user_id)
+        if path and reuse_saved and user_id not in self._mirrors:
+            index = SearchIndex.load(path)
+            if index is not None and self._reconcile_search_index(user_id, index):
+                return index
+        
+        # Versions first: a write landing during the text query then only
+        # looks stale and is re-read on the next load
+        update_times = self.storage.recipe_versions(user_id) if path else {}
+        index = SearchIndex()
+        for recipe in self._projected_recipes(user_id, SEARCH_FIELDS):
+            add(index, recipe['id'], recipe, update_times.get(recipe['id']))
+        if path:
+            os.makedirs(self.search_index_dir, exist_ok=True)
+            index.path = path
+            index.save()
+        return index
+    
+    def _reconcile_search_index(self, user_id: str, index: SearchIndex) -> bool:
+        """Catch a saved index up with the recipes written while it was not loaded,
+        from an ID-only query. False if so much changed that a rebuild is cheaper."""
+        update_times = self.storage.recipe_versions(user_id)
+        changed, removed = index.stale(update_times)
+        if len(changed) > max(MIN_SEARCH_REBUILD, len(update_times) // 2):
+            return False
+        
+        for recipe_id in removed:
+            index.remove(recipe_id)
+        recipes = self.storage.get_recipes(changed)
+        for recipe_id in changed:
+            if recipe_id in recipes:
+                index.add(recipe_id, recipes[recipe_id], update_times[recipe_id])
+            else:
+                index.remove(recipe_id)
+        return True
+    
+    def _index_recipe(self, recipe_id: str, recipe: Dict) -> None:
+        """Bring the in-memory indexes up to date after a create or update"""
+        with self._index_lock:
+            for name, (_, add, _) in self._index_types.items():
+                index = self._indexes[name].get(recipe.get('userId'))
+                if index is not None:
+                    add(index, recipe_id, recipe)
+    
+    def _unindex_recipe(self, recipe_id: str, user_id: str) -> None:
+        with self._index_lock:
+            for name, (_, _, remove) in self._index_types.items():
+                index = self._indexes[name].get(user_id)
+                if index is not None:
+                    remove(index, recipe_id)
+    
+    @staticmethod
+    def favorite_id(recipe_id: str, user_id: str) -> str:
+        return f"fav-{user_id}-{recipe_id}"
     
     def add_to_favorites(self, recipe_id: str, user_id: str, notes: str = "") -> bool:
         try:
@@ -141,15 +797,15 @@ class RecipeBookManager:
             if self.is_favorited(recipe_id, user_id):
                 return False
             
-            favorite_id = f"fav-{user_id}-{recipe_id}"
+            favorite_id = self.favorite_id(recipe_id, user_id)
             favorite_data = {
                 'recipeId': recipe_id,
                 'userId': user_id,
                 'notes': notes,
-                'addedDate': firestore.SERVER_TIMESTAMP
+                'addedDate': self.storage.server_timestamp()
             }
             
-            self.favorites_ref.document(favorite_id).set(favorite_data)
+            self.storage.set_favorite(favorite_id, favorite_data)
             return True
         except:
             return False
@@ -157,11 +813,9 @@ class RecipeBookManager:
     def remove_from_favorites(self, recipe_id: str, user_id: str) -> bool:
         """Remove a recipe from user's favorites"""
         try:
-            favorite_id = f"fav-{user_id}-{recipe_id}"
-            favorite_ref = self.favorites_ref.document(favorite_id)
-            
-            if favorite_ref.get().exists:
-                favorite_ref.delete()
+            favorite_id = self.favorite_id(recipe_id, user_id)
+            if self.storage.get_favorite(favorite_id):
+                self.storage.delete_favorite(favorite_id)
                 return True
             return False
         except:
@@ -169,20 +823,43 @@ class RecipeBookManager:
     
     def is_favorited(self, recipe_id: str, user_id: str) -> bool:
         """Check if a recipe is in user's favorites"""
-        favorite_id = f"fav-{user_id}-{recipe_id}"
-        doc = self.favorites_ref.document(favorite_id).get()
-        return doc.exists
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.is_favorited(recipe_id)
+        
+        favorite_id = self.favorite_id(recipe_id, user_id)
+        return self.storage.get_favorite(favorite_id) is not None
+    
+    def get_favorite_ids(self, user_id: str) -> Set[str]:
+        """IDs of every recipe the user has favorited, from one favorites query"""
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.favorite_recipe_ids()
+        
+        return self.storage.favorite_recipe_ids(user_id)
+    
+    def are_favorited(self, recipe_ids: Iterable[str], user_id: str) -> Set[str]:
+        """Which of recipe_ids the user has favorited, from one batched get"""
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            return mirror.favorite_recipe_ids() & set(recipe_ids)
+        
+        favorite_ids = {self.favorite_id(recipe_id, user_id): recipe_id for recipe_id in recipe_ids}
+        found = self.storage.get_favorites(list(favorite_ids))
+        return {favorite_ids[favorite_id] for favorite_id in found}
     
     def get_user_favorites(self, user_id: str) -> List[Dict]:
         """Get all favorited recipes for a user with full recipe details"""
-        favorites = []
-        query = self.favorites_ref.where('userId', '==', user_id)
+        mirror = self._mirrors.get(user_id)
+        if mirror:
+            fav_entries = mirror.favorites()
+        else:
+            fav_entries = list(self.storage.query_favorites(user_id))
+        recipes = self._get_recipes([fav['recipeId'] for fav in fav_entries])
         
-        for doc in query.stream():
-            fav_data = doc.to_dict()
-            recipe_id = fav_data['recipeId']
-            
-            recipe = self.get_recipe(recipe_id)
+        favorites = []
+        for fav_data in fav_entries:
+            recipe = recipes.get(fav_data['recipeId'])
             if recipe:
                 recipe['favoriteNotes'] = fav_data.get('notes', '')
                 recipe['favoritedDate'] = fav_data.get('addedDate')
@@ -190,6 +867,28 @@ class RecipeBookManager:
         
         return favorites
     
+    def sweep_orphan_favorites(self, checkpoint_path: str = None, page_size: int = 500,
+                               max_pages: int = None, progress=None) -> Dict:
+        """Delete favorites of recipes that no longer exist; see FavoritesSweeper"""
+        sweeper = FavoritesSweeper(self.storage, checkpoint_path=checkpoint_path,
+                                   page_size=page_size)
+        return sweeper.run(max_pages=max_pages, progress=progress)
+    
+    def export_recipes(self, user_id: str, fp, progress=None) -> Dict:
+        """Write the user's recipes and favorites to fp as JSON Lines; see RecipeTransfer"""
+        return RecipeTransfer(self.storage).export_user(user_id, fp, progress=progress)
+    
+    def import_recipes(self, fp, progress=None, batch_size: int = WRITE_BATCH_SIZE,
+                       max_in_flight: int = 4) -> Dict:
+        """Load a file written by export_recipes, keeping document IDs and owners"""
+        transfer = RecipeTransfer(self.storage, batch_size=batch_size, max_in_flight=max_in_flight)
+        return transfer.import_file(fp, progress=progress, on_batch=self._on_recipes_imported)
+    
+    def _on_recipes_imported(self, recipes: Dict[str, Dict]) -> None:
+        for recipe_id, recipe in recipes.items():
+            self.recipe_cache.invalidate(recipe_id)
+            self._index_recipe(recipe_id, recipe)
+    
     def toggle_favorite(self, recipe_id: str, user_id: str) -> bool:
         """Toggle favorite status (add if not favorited, remove if favorited)"""
         if self.is_favorited(recipe_id, user_id):
@@ -200,9 +899,19 @@ class RecipeBookManager:
 
 class RecipeBookUI:
     
-    def __init__(self, credentials_path: str, user_id: str):
-        self.manager = RecipeBookManager(credentials_path)
+    def __init__(self, credentials_path: str, user_id: str, storage: StorageEngine = None,
+                 search_index_dir: str = None):
+        self.manager = RecipeBookManager(credentials_path, storage=storage,
+                                         search_index_dir=search_index_dir)
         self.user_id = user_id
+        
+        if readline is not None:
+            # Complete the whole answer, spaces included, rather than its last word
+            readline.set_completer_delims('')
+            if 'libedit' in (readline.__doc__ or ''):
+                readline.parse_and_bind('bind ^I rl_complete')
+            else:
+                readline.parse_and_bind('tab: complete')
     
     def clear_screen(self):
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -212,7 +921,23 @@ class RecipeBookUI:
         print(f"  {title}")
         print("="*60 + "\n")
     
-    def input_with_prompt(self, prompt: str, default: str = None) -> str:
+    def input_with_prompt(self, prompt: str, default: str = None, complete=None) -> str:
+        """Read an answer; complete(text) gives the Tab completions where readline exists"""
+        if readline is not None and complete is not None:
+            previous = readline.get_completer()
+            matches = []
+            
+            def completer(text, state):
+                if state == 0:
+                    matches[:] = complete(text)
+                return matches[state] if state < len(matches) else None
+            
+            readline.set_completer(completer)
+            try:
+                return self.input_with_prompt(prompt, default)
+            finally:
+                readline.set_completer(previous)
+        
         if default:
             value = input(f"{prompt} [{default}]: ").strip()
             return value if value else default
@@ -221,6 +946,37 @@ class RecipeBookUI:
     def press_enter_to_continue(self):
         input("\nPress Enter to continue...")
     
+    def complete_recipe_id(self, text: str) -> List[str]:
+        return [match['id'] for match in self.manager.complete_recipe_ids(self.user_id, text, limit=10)]
+    
+    def complete_label(self, text: str) -> List[str]:
+        return self.manager.complete_labels(self.user_id, text, limit=10)
+    
+    def prompt_recipe_id(self, prompt: str) -> str:
+        """Ask for a recipe ID with Tab completion, offering the user's recipes
+        that start with or are a typo or two away from what was typed"""
+        recipe_id = self.input_with_prompt(prompt, complete=self.complete_recipe_id)
+        # Any existing recipe, the user's or not, is taken as typed; the
+        # lookup also warms the cache for the caller's own get_recipe
+        if not recipe_id or self.manager.get_recipe(recipe_id):
+            return recipe_id
+        
+        suggestions = self.manager.suggest_recipes(self.user_id, recipe_id)
+        suggested_ids = {suggestion['id'] for suggestion in suggestions}
+        suggestions = [match for match in self.manager.complete_recipe_ids(self.user_id, recipe_id)
+                       if match['id'] not in suggested_ids] + suggestions
+        suggestions = suggestions[:5]
+        if not suggestions:
+            return recipe_id
+        
+        print(f"\n🤔 No recipe with ID '{recipe_id}'. Did you mean:")
+        for i, suggestion in enumerate(suggestions, 1):
+            print(f"  {i}. {suggestion['title']} (ID: {suggestion['id']})")
+        choice = self.input_with_prompt("Choose a number, or press Enter to keep what you typed")
+        if choice.isdigit() and 1 <= int(choice) <= len(suggestions):
+            return suggestions[int(choice) - 1]['id']
+        return recipe_id
+    
     def show_menu(self):
         self.clear_screen()
         self.print_header("🍳 RECIPE BOOK MANAGER 🍳")
@@ -287,6 +1043,17 @@ class RecipeBookUI:
         tags_input = self.input_with_prompt("Tags (comma-separated, e.g., italian, quick, healthy)")
         tags = [tag.strip() for tag in tags_input.split(',')] if tags_input else []
         
+        duplicates = self.manager.find_duplicate_recipes(self.user_id, title, ingredients)
+        if duplicates:
+            print("\n⚠️  This looks like a recipe you already have:")
+            for duplicate in duplicates[:3]:
+                print(f"  • {duplicate['title']} (ID: {duplicate['id']}, {duplicate['similarity']:.0%} similar)")
+            confirm = self.input_with_prompt("Type 'yes' to create it anyway").lower()
+            if confirm != 'yes':
+                print("\n⚠️  Recipe not created.")
+                self.press_enter_to_continue()
+                return
+        
         recipe_id = self.manager.create_recipe(
             user_id=self.user_id,
             title=title,
@@ -297,7 +1064,8 @@ class RecipeBookUI:
             ingredients=ingredients,
             instructions=instructions,
             category=category,
-            tags=tags
+            tags=tags,
+            store_parsed_ingredients=True
         )
         
         print(f"\n✅ Recipe '{title}' created successfully!")
@@ -308,15 +1076,20 @@ class RecipeBookUI:
         self.clear_screen()
         self.print_header("ALL RECIPES")
         
-        recipes = self.manager.get_user_recipes(self.user_id)
+        total = self.manager.count_user_recipes(self.user_id)
         
-        if not recipes:
+        if not total:
             print("No recipes found. Add your first recipe!")
         else:
+            favorite_ids = self.manager.get_favorite_ids(self.user_id)
+            
+            # Rows are printed as each page arrives rather than after the
+            # whole library has been downloaded.
+            recipes = self.manager.iter_user_recipes(self.user_id, summary=True)
             for i, recipe in enumerate(recipes, 1):
                 total_time = recipe['prepTime'] + recipe['cookTime']
                 
-                is_fav = self.manager.is_favorited(recipe['id'], self.user_id)
+                is_fav = recipe['id'] in favorite_ids
                 fav_icon = "⭐" if is_fav else "  "
                 
                 print(f"{fav_icon} {i}. {recipe['title']}")
@@ -326,14 +1099,14 @@ class RecipeBookUI:
                     print(f"   🏷️  {', '.join(recipe['tags'])}")
                 print()
         
-        print(f"Total: {len(recipes)} recipes")
+        print(f"Total: {total} recipes")
         self.press_enter_to_continue()
     
     def view_recipe_details(self):
         self.clear_screen()
         self.print_header("VIEW RECIPE DETAILS")
         
-        recipe_id = self.input_with_prompt("Enter Recipe ID")
+        recipe_id = self.prompt_recipe_id("Enter Recipe ID")
         recipe = self.manager.get_recipe(recipe_id)
         
         if not recipe:
@@ -361,6 +1134,12 @@ class RecipeBookUI:
             if recipe['tags']:
                 print(f"\n🏷️  Tags: {', '.join(recipe['tags'])}")
             
+            similar = self.manager.similar_recipes(recipe_id, self.user_id)
+            if similar:
+                print(f"\n🔗 MORE LIKE THIS:")
+                for other in similar:
+                    print(f"  • {other['title']} (ID: {other['id']})")
+            
             print(f"\n🆔 Recipe ID: {recipe['id']}")
             print(f"{'='*60}")
         
@@ -373,22 +1152,33 @@ class RecipeBookUI:
         print("1. Search by Category")
         print("2. Search by Tag")
         print("3. Search by Title")
+        print("4. What Can I Cook? (by pantry ingredients)")
+        print("5. Full-Text Search (title, description, ingredients, steps)")
         print()
         
-        choice = self.input_with_prompt("Choose search type (1, 2, or 3)")
+        choice = self.input_with_prompt("Choose search type (1-5)")
         
         if choice == '1':
-            category = self.input_with_prompt("Enter category")
-            recipes = self.manager.get_user_recipes(self.user_id, category=category)
+            category = self.input_with_prompt("Enter category", complete=self.complete_label)
+            recipes = self.manager.get_user_recipes(self.user_id, category=category, summary=True)
             search_term = f"Category: {category}"
         elif choice == '2':
-            tag = self.input_with_prompt("Enter tag")
-            recipes = self.manager.get_user_recipes(self.user_id, tag=tag)
+            tag = self.input_with_prompt("Enter tag", complete=self.complete_label)
+            recipes = self.manager.get_user_recipes(self.user_id, tag=tag, summary=True)
             search_term = f"Tag: {tag}"
         elif choice == '3':
             title_search = self.input_with_prompt("Enter title or keyword")
             recipes = self.manager.search_recipes_by_title(self.user_id, title_search)
             search_term = f"Title: {title_search}"
+        elif choice == '4':
+            pantry_input = self.input_with_prompt("Enter the ingredients you have (comma-separated)")
+            pantry = [item.strip() for item in pantry_input.split(',') if item.strip()]
+            recipes = self.manager.search_recipes_by_pantry(self.user_id, pantry)
+            search_term = f"Pantry: {', '.join(pantry)}"
+        elif choice == '5':
+            query = self.input_with_prompt('Enter search words (use "quotes" for exact phrases)')
+            recipes = self.manager.search_recipes(self.user_id, query)
+            search_term = f"Text: {query}"
         else:
             print("\n❌ Invalid choice!")
             self.press_enter_to_continue()
@@ -399,12 +1189,18 @@ class RecipeBookUI:
         if not recipes:
             print("No recipes found.")
         else:
+            favorite_ids = self.manager.are_favorited([recipe['id'] for recipe in recipes], self.user_id)
             for i, recipe in enumerate(recipes, 1):
-                is_fav = self.manager.is_favorited(recipe['id'], self.user_id)
+                is_fav = recipe['id'] in favorite_ids
                 fav_icon = "⭐" if is_fav else "  "
                 
                 print(f"{fav_icon} {i}. {recipe['title']}")
                 print(f"   ID: {recipe['id']}")
+                if 'missingIngredients' in recipe:
+                    if recipe['missingIngredients']:
+                        print(f"   Missing ({recipe['missingCount']}): {', '.join(recipe['missingIngredients'])}")
+                    else:
+                        print("   ✅ You have everything!")
                 print()
         
         print(f"Found {len(recipes)} recipe(s)")
@@ -415,7 +1211,7 @@ class RecipeBookUI:
         self.clear_screen()
         self.print_header("UPDATE RECIPE")
         
-        recipe_id = self.input_with_prompt("Enter Recipe ID to update")
+        recipe_id = self.prompt_recipe_id("Enter Recipe ID to update")
         recipe = self.manager.get_recipe(recipe_id)
         
         if not recipe:
@@ -444,7 +1240,9 @@ class RecipeBookUI:
             print("Invalid servings number, keeping original")
         
         if updates:
-            success = self.manager.update_recipe(recipe_id, self.user_id, **updates)
+            success = self.manager.update_recipe(recipe_id, self.user_id,
+                                                 expected_update_time=recipe.get('updateTime'),
+                                                 **updates)
             if success:
                 print(f"\n✅ Recipe updated successfully!")
             else:
@@ -458,7 +1256,7 @@ class RecipeBookUI:
         self.clear_screen()
         self.print_header("DELETE RECIPE")
         
-        recipe_id = self.input_with_prompt("Enter Recipe ID to delete")
+        recipe_id = self.prompt_recipe_id("Enter Recipe ID to delete")
         recipe = self.manager.get_recipe(recipe_id)
         
         if not recipe:
@@ -485,7 +1283,7 @@ class RecipeBookUI:
         self.clear_screen()
         self.print_header("TOGGLE FAVORITE")
         
-        recipe_id = self.input_with_prompt("Enter Recipe ID")
+        recipe_id = self.prompt_recipe_id("Enter Recipe ID")
         recipe = self.manager.get_recipe(recipe_id)
         
         if not recipe:
@@ -577,15 +1375,24 @@ def main():
     
     user_id = 'Pward20'
     
+    # Set RECIPE_BOOK_DB to a SQLite file path to work offline instead of Firebase
+    local_db_path = os.environ.get('RECIPE_BOOK_DB')
+    
     print("\n🍳 Welcome to Recipe Book Manager! 🍳\n")
     
+    if local_db_path:
+        ui = RecipeBookUI(None, user_id, storage=SQLiteStorage(local_db_path),
+                          search_index_dir=local_db_path + '.search')
+        ui.run()
+        return
+    
     if not os.path.exists(credentials_path):
         print(f"❌ Error: Credentials file not found at: {credentials_path}")
         print("\nPlease update the credentials_path in the code.")
         return
     
     try:
-        ui = RecipeBookUI(credentials_path, user_id)
+        ui = RecipeBookUI(credentials_path, user_id, search_index_dir=SEARCH_INDEX_DIR)
         ui.run()
     except Exception as e:
         print(f"\n❌ Error: {e}")
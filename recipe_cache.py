@@ -0,0 +1,66 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class RecipeCache:
+    """Bounded LRU cache of recipe dicts with a time-to-live per entry.
+
+    Entries are copied on the way in and on the way out, so callers can
+    annotate the dicts they get back (as get_user_favorites does) without
+    corrupting the cached copy.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, recipe_id: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(recipe_id)
+            if entry is not None:
+                expires_at, recipe = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(recipe_id)
+                    self.hits += 1
+                    return copy.deepcopy(recipe)
+                del self._entries[recipe_id]
+            self.misses += 1
+            return None
+
+    def put(self, recipe_id: str, recipe: Dict) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[recipe_id] = (self._clock() + self.ttl, copy.deepcopy(recipe))
+            self._entries.move_to_end(recipe_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, recipe_id: str) -> None:
+        with self._lock:
+            self._entries.pop(recipe_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'hitRate': self.hits / lookups if lookups else 0.0,
+        }
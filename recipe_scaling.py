@@ -0,0 +1,178 @@
+import math
+from fractions import Fraction
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ingredient_parser import parse_ingredients
+from unit_conversion import display_units, merge_rows
+
+
+# Units written as abbreviations, which stay the same in the plural
+ABBREVIATED_UNITS = {'tbsp', 'tsp', 'fl oz', 'oz', 'lb', 'g', 'kg', 'ml', 'l'}
+
+# Units measured in amounts too small for fractions to be useful
+WHOLE_NUMBER_UNITS = {'g', 'ml'}
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Recipe scaling requires numpy: pip install numpy")
+
+
+def round_to_kitchen_fractions(values, whole_units=None):
+    """Round to what a cook can measure: eighths below 1, quarters below 4,
+    halves below 10 and whole numbers above.
+
+    whole_units marks entries (grams, millilitres) that are always rounded
+    to whole numbers. Positive amounts never round down to zero, and NaN
+    (no quantity) stays NaN.
+    """
+    _require_numpy()
+    values = np.asarray(values, dtype=float)
+    steps = np.select([values < 1, values < 4, values < 10], [0.125, 0.25, 0.5], default=1.0)
+    if whole_units is not None:
+        steps = np.where(whole_units, 1.0, steps)
+    rounded = np.round(values / steps) * steps
+    return np.where((rounded == 0) & (values > 0), steps, rounded)
+
+
+def format_quantity(value: float) -> str:
+    """2.5 -> '2 1/2', 0.375 -> '3/8', 3.0 -> '3'"""
+    whole = int(value)
+    fraction = Fraction(value - whole).limit_denominator(8)
+    if fraction == 1:
+        whole, fraction = whole + 1, Fraction(0)
+    if not fraction:
+        return str(whole)
+    return f"{whole} {fraction}" if whole else str(fraction)
+
+
+def format_ingredient(row: Dict) -> str:
+    """Ingredient line for a parsed row, e.g. '2 1/2 cups flour, sifted'"""
+    parts = []
+    if row.get('quantity') is not None:
+        amount = format_quantity(row['quantity'])
+        if row.get('quantityMax') is not None:
+            amount += '-' + format_quantity(row['quantityMax'])
+        parts.append(amount)
+
+        unit = row.get('unit')
+        if unit:
+            if unit not in ABBREVIATED_UNITS and (row.get('quantityMax') or row['quantity']) > 1:
+                unit += 'es' if unit.endswith(('ch', 'sh')) else 's'
+            parts.append(unit)
+    parts.append(row.get('item', ''))
+
+    line = ' '.join(part for part in parts if part)
+    if row.get('note'):
+        line += f", {row['note']}"
+    return line
+
+
+def ingredient_rows(recipe: Dict) -> List[Dict]:
+    """The recipe's stored 'parsedIngredients', or its ingredients parsed now"""
+    ingredients = recipe.get('ingredients') or []
+    parsed = recipe.get('parsedIngredients')
+    if parsed is None or len(parsed) != len(ingredients):
+        parsed = parse_ingredients(ingredients)
+    return parsed
+
+
+def _scale_factor(recipe: Dict, target_servings: float) -> float:
+    if target_servings <= 0:
+        raise ValueError("Target servings must be positive")
+    servings = recipe.get('servings')
+    if not servings or servings <= 0:
+        raise ValueError(f"Recipe '{recipe.get('id')}' has no servings to scale from")
+    return target_servings / servings
+
+
+def scale_recipes(recipes: List[Dict], target_servings: List[float],
+                  normalize_units: bool = False) -> List[Dict]:
+    """Scale each recipe to its target servings in one vectorized pass.
+
+    The quantities of every recipe are laid out in a single array, so a
+    whole meal plan is multiplied and rounded with one NumPy operation
+    each. Returns, per recipe, its 'id', 'title', the new 'servings',
+    'originalServings', 'scaleFactor', the scaled 'parsedIngredients' and
+    the matching 'ingredients' lines. Lines without a quantity are kept
+    as they were. normalize_units=True also rewrites each amount into the
+    friendliest unit of its system, so 16 tbsp comes out as 1 cup.
+    """
+    _require_numpy()
+    rows_per_recipe = [ingredient_rows(recipe) for recipe in recipes]
+    factors = np.array([_scale_factor(recipe, target)
+                        for recipe, target in zip(recipes, target_servings)], dtype=float)
+    counts = np.array([len(rows) for rows in rows_per_recipe], dtype=int)
+    rows = [row for recipe_rows in rows_per_recipe for row in recipe_rows]
+
+    def column(field: str):
+        return np.array([np.nan if row.get(field) is None else row[field] for row in rows],
+                        dtype=float)
+
+    row_factors = np.repeat(factors, counts)
+    quantities = column('quantity') * row_factors
+    maxima = column('quantityMax') * row_factors
+    units = [row.get('unit') for row in rows]
+    if normalize_units:
+        units, unit_factors = display_units(quantities, units)
+        quantities = quantities * unit_factors
+        maxima = maxima * unit_factors
+
+    whole_units = np.array([unit in WHOLE_NUMBER_UNITS for unit in units], dtype=bool)
+    quantities = round_to_kitchen_fractions(quantities, whole_units).tolist()
+    maxima = round_to_kitchen_fractions(maxima, whole_units).tolist()
+
+    scaled = []
+    bounds = np.concatenate([[0], np.cumsum(counts)]).tolist()
+    for index, recipe in enumerate(recipes):
+        raw_lines = recipe.get('ingredients') or []
+        scaled_rows, lines = [], []
+        for offset in range(bounds[index], bounds[index + 1]):
+            row = dict(rows[offset])
+            if row.get('quantity') is None:
+                scaled_rows.append(row)
+                lines.append(raw_lines[offset - bounds[index]])
+                continue
+            row['unit'] = units[offset]
+            row['quantity'] = quantities[offset]
+            row['quantityMax'] = None if math.isnan(maxima[offset]) else maxima[offset]
+            scaled_rows.append(row)
+            lines.append(format_ingredient(row))
+
+        scaled.append({
+            'id': recipe.get('id'),
+            'title': recipe.get('title'),
+            'servings': target_servings[index],
+            'originalServings': recipe.get('servings'),
+            'scaleFactor': float(factors[index]),
+            'parsedIngredients': scaled_rows,
+            'ingredients': lines,
+        })
+
+    return scaled
+
+
+def shopping_list(recipes: List[Dict], target_servings: List[float]) -> List[Dict]:
+    """Scale the recipes, then add up their ingredients across units.
+
+    See unit_conversion.merge_rows; each entry's 'sources' are the IDs of
+    the recipes that need it, and its 'line' is ready to print.
+    """
+    rows = []
+    for recipe in scale_recipes(recipes, target_servings):
+        rows.extend({**row, 'source': recipe['id']} for row in recipe['parsedIngredients'])
+
+    merged = merge_rows(rows)
+    amounts = np.array([np.nan if entry['quantity'] is None else entry['quantity']
+                        for entry in merged], dtype=float)
+    whole_units = np.array([entry['unit'] in WHOLE_NUMBER_UNITS for entry in merged], dtype=bool)
+    for entry, amount in zip(merged, round_to_kitchen_fractions(amounts, whole_units).tolist()):
+        if entry['quantity'] is not None:
+            entry['quantity'] = amount
+        entry['line'] = format_ingredient(entry)
+    return merged
@@ -0,0 +1,1161 @@
+import copy
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+    from google.cloud.firestore_v1.field_path import FieldPath
+except ImportError:
+    firebase_admin = None
+
+
+# Documents per batched get_all() call on Firestore, and per IN (...) list
+# on SQLite.
+GET_ALL_CHUNK_SIZE = 100
+
+# Firestore's limit on operations in one WriteBatch commit
+WRITE_BATCH_SIZE = 500
+
+# gRPC status code BulkWriter reports when create() finds the document taken
+GRPC_ALREADY_EXISTS = 6
+
+# Attempts BulkWriter makes at a write that fails for a transient reason
+BULK_WRITE_MAX_ATTEMPTS = 15
+
+
+def chunked(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def project_fields(data: Dict, fields: Optional[List[str]]) -> Dict:
+    """Keep only the given top-level fields (and 'id'); None keeps everything"""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields or key == 'id'}
+
+
+class RecipeExistsError(Exception):
+    """Raised by create_recipe when the recipe ID is already taken"""
+
+
+class PreconditionFailedError(Exception):
+    """Raised when a write's expected_update_time no longer matches the stored recipe"""
+
+
+def recipe_id_prefix_query(recipes_ref, prefix: str):
+    """ID-only Firestore query for prefix and every prefix-N ID.
+
+    Works on the recipes collection of both the sync and the async client,
+    so the two managers allocate IDs from the same range.
+    """
+    return (
+        recipes_ref
+        .where(FieldPath.document_id(), '>=', recipes_ref.document(prefix))
+        .where(FieldPath.document_id(), '<=', recipes_ref.document(prefix + '-\uf8ff'))
+        .select([])
+    )
+
+
+def group_ids_by_prefix(recipe_ids: Iterable[str], prefixes: Iterable[str]) -> Dict[str, Set[str]]:
+    """Sort IDs under each prefix they equal or extend with '-', as
+    recipe_ids_with_prefix would return them"""
+    groups: Dict[str, Set[str]] = {prefix: set() for prefix in prefixes}
+    for recipe_id in recipe_ids:
+        if recipe_id in groups:
+            groups[recipe_id].add(recipe_id)
+        for position, char in enumerate(recipe_id):
+            if char == '-' and recipe_id[:position] in groups:
+                groups[recipe_id[:position]].add(recipe_id)
+    return groups
+
+
+def encode_document(data: Dict) -> str:
+    """Serialise a document to JSON, keeping timestamps round-trippable"""
+    def default(value):
+        if isinstance(value, datetime):
+            return {'__datetime__': value.isoformat()}
+        raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+    return json.dumps(data, default=default, ensure_ascii=False)
+
+
+def decode_document(text: str) -> Dict:
+    def object_hook(value):
+        if len(value) == 1 and '__datetime__' in value:
+            return datetime.fromisoformat(value['__datetime__'])
+        return value
+
+    return json.loads(text, object_hook=object_hook)
+
+
+class StorageEngine:
+    """Document storage used by RecipeBookManager.
+
+    Recipes and favorites are plain dicts. Every recipe or favorite handed
+    back to the manager carries its document ID under 'id', the same shape
+    RecipeBookManager has always returned.
+    """
+
+    def server_timestamp(self):
+        """Value to store for 'createdAt'/'addedDate' fields"""
+        return datetime.now(timezone.utc)
+
+    def get_recipe(self, recipe_id: str) -> Optional[Dict]:
+        """The recipe with 'id' and its last-write version under 'updateTime'"""
+        raise NotImplementedError
+
+    def get_recipes(self, recipe_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch many recipes at once, keyed by ID; missing IDs are left out"""
+        recipes = {}
+        for recipe_id in dict.fromkeys(recipe_ids):
+            recipe = self.get_recipe(recipe_id)
+            if recipe:
+                recipes[recipe_id] = recipe
+        return recipes
+
+    def create_recipe(self, recipe_id: str, data: Dict) -> None:
+        """Write a new recipe, raising RecipeExistsError if the ID is taken"""
+        raise NotImplementedError
+
+    def create_recipes(self, recipes: Dict[str, Dict]) -> Dict[str, Optional[Exception]]:
+        """Write many new recipes, keyed by ID.
+
+        Returns a map of every ID to None if it was written, or to the error
+        that stopped it (RecipeExistsError when the ID was already taken).
+        One failure does not stop the others.
+        """
+        results = {}
+        for recipe_id, data in recipes.items():
+            try:
+                self.create_recipe(recipe_id, data)
+                results[recipe_id] = None
+            except Exception as error:
+                results[recipe_id] = error
+        return results
+
+    def import_documents(self, recipes: Dict[str, Dict], favorites: Dict[str, Dict]) -> None:
+        """Write recipes and favorites under the given IDs, replacing existing ones"""
+        raise NotImplementedError
+
+    def update_recipe(self, recipe_id: str, updates: Dict,
+                      expected_update_time: datetime = None) -> None:
+        """Apply updates in one write.
+
+        With expected_update_time the write only succeeds if the recipe is
+        still at that version; otherwise PreconditionFailedError is raised.
+        """
+        raise NotImplementedError
+
+    def delete_recipe(self, recipe_id: str, expected_update_time: datetime = None) -> None:
+        """Delete in one write; with expected_update_time, PreconditionFailedError
+        is raised if the recipe has changed or is already gone."""
+        raise NotImplementedError
+
+    def update_recipe_if_owner(self, recipe_id: str, user_id: str, updates: Dict,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        """Atomically check ownership and apply updates.
+
+        Returns the updated recipe, or None if it does not exist or belongs
+        to someone else. Raises PreconditionFailedError if
+        expected_update_time is given and the recipe has changed since.
+        """
+        raise NotImplementedError
+
+    def delete_recipe_if_owner(self, recipe_id: str, user_id: str,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        """Atomic counterpart of update_recipe_if_owner; returns the deleted recipe"""
+        raise NotImplementedError
+
+    def recipe_ids_with_prefix(self, prefix: str) -> Set[str]:
+        """IDs equal to prefix or starting with prefix + '-'"""
+        raise NotImplementedError
+
+    def recipe_ids_with_prefixes(self, prefixes: List[str]) -> Dict[str, Set[str]]:
+        """recipe_ids_with_prefix for many prefixes, keyed by prefix"""
+        return {prefix: self.recipe_ids_with_prefix(prefix) for prefix in dict.fromkeys(prefixes)}
+
+    def query_recipes(self, user_id: str, category: str = None, tag: str = None,
+                      fields: List[str] = None) -> Iterator[Dict]:
+        """The user's recipes; with fields, only those fields (plus 'id') are read"""
+        raise NotImplementedError
+
+    def page_recipes(self, user_id: str, page_size: int, start_after: str = None,
+                     category: str = None, tag: str = None,
+                     fields: List[str] = None) -> List[Dict]:
+        """Up to page_size of the user's recipes in ID order, after start_after"""
+        raise NotImplementedError
+
+    def count_recipes(self, user_id: str, category: str = None, tag: str = None) -> int:
+        return sum(1 for _ in self.query_recipes(user_id, category, tag, fields=[]))
+
+    def recipe_titles(self, user_id: str) -> Dict[str, str]:
+        """Map of recipe ID to title for every recipe the user owns"""
+        return {recipe['id']: recipe['title'] for recipe in self.query_recipes(user_id)}
+
+    def recipe_versions(self, user_id: str) -> Dict[str, Optional[datetime]]:
+        """Map of recipe ID to 'updateTime' for every recipe the user owns"""
+        raise NotImplementedError
+
+    def get_favorite(self, favorite_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def set_favorite(self, favorite_id: str, data: Dict) -> None:
+        raise NotImplementedError
+
+    def delete_favorite(self, favorite_id: str) -> None:
+        raise NotImplementedError
+
+    def query_favorites(self, user_id: str) -> Iterator[Dict]:
+        raise NotImplementedError
+
+    def get_favorites(self, favorite_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch many favorites at once, keyed by ID; missing IDs are left out"""
+        favorites = {}
+        for favorite_id in dict.fromkeys(favorite_ids):
+            favorite = self.get_favorite(favorite_id)
+            if favorite:
+                favorites[favorite_id] = favorite
+        return favorites
+
+    def favorite_recipe_ids(self, user_id: str) -> Set[str]:
+        return {favorite['recipeId'] for favorite in self.query_favorites(user_id)}
+
+    def count_favorites(self, user_id: str) -> int:
+        return len(self.favorite_recipe_ids(user_id))
+
+    def delete_favorites_for_recipe(self, recipe_id: str) -> int:
+        """Remove the recipe from every user's favorites; returns how many were deleted"""
+        raise NotImplementedError
+
+    def page_favorites(self, page_size: int, start_after: str = None) -> List[Dict]:
+        """Up to page_size favorites of all users in ID order, after start_after.
+
+        Only 'id' and 'recipeId' are guaranteed to be present.
+        """
+        raise NotImplementedError
+
+    def existing_recipe_ids(self, recipe_ids: List[str]) -> Set[str]:
+        """Which of recipe_ids still exist"""
+        return set(self.get_recipes(recipe_ids))
+
+    def delete_favorites(self, favorite_ids: List[str]) -> int:
+        for favorite_id in favorite_ids:
+            self.delete_favorite(favorite_id)
+        return len(favorite_ids)
+
+    def watch_recipes(self, user_id: str, callback: Callable) -> Callable[[], None]:
+        """Subscribe to changes in the user's recipes.
+
+        callback receives a list of (change_type, recipe) pairs, where
+        change_type is 'ADDED', 'MODIFIED' or 'REMOVED': first the current
+        recipes as 'ADDED', then every later change. Returns a function that
+        cancels the subscription.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support change listeners")
+
+    def watch_favorites(self, user_id: str, callback: Callable) -> Callable[[], None]:
+        """Like watch_recipes, for the user's favorites"""
+        raise NotImplementedError(f"{type(self).__name__} does not support change listeners")
+
+
+class FirestoreStorage(StorageEngine):
+
+    def __init__(self, credentials_path: str, max_workers: int = 4):
+        if firebase_admin is None:
+            raise ImportError("FirestoreStorage requires firebase-admin: pip install firebase-admin")
+
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(credentials_path)
+            firebase_admin.initialize_app(cred)
+
+        self.db = firestore.client()
+        self.recipes_ref = self.db.collection('recipes')
+        self.favorites_ref = self.db.collection('favorites')
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _to_dict(doc) -> Dict:
+        data = doc.to_dict()
+        data['id'] = doc.id
+        return data
+
+    def server_timestamp(self):
+        return firestore.SERVER_TIMESTAMP
+
+    def _to_versioned_dict(self, doc) -> Dict:
+        data = self._to_dict(doc)
+        data['updateTime'] = doc.update_time
+        return data
+
+    def get_recipe(self, recipe_id: str) -> Optional[Dict]:
+        doc = self.recipes_ref.document(recipe_id).get()
+        return self._to_versioned_dict(doc) if doc.exists else None
+
+    def _get_all(self, collection_ref, doc_ids: List[str],
+                 field_paths: List[str] = None) -> Dict[str, Dict]:
+        """Batched get_all() in chunks, spread over threads when there are several"""
+        unique_ids = list(dict.fromkeys(doc_ids))
+        if not unique_ids:
+            return {}
+
+        def fetch_chunk(chunk: List[str]) -> List[Dict]:
+            refs = [collection_ref.document(doc_id) for doc_id in chunk]
+            docs = self.db.get_all(refs, field_paths=field_paths)
+            return [self._to_versioned_dict(doc) for doc in docs if doc.exists]
+
+        chunks = list(chunked(unique_ids, GET_ALL_CHUNK_SIZE))
+        if len(chunks) == 1 or self.max_workers <= 1:
+            results = map(fetch_chunk, chunks)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                results = list(pool.map(fetch_chunk, chunks))
+
+        return {doc['id']: doc for chunk in results for doc in chunk}
+
+    def get_recipes(self, recipe_ids: List[str]) -> Dict[str, Dict]:
+        return self._get_all(self.recipes_ref, recipe_ids)
+
+    def create_recipe(self, recipe_id: str, data: Dict) -> None:
+        try:
+            self.recipes_ref.document(recipe_id).create(data)
+        except AlreadyExists:
+            raise RecipeExistsError(recipe_id)
+
+    def create_recipes(self, recipes: Dict[str, Dict]) -> Dict[str, Optional[Exception]]:
+        """Stream the creates through a BulkWriter, which batches and throttles them"""
+        results: Dict[str, Optional[Exception]] = {}
+        results_lock = threading.Lock()
+
+        def on_result(reference, _write_result, _bulk_writer) -> None:
+            with results_lock:
+                results[reference.id] = None
+
+        def on_error(failure, _bulk_writer) -> bool:
+            recipe_id = failure.operation.reference.id
+            if failure.code == GRPC_ALREADY_EXISTS:
+                error = RecipeExistsError(recipe_id)
+            elif failure.attempts < BULK_WRITE_MAX_ATTEMPTS:
+                return True
+            else:
+                error = RuntimeError(failure.message)
+            with results_lock:
+                results[recipe_id] = error
+            return False
+
+        bulk_writer = self.db.bulk_writer()
+        bulk_writer.on_write_result(on_result)
+        bulk_writer.on_write_error(on_error)
+        for recipe_id, data in recipes.items():
+            bulk_writer.create(self.recipes_ref.document(recipe_id), data)
+        bulk_writer.close()
+
+        return {recipe_id: results.get(recipe_id) for recipe_id in recipes}
+
+    def import_documents(self, recipes: Dict[str, Dict], favorites: Dict[str, Dict]) -> None:
+        """One WriteBatch commit per WRITE_BATCH_SIZE documents"""
+        writes = ([(self.recipes_ref.document(recipe_id), data) for recipe_id, data in recipes.items()]
+                  + [(self.favorites_ref.document(favorite_id), data)
+                     for favorite_id, data in favorites.items()])
+        for chunk in chunked(writes, WRITE_BATCH_SIZE):
+            batch = self.db.batch()
+            for ref, data in chunk:
+                batch.set(ref, data)
+            batch.commit()
+
+    def _write_option(self, expected_update_time: Optional[datetime]):
+        if expected_update_time is None:
+            return None
+        return self.db.write_option(last_update_time=expected_update_time)
+
+    def update_recipe(self, recipe_id: str, updates: Dict,
+                      expected_update_time: datetime = None) -> None:
+        try:
+            self.recipes_ref.document(recipe_id).update(
+                updates, option=self._write_option(expected_update_time))
+        except (FailedPrecondition, NotFound):
+            if expected_update_time is None:
+                raise
+            raise PreconditionFailedError(recipe_id)
+
+    def delete_recipe(self, recipe_id: str, expected_update_time: datetime = None) -> None:
+        try:
+            self.recipes_ref.document(recipe_id).delete(
+                option=self._write_option(expected_update_time))
+        except FailedPrecondition:
+            raise PreconditionFailedError(recipe_id)
+
+    def _run_owner_transaction(self, recipe_id: str, user_id: str,
+                               expected_update_time: Optional[datetime],
+                               apply: Callable) -> Optional[Dict]:
+        """Read the recipe and write it back inside one Firestore transaction"""
+        recipe_ref = self.recipes_ref.document(recipe_id)
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = recipe_ref.get(transaction=transaction)
+            if not snapshot.exists or snapshot.get('userId') != user_id:
+                return None
+            if expected_update_time is not None and snapshot.update_time != expected_update_time:
+                raise PreconditionFailedError(recipe_id)
+            apply(transaction, recipe_ref)
+            return self._to_dict(snapshot)
+
+        return run(self.db.transaction())
+
+    def update_recipe_if_owner(self, recipe_id: str, user_id: str, updates: Dict,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        recipe = self._run_owner_transaction(
+            recipe_id, user_id, expected_update_time,
+            lambda transaction, recipe_ref: transaction.update(recipe_ref, updates))
+        if recipe is not None:
+            recipe.update(updates)
+        return recipe
+
+    def delete_recipe_if_owner(self, recipe_id: str, user_id: str,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        return self._run_owner_transaction(
+            recipe_id, user_id, expected_update_time,
+            lambda transaction, recipe_ref: transaction.delete(recipe_ref))
+
+    def recipe_ids_with_prefix(self, prefix: str) -> Set[str]:
+        return {doc.id for doc in recipe_id_prefix_query(self.recipes_ref, prefix).stream()}
+
+    def recipe_ids_with_prefixes(self, prefixes: List[str]) -> Dict[str, Set[str]]:
+        """One range query per prefix, spread over threads when there are several"""
+        unique_prefixes = list(dict.fromkeys(prefixes))
+        if len(unique_prefixes) <= 1 or self.max_workers <= 1:
+            return super().recipe_ids_with_prefixes(unique_prefixes)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_prefixes))) as pool:
+            return dict(zip(unique_prefixes, pool.map(self.recipe_ids_with_prefix, unique_prefixes)))
+
+    def _recipes_query(self, user_id: str, category: str = None, tag: str = None,
+                       fields: List[str] = None):
+        query = self.recipes_ref.where('userId', '==', user_id)
+
+        if category:
+            query = query.where('category', '==', category)
+
+        if tag:
+            query = query.where('tags', 'array_contains', tag)
+
+        if fields is not None:
+            query = query.select(fields)
+
+        return query
+
+    def query_recipes(self, user_id: str, category: str = None, tag: str = None,
+                      fields: List[str] = None) -> Iterator[Dict]:
+        for doc in self._recipes_query(user_id, category, tag, fields).stream():
+            yield self._to_dict(doc)
+
+    def page_recipes(self, user_id: str, page_size: int, start_after: str = None,
+                     category: str = None, tag: str = None,
+                     fields: List[str] = None) -> List[Dict]:
+        query = self._recipes_query(user_id, category, tag, fields).order_by(FieldPath.document_id())
+        if start_after:
+            query = query.start_after({FieldPath.document_id(): start_after})
+        return [self._to_dict(doc) for doc in query.limit(page_size).stream()]
+
+    @staticmethod
+    def _count(query) -> int:
+        """Server-side COUNT aggregation; no documents are downloaded"""
+        return int(query.count().get()[0][0].value)
+
+    def count_recipes(self, user_id: str, category: str = None, tag: str = None) -> int:
+        return self._count(self._recipes_query(user_id, category, tag))
+
+    def recipe_titles(self, user_id: str) -> Dict[str, str]:
+        query = self.recipes_ref.where('userId', '==', user_id).select(['title'])
+        return {doc.id: doc.get('title') for doc in query.stream()}
+
+    def recipe_versions(self, user_id: str) -> Dict[str, Optional[datetime]]:
+        query = self.recipes_ref.where('userId', '==', user_id).select([])
+        return {doc.id: doc.update_time for doc in query.stream()}
+
+    def get_favorite(self, favorite_id: str) -> Optional[Dict]:
+        doc = self.favorites_ref.document(favorite_id).get()
+        return self._to_dict(doc) if doc.exists else None
+
+    def set_favorite(self, favorite_id: str, data: Dict) -> None:
+        self.favorites_ref.document(favorite_id).set(data)
+
+    def delete_favorite(self, favorite_id: str) -> None:
+        self.favorites_ref.document(favorite_id).delete()
+
+    def query_favorites(self, user_id: str) -> Iterator[Dict]:
+        query = self.favorites_ref.where('userId', '==', user_id)
+        for doc in query.stream():
+            yield self._to_dict(doc)
+
+    def get_favorites(self, favorite_ids: List[str]) -> Dict[str, Dict]:
+        return self._get_all(self.favorites_ref, favorite_ids, field_paths=['recipeId', 'userId'])
+
+    def favorite_recipe_ids(self, user_id: str) -> Set[str]:
+        query = self.favorites_ref.where('userId', '==', user_id).select(['recipeId'])
+        return {doc.get('recipeId') for doc in query.stream()}
+
+    def count_favorites(self, user_id: str) -> int:
+        return self._count(self.favorites_ref.where('userId', '==', user_id))
+
+    def _batched_delete(self, refs) -> int:
+        """Delete documents in WriteBatch commits of WRITE_BATCH_SIZE"""
+        deleted = 0
+        batch = self.db.batch()
+        pending = 0
+        for ref in refs:
+            batch.delete(ref)
+            pending += 1
+            if pending == WRITE_BATCH_SIZE:
+                batch.commit()
+                deleted += pending
+                batch = self.db.batch()
+                pending = 0
+        if pending:
+            batch.commit()
+            deleted += pending
+        return deleted
+
+    def delete_favorites_for_recipe(self, recipe_id: str) -> int:
+        query = self.favorites_ref.where('recipeId', '==', recipe_id).select([])
+        return self._batched_delete(doc.reference for doc in query.stream())
+
+    def page_favorites(self, page_size: int, start_after: str = None) -> List[Dict]:
+        query = self.favorites_ref.select(['recipeId']).order_by(FieldPath.document_id())
+        if start_after:
+            query = query.start_after({FieldPath.document_id(): start_after})
+        return [self._to_dict(doc) for doc in query.limit(page_size).stream()]
+
+    def existing_recipe_ids(self, recipe_ids: List[str]) -> Set[str]:
+        # An empty field mask returns existence without any recipe fields
+        return set(self._get_all(self.recipes_ref, recipe_ids, field_paths=[]))
+
+    def delete_favorites(self, favorite_ids: List[str]) -> int:
+        return self._batched_delete(self.favorites_ref.document(favorite_id)
+                                    for favorite_id in favorite_ids)
+
+    def _watch(self, query, callback: Callable) -> Callable[[], None]:
+        def on_snapshot(docs, changes, read_time):
+            callback([(change.type.name, self._to_versioned_dict(change.document)) for change in changes])
+
+        return query.on_snapshot(on_snapshot).unsubscribe
+
+    def watch_recipes(self, user_id: str, callback: Callable) -> Callable[[], None]:
+        return self._watch(self.recipes_ref.where('userId', '==', user_id), callback)
+
+    def watch_favorites(self, user_id: str, callback: Callable) -> Callable[[], None]:
+        return self._watch(self.favorites_ref.where('userId', '==', user_id), callback)
+
+
+class MemoryStorage(StorageEngine):
+    """Process-local storage for offline runs, tests and benchmarks"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._recipes: Dict[str, Dict] = {}
+        self._favorites: Dict[str, Dict] = {}
+        self._recipes_by_user: Dict[str, Set[str]] = {}
+        self._favorites_by_user: Dict[str, Set[str]] = {}
+        self._listeners: Dict[tuple, List[Callable]] = {}
+        self._update_times: Dict[str, datetime] = {}
+
+    def _touch(self, recipe_id: str) -> None:
+        """Give the recipe a new, strictly later update time"""
+        now = datetime.now(timezone.utc)
+        previous = self._update_times.get(recipe_id)
+        if previous is not None and now <= previous:
+            now = previous + timedelta(microseconds=1)
+        self._update_times[recipe_id] = now
+
+    def _check_version(self, recipe_id: str, expected_update_time: Optional[datetime]) -> None:
+        if expected_update_time is not None and self._update_times.get(recipe_id) != expected_update_time:
+            raise PreconditionFailedError(recipe_id)
+
+    @staticmethod
+    def _with_id(doc_id: str, data: Dict) -> Dict:
+        result = copy.deepcopy(data)
+        result['id'] = doc_id
+        return result
+
+    def _document(self, kind: str, doc_id: str, data: Dict) -> Dict:
+        """A copy of the document as listeners see it, recipes with their 'updateTime'"""
+        document = self._with_id(doc_id, data)
+        if kind == 'recipes' and doc_id in self._update_times:
+            document['updateTime'] = self._update_times[doc_id]
+        return document
+
+    def _notify(self, kind: str, user_id: str, change_type: str,
+                doc_id: str, data: Dict) -> None:
+        for callback in list(self._listeners.get((kind, user_id), ())):
+            callback([(change_type, self._document(kind, doc_id, data))])
+
+    def _watch(self, kind: str, user_id: str, callback: Callable,
+               current: Dict[str, Dict]) -> Callable[[], None]:
+        with self._lock:
+            self._listeners.setdefault((kind, user_id), []).append(callback)
+            callback([('ADDED', self._document(kind, doc_id, data)) for doc_id, data in sorted(current.items())])
+
+        def unsubscribe():
+            with self._lock:
+                listeners = self._listeners.get((kind, user_id), [])
+                if callback in listeners:
+                    listeners.remove(callback)
+
+        return unsubscribe
+
+    def watch_recipes(self, user_id: str, callback: Callable) -> Callable[[], None]:
+        with self._lock:
+            current = {recipe_id: self._recipes[recipe_id]
+                       for recipe_id in self._recipes_by_user.get(user_id, ())}
+            return self._watch('recipes', user_id, callback, current)
+
+    def watch_favorites(self, user_id: str, callback: Callable) -> Callable[[], None]:
+        with self._lock:
+            current = {favorite_id: self._favorites[favorite_id]
+                       for favorite_id in self._favorites_by_user.get(user_id, ())}
+            return self._watch('favorites', user_id, callback, current)
+
+    def get_recipe(self, recipe_id: str) -> Optional[Dict]:
+        with self._lock:
+            data = self._recipes.get(recipe_id)
+            if data is None:
+                return None
+            return self._document('recipes', recipe_id, data)
+
+    def create_recipe(self, recipe_id: str, data: Dict) -> None:
+        with self._lock:
+            if recipe_id in self._recipes:
+                raise RecipeExistsError(recipe_id)
+            self._recipes[recipe_id] = copy.deepcopy(data)
+            self._recipes_by_user.setdefault(data.get('userId'), set()).add(recipe_id)
+            self._touch(recipe_id)
+            self._notify('recipes', data.get('userId'), 'ADDED', recipe_id, data)
+
+    def create_recipes(self, recipes: Dict[str, Dict]) -> Dict[str, Optional[Exception]]:
+        with self._lock:
+            return super().create_recipes(recipes)
+
+    def import_documents(self, recipes: Dict[str, Dict], favorites: Dict[str, Dict]) -> None:
+        with self._lock:
+            for recipe_id, data in recipes.items():
+                self.delete_recipe(recipe_id)
+                self.create_recipe(recipe_id, data)
+            for favorite_id, data in favorites.items():
+                self.set_favorite(favorite_id, data)
+
+    def update_recipe(self, recipe_id: str, updates: Dict,
+                      expected_update_time: datetime = None) -> None:
+        with self._lock:
+            self._check_version(recipe_id, expected_update_time)
+            data = self._recipes[recipe_id]
+            old_user_id = data.get('userId')
+            data.update(copy.deepcopy(updates))
+            self._touch(recipe_id)
+            if data.get('userId') != old_user_id:
+                self._recipes_by_user[old_user_id].discard(recipe_id)
+                self._recipes_by_user.setdefault(data.get('userId'), set()).add(recipe_id)
+                self._notify('recipes', old_user_id, 'REMOVED', recipe_id, data)
+                self._notify('recipes', data.get('userId'), 'ADDED', recipe_id, data)
+            else:
+                self._notify('recipes', old_user_id, 'MODIFIED', recipe_id, data)
+
+    def delete_recipe(self, recipe_id: str, expected_update_time: datetime = None) -> None:
+        with self._lock:
+            # A recipe that is already gone fails the check, as on Firestore
+            self._check_version(recipe_id, expected_update_time)
+            data = self._recipes.pop(recipe_id, None)
+            if data is not None:
+                self._update_times.pop(recipe_id, None)
+                self._recipes_by_user[data.get('userId')].discard(recipe_id)
+                self._notify('recipes', data.get('userId'), 'REMOVED', recipe_id, data)
+
+    def update_recipe_if_owner(self, recipe_id: str, user_id: str, updates: Dict,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        with self._lock:
+            data = self._recipes.get(recipe_id)
+            if data is None or data.get('userId') != user_id:
+                return None
+            self.update_recipe(recipe_id, updates, expected_update_time)
+            return self._with_id(recipe_id, data)
+
+    def delete_recipe_if_owner(self, recipe_id: str, user_id: str,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        with self._lock:
+            data = self._recipes.get(recipe_id)
+            if data is None or data.get('userId') != user_id:
+                return None
+            self.delete_recipe(recipe_id, expected_update_time)
+            return self._with_id(recipe_id, data)
+
+    def page_recipes(self, user_id: str, page_size: int, start_after: str = None,
+                     category: str = None, tag: str = None,
+                     fields: List[str] = None) -> List[Dict]:
+        with self._lock:
+            page = []
+            for recipe_id in sorted(self._recipes_by_user.get(user_id, ())):
+                if len(page) >= page_size:
+                    break
+                if start_after is not None and recipe_id <= start_after:
+                    continue
+                data = self._recipes[recipe_id]
+                if category and data.get('category') != category:
+                    continue
+                if tag and tag not in data.get('tags', []):
+                    continue
+                page.append(project_fields(self._with_id(recipe_id, data), fields))
+            return page
+
+    def recipe_ids_with_prefix(self, prefix: str) -> Set[str]:
+        with self._lock:
+            return {
+                recipe_id for recipe_id in self._recipes
+                if recipe_id == prefix or recipe_id.startswith(prefix + '-')
+            }
+
+    def recipe_ids_with_prefixes(self, prefixes: List[str]) -> Dict[str, Set[str]]:
+        with self._lock:
+            return group_ids_by_prefix(self._recipes, prefixes)
+
+    def query_recipes(self, user_id: str, category: str = None, tag: str = None,
+                      fields: List[str] = None) -> Iterator[Dict]:
+        with self._lock:
+            matches = []
+            for recipe_id in sorted(self._recipes_by_user.get(user_id, ())):
+                data = self._recipes[recipe_id]
+                if category and data.get('category') != category:
+                    continue
+                if tag and tag not in data.get('tags', []):
+                    continue
+                matches.append(project_fields(self._with_id(recipe_id, data), fields))
+        return iter(matches)
+
+    def recipe_versions(self, user_id: str) -> Dict[str, Optional[datetime]]:
+        with self._lock:
+            return {recipe_id: self._update_times[recipe_id]
+                    for recipe_id in self._recipes_by_user.get(user_id, ())}
+
+    def get_favorite(self, favorite_id: str) -> Optional[Dict]:
+        with self._lock:
+            data = self._favorites.get(favorite_id)
+            return self._with_id(favorite_id, data) if data is not None else None
+
+    def set_favorite(self, favorite_id: str, data: Dict) -> None:
+        with self._lock:
+            previous = self._favorites.get(favorite_id)
+            if previous is not None:
+                self._favorites_by_user[previous.get('userId')].discard(favorite_id)
+            self._favorites[favorite_id] = copy.deepcopy(data)
+            self._favorites_by_user.setdefault(data.get('userId'), set()).add(favorite_id)
+            change_type = 'ADDED' if previous is None else 'MODIFIED'
+            self._notify('favorites', data.get('userId'), change_type, favorite_id, data)
+
+    def delete_favorite(self, favorite_id: str) -> None:
+        with self._lock:
+            data = self._favorites.pop(favorite_id, None)
+            if data is not None:
+                self._favorites_by_user[data.get('userId')].discard(favorite_id)
+                self._notify('favorites', data.get('userId'), 'REMOVED', favorite_id, data)
+
+    def query_favorites(self, user_id: str) -> Iterator[Dict]:
+        with self._lock:
+            matches = [
+                self._with_id(favorite_id, self._favorites[favorite_id])
+                for favorite_id in sorted(self._favorites_by_user.get(user_id, ()))
+            ]
+        return iter(matches)
+
+    def delete_favorites_for_recipe(self, recipe_id: str) -> int:
+        with self._lock:
+            favorite_ids = [
+                favorite_id for favorite_id, data in self._favorites.items()
+                if data.get('recipeId') == recipe_id
+            ]
+            for favorite_id in favorite_ids:
+                self.delete_favorite(favorite_id)
+            return len(favorite_ids)
+
+    def page_favorites(self, page_size: int, start_after: str = None) -> List[Dict]:
+        with self._lock:
+            favorite_ids = sorted(
+                favorite_id for favorite_id in self._favorites
+                if start_after is None or favorite_id > start_after
+            )[:page_size]
+            return [self._with_id(favorite_id, self._favorites[favorite_id])
+                    for favorite_id in favorite_ids]
+
+    def existing_recipe_ids(self, recipe_ids: List[str]) -> Set[str]:
+        with self._lock:
+            return {recipe_id for recipe_id in recipe_ids if recipe_id in self._recipes}
+
+
+class SQLiteStorage(StorageEngine):
+    """Local-disk storage with indexes on owner, category, tag and recipe"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS recipes (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            category TEXT,
+            data TEXT NOT NULL,
+            update_time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_recipes_user_category
+            ON recipes (user_id, category);
+        CREATE TABLE IF NOT EXISTS recipe_tags (
+            tag TEXT NOT NULL,
+            recipe_id TEXT NOT NULL,
+            PRIMARY KEY (tag, recipe_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_recipe_tags_recipe
+            ON recipe_tags (recipe_id);
+        CREATE TABLE IF NOT EXISTS favorites (
+            id TEXT PRIMARY KEY,
+            user_id TEXT,
+            recipe_id TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_favorites_user
+            ON favorites (user_id);
+        CREATE INDEX IF NOT EXISTS idx_favorites_recipe
+            ON favorites (recipe_id);
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _row_to_dict(doc_id: str, text: str) -> Dict:
+        data = decode_document(text)
+        data['id'] = doc_id
+        return data
+
+    @classmethod
+    def _versioned_row(cls, doc_id: str, text: str, update_time: str) -> Dict:
+        data = cls._row_to_dict(doc_id, text)
+        data['updateTime'] = datetime.fromisoformat(update_time)
+        return data
+
+    def _projected_row(self, doc_id: str, text: str, fields: Optional[List[str]]) -> Dict:
+        data = self._row_to_dict(doc_id, text)
+        if fields is not None:
+            # json_object() reports missing fields as null; Firestore omits them
+            data = {key: value for key, value in data.items() if value is not None}
+        return data
+
+    def _write_recipe_row(self, recipe_id: str, data: Dict) -> None:
+        previous = self._stored_update_time(recipe_id)
+        update_time = datetime.now(timezone.utc)
+        if previous is not None and update_time <= previous:
+            update_time = previous + timedelta(microseconds=1)
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO recipes (id, user_id, category, data, update_time)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (recipe_id, data.get('userId'), data.get('category'), encode_document(data),
+             update_time.isoformat())
+        )
+        self.conn.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO recipe_tags (tag, recipe_id) VALUES (?, ?)",
+            [(tag, recipe_id) for tag in data.get('tags') or []]
+        )
+
+    def _stored_update_time(self, recipe_id: str) -> Optional[datetime]:
+        row = self.conn.execute(
+            "SELECT update_time FROM recipes WHERE id = ?", (recipe_id,)
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def _check_version(self, recipe_id: str, expected_update_time: Optional[datetime]) -> None:
+        if expected_update_time is not None and self._stored_update_time(recipe_id) != expected_update_time:
+            raise PreconditionFailedError(recipe_id)
+
+    def get_recipe(self, recipe_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data, update_time FROM recipes WHERE id = ?", (recipe_id,)
+            ).fetchone()
+        return self._versioned_row(recipe_id, *row) if row else None
+
+    def get_recipes(self, recipe_ids: List[str]) -> Dict[str, Dict]:
+        recipes = {}
+        for chunk in chunked(list(dict.fromkeys(recipe_ids)), GET_ALL_CHUNK_SIZE):
+            placeholders = ', '.join('?' * len(chunk))
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT id, data, update_time FROM recipes WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+            for doc_id, text, update_time in rows:
+                recipes[doc_id] = self._versioned_row(doc_id, text, update_time)
+        return recipes
+
+    def create_recipe(self, recipe_id: str, data: Dict) -> None:
+        with self._lock, self.conn:
+            exists = self.conn.execute(
+                "SELECT 1 FROM recipes WHERE id = ?", (recipe_id,)
+            ).fetchone()
+            if exists:
+                raise RecipeExistsError(recipe_id)
+            self._write_recipe_row(recipe_id, data)
+
+    def create_recipes(self, recipes: Dict[str, Dict]) -> Dict[str, Optional[Exception]]:
+        """All the inserts in one transaction, with a batched check for taken IDs"""
+        results: Dict[str, Optional[Exception]] = {}
+        with self._lock, self.conn:
+            taken = self.existing_recipe_ids(list(recipes))
+            for recipe_id, data in recipes.items():
+                if recipe_id in taken:
+                    results[recipe_id] = RecipeExistsError(recipe_id)
+                else:
+                    self._write_recipe_row(recipe_id, data)
+                    results[recipe_id] = None
+        return results
+
+    def import_documents(self, recipes: Dict[str, Dict], favorites: Dict[str, Dict]) -> None:
+        with self._lock, self.conn:
+            for recipe_id, data in recipes.items():
+                self._write_recipe_row(recipe_id, data)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO favorites (id, user_id, recipe_id, data) VALUES (?, ?, ?, ?)",
+                [(favorite_id, data.get('userId'), data.get('recipeId'), encode_document(data))
+                 for favorite_id, data in favorites.items()]
+            )
+
+    def _owned_recipe_for_write(self, recipe_id: str, user_id: Optional[str],
+                                expected_update_time: Optional[datetime]) -> Optional[Dict]:
+        """Lock the database for writing and load the recipe if the caller may change it"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        row = self.conn.execute(
+            "SELECT data FROM recipes WHERE id = ?", (recipe_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = decode_document(row[0])
+        if user_id is not None and data.get('userId') != user_id:
+            return None
+        self._check_version(recipe_id, expected_update_time)
+        return data
+
+    def update_recipe(self, recipe_id: str, updates: Dict,
+                      expected_update_time: datetime = None) -> None:
+        with self._lock, self.conn:
+            data = self._owned_recipe_for_write(recipe_id, None, expected_update_time)
+            if data is None:
+                if expected_update_time is not None:
+                    raise PreconditionFailedError(recipe_id)
+                raise KeyError(recipe_id)
+            data.update(updates)
+            self._write_recipe_row(recipe_id, data)
+
+    def delete_recipe(self, recipe_id: str, expected_update_time: datetime = None) -> None:
+        with self._lock, self.conn:
+            if self._owned_recipe_for_write(recipe_id, None, expected_update_time) is None:
+                # A recipe that is already gone fails the check, as on Firestore
+                if expected_update_time is not None:
+                    raise PreconditionFailedError(recipe_id)
+                return
+            self.conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+            self.conn.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+
+    def update_recipe_if_owner(self, recipe_id: str, user_id: str, updates: Dict,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        with self._lock, self.conn:
+            data = self._owned_recipe_for_write(recipe_id, user_id, expected_update_time)
+            if data is None:
+                return None
+            data.update(updates)
+            self._write_recipe_row(recipe_id, data)
+        data['id'] = recipe_id
+        return data
+
+    def delete_recipe_if_owner(self, recipe_id: str, user_id: str,
+                               expected_update_time: datetime = None) -> Optional[Dict]:
+        with self._lock, self.conn:
+            data = self._owned_recipe_for_write(recipe_id, user_id, expected_update_time)
+            if data is None:
+                return None
+            self.conn.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+            self.conn.execute("DELETE FROM recipe_tags WHERE recipe_id = ?", (recipe_id,))
+        data['id'] = recipe_id
+        return data
+
+    def recipe_ids_with_prefix(self, prefix: str) -> Set[str]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id FROM recipes WHERE id = ? OR (id >= ? AND id < ?)",
+                (prefix, prefix + '-', prefix + '.')
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def recipe_ids_with_prefixes(self, prefixes: List[str]) -> Dict[str, Set[str]]:
+        """The ranges of a chunk of prefixes in one query"""
+        unique_prefixes = list(dict.fromkeys(prefixes))
+        recipe_ids = set()
+        for chunk in chunked(unique_prefixes, GET_ALL_CHUNK_SIZE):
+            ranges = ' OR '.join(['id = ? OR (id >= ? AND id < ?)'] * len(chunk))
+            params = [value for prefix in chunk for value in (prefix, prefix + '-', prefix + '.')]
+            with self._lock:
+                rows = self.conn.execute(f"SELECT id FROM recipes WHERE {ranges}", params).fetchall()
+            recipe_ids.update(row[0] for row in rows)
+        return group_ids_by_prefix(recipe_ids, unique_prefixes)
+
+    @staticmethod
+    def _recipes_from_where(user_id: str, category: str = None, tag: str = None):
+        sql = " FROM recipes r"
+        params: List = []
+        if tag:
+            sql += " JOIN recipe_tags t ON t.recipe_id = r.id AND t.tag = ?"
+            params.append(tag)
+        sql += " WHERE r.user_id = ?"
+        params.append(user_id)
+        if category:
+            sql += " AND r.category = ?"
+            params.append(category)
+        return sql, params
+
+    def _select_recipes(self, user_id: str, category: str = None, tag: str = None,
+                        start_after: str = None, limit: int = None,
+                        fields: List[str] = None) -> List[tuple]:
+        params: List = []
+        if fields is None:
+            sql = "SELECT r.id, r.data"
+        else:
+            # Build the projected document inside SQLite so the long
+            # ingredient and instruction arrays are never decoded.
+            pairs = ', '.join('?, json_extract(r.data, ?)' for _ in fields)
+            sql = f"SELECT r.id, json_object({pairs})"
+            for field in fields:
+                params.extend([field, f'$."{field}"'])
+        from_where, where_params = self._recipes_from_where(user_id, category, tag)
+        sql += from_where
+        params.extend(where_params)
+        if start_after is not None:
+            sql += " AND r.id > ?"
+            params.append(start_after)
+        sql += " ORDER BY r.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def query_recipes(self, user_id: str, category: str = None, tag: str = None,
+                      fields: List[str] = None) -> Iterator[Dict]:
+        rows = self._select_recipes(user_id, category, tag, fields=fields)
+        return (self._projected_row(doc_id, text, fields) for doc_id, text in rows)
+
+    def page_recipes(self, user_id: str, page_size: int, start_after: str = None,
+                     category: str = None, tag: str = None,
+                     fields: List[str] = None) -> List[Dict]:
+        rows = self._select_recipes(user_id, category, tag, start_after, page_size, fields)
+        return [self._projected_row(doc_id, text, fields) for doc_id, text in rows]
+
+    def count_recipes(self, user_id: str, category: str = None, tag: str = None) -> int:
+        from_where, params = self._recipes_from_where(user_id, category, tag)
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*)" + from_where, params).fetchone()[0]
+
+    def recipe_titles(self, user_id: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, json_extract(data, '$.title') FROM recipes WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def recipe_versions(self, user_id: str) -> Dict[str, Optional[datetime]]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, update_time FROM recipes WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return {doc_id: datetime.fromisoformat(text) for doc_id, text in rows}
+
+    def get_favorite(self, favorite_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data FROM favorites WHERE id = ?", (favorite_id,)
+            ).fetchone()
+        return self._row_to_dict(favorite_id, row[0]) if row else None
+
+    def set_favorite(self, favorite_id: str, data: Dict) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO favorites (id, user_id, recipe_id, data) VALUES (?, ?, ?, ?)",
+                (favorite_id, data.get('userId'), data.get('recipeId'), encode_document(data))
+            )
+
+    def delete_favorite(self, favorite_id: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM favorites WHERE id = ?", (favorite_id,))
+
+    def query_favorites(self, user_id: str) -> Iterator[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, data FROM favorites WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+        return (self._row_to_dict(doc_id, text) for doc_id, text in rows)
+
+    def get_favorites(self, favorite_ids: List[str]) -> Dict[str, Dict]:
+        favorites = {}
+        for chunk in chunked(list(dict.fromkeys(favorite_ids)), GET_ALL_CHUNK_SIZE):
+            placeholders = ', '.join('?' * len(chunk))
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT id, data FROM favorites WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+            for doc_id, text in rows:
+                favorites[doc_id] = self._row_to_dict(doc_id, text)
+        return favorites
+
+    def favorite_recipe_ids(self, user_id: str) -> Set[str]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT recipe_id FROM favorites WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def count_favorites(self, user_id: str) -> int:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM favorites WHERE user_id = ?", (user_id,)
+            ).fetchone()[0]
+
+    def delete_favorites_for_recipe(self, recipe_id: str) -> int:
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "DELETE FROM favorites WHERE recipe_id = ?", (recipe_id,)
+            ).rowcount
+
+    def page_favorites(self, page_size: int, start_after: str = None) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, recipe_id FROM favorites WHERE id > ? ORDER BY id LIMIT ?",
+                (start_after or '', page_size)
+            ).fetchall()
+        return [{'id': doc_id, 'recipeId': recipe_id} for doc_id, recipe_id in rows]
+
+    def existing_recipe_ids(self, recipe_ids: List[str]) -> Set[str]:
+        existing = set()
+        for chunk in chunked(list(dict.fromkeys(recipe_ids)), GET_ALL_CHUNK_SIZE):
+            placeholders = ', '.join('?' * len(chunk))
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT id FROM recipes WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+            existing.update(row[0] for row in rows)
+        return existing
+
+    def delete_favorites(self, favorite_ids: List[str]) -> int:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "DELETE FROM favorites WHERE id = ?", [(favorite_id,) for favorite_id in favorite_ids]
+            )
+        return len(favorite_ids)
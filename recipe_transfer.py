@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import IO, Callable, Dict, Set
+
+from recipe_storage import WRITE_BATCH_SIZE, StorageEngine, decode_document, encode_document
+
+
+# Value of "kind" on each line of an export file
+RECIPE_KIND = 'recipe'
+FAVORITE_KIND = 'favorite'
+
+
+class RecipeTransfer:
+    """Streams recipes and favorites to and from JSON Lines.
+
+    Every line holds one document as {"kind": ..., "id": ..., "data": ...},
+    with timestamps (including server-set ones such as 'createdAt') written
+    as {"__datetime__": iso}. Export writes documents as storage yields
+    them. Import groups lines into batches of batch_size and keeps at most
+    max_in_flight batches writing at once, so memory use does not grow
+    with the size of the file.
+    """
+
+    def __init__(self, storage: StorageEngine, batch_size: int = WRITE_BATCH_SIZE,
+                 max_in_flight: int = 4):
+        self.storage = storage
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+
+    def export_user(self, user_id: str, fp: IO[str],
+                    progress: Callable[[Dict], None] = None) -> Dict:
+        """Write the user's recipes, then their favorites, to fp.
+
+        Returns (and passes to progress every batch_size documents) a report
+        with the documents written so far and the rate.
+        """
+        started = time.monotonic()
+        counts = {RECIPE_KIND: 0, FAVORITE_KIND: 0}
+        sources = ((RECIPE_KIND, self.storage.query_recipes(user_id)),
+                   (FAVORITE_KIND, self.storage.query_favorites(user_id)))
+
+        for kind, documents in sources:
+            for document in documents:
+                doc_id = document.pop('id')
+                document.pop('updateTime', None)
+                fp.write(encode_document({'kind': kind, 'id': doc_id, 'data': document}) + '\n')
+                counts[kind] += 1
+                if progress and sum(counts.values()) % self.batch_size == 0:
+                    progress(self._report(counts, started, complete=False))
+
+        report = self._report(counts, started, complete=True)
+        if progress:
+            progress(report)
+        return report
+
+    def import_file(self, fp: IO[str], progress: Callable[[Dict], None] = None,
+                    on_batch: Callable[[Dict[str, Dict]], None] = None) -> Dict:
+        """Write every document in fp, replacing documents with the same ID.
+
+        on_batch receives the recipes of each batch once it is stored.
+        Returns (and passes to progress after each batch) a report like
+        export_user's. A bad line or failed batch raises once the batches
+        already in flight have finished.
+        """
+        started = time.monotonic()
+        counts = {RECIPE_KIND: 0, FAVORITE_KIND: 0}
+        in_flight: Set[Future] = set()
+
+        def write_batch(recipes: Dict[str, Dict], favorites: Dict[str, Dict]) -> Dict[str, int]:
+            self.storage.import_documents(recipes, favorites)
+            if on_batch:
+                on_batch(recipes)
+            return {RECIPE_KIND: len(recipes), FAVORITE_KIND: len(favorites)}
+
+        def collect(done: Set[Future]) -> None:
+            for future in done:
+                for kind, written in future.result().items():
+                    counts[kind] += written
+                if progress:
+                    progress(self._report(counts, started, complete=False))
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            batch = {RECIPE_KIND: {}, FAVORITE_KIND: {}}
+            pending = 0
+            for line_number, line in enumerate(fp, start=1):
+                if not line.strip():
+                    continue
+                entry = decode_document(line)
+                if entry.get('kind') not in batch:
+                    raise ValueError(f"Line {line_number}: unknown document kind {entry.get('kind')!r}")
+                batch[entry['kind']][entry['id']] = entry['data']
+                pending += 1
+
+                if pending == self.batch_size:
+                    if len(in_flight) >= self.max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    in_flight.add(pool.submit(write_batch, batch[RECIPE_KIND], batch[FAVORITE_KIND]))
+                    batch = {RECIPE_KIND: {}, FAVORITE_KIND: {}}
+                    pending = 0
+
+            if pending:
+                in_flight.add(pool.submit(write_batch, batch[RECIPE_KIND], batch[FAVORITE_KIND]))
+            collect(wait(in_flight).done)
+
+        report = self._report(counts, started, complete=True)
+        if progress:
+            progress(report)
+        return report
+
+    @staticmethod
+    def _report(counts: Dict[str, int], started: float, complete: bool) -> Dict:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        documents = counts[RECIPE_KIND] + counts[FAVORITE_KIND]
+        return {
+            'recipes': counts[RECIPE_KIND],
+            'favorites': counts[FAVORITE_KIND],
+            'documentsPerSecond': documents / elapsed,
+            'elapsedSeconds': elapsed,
+            'complete': complete,
+        }
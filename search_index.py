@@ -0,0 +1,349 @@
+import heapq
+import json
+import math
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from pantry_index import TOKEN_PATTERN
+
+
+# Weight of a term occurrence in each field relative to the instructions
+FIELD_BOOSTS = {
+    'title': 3.0,
+    'ingredients': 2.0,
+    'description': 1.5,
+    'instructions': 1.0,
+}
+SEARCH_FIELDS = list(FIELD_BOOSTS)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOP_WORDS = {'a', 'an', 'and', 'or', 'of', 'the', 'to', 'in', 'on', 'with', 'for', 'into', 'until'}
+
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+SNAPSHOT_VERSION = 2
+
+
+def _is_consonant(word: str, i: int) -> bool:
+    if word[i] in 'aeiou':
+        return False
+    if word[i] == 'y':
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(word: str) -> int:
+    """Porter's m: the number of vowel-consonant sequences in word"""
+    measure = 0
+    after_vowel = False
+    for i in range(len(word)):
+        consonant = _is_consonant(word, i)
+        if consonant and after_vowel:
+            measure += 1
+        after_vowel = not consonant
+    return measure
+
+
+def _has_vowel(word: str) -> bool:
+    return any(not _is_consonant(word, i) for i in range(len(word)))
+
+
+def _ends_cvc(word: str) -> bool:
+    return (len(word) >= 3 and _is_consonant(word, -3) and not _is_consonant(word, -2)
+            and _is_consonant(word, -1) and word[-1] not in 'wxy')
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Porter steps 1 and 5a: plurals, -ed/-ing, final y and silent e.
+
+    Enough to bring 'baking'/'baked'/'bake' and 'berries'/'berry' together
+    without the later steps' heavier rewrites.
+    """
+    if len(word) <= 2 or not word.isalpha():
+        return word
+
+    if word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('ies'):
+        word = word[:-2]
+    elif word.endswith('oes') and len(word) > 4:
+        # Not Porter: tomatoes/potatoes would otherwise keep their e
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+
+    if word.endswith('eed'):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                elif (len(word) >= 2 and word[-1] == word[-2] and _is_consonant(word, -1)
+                      and word[-1] not in 'lsz'):
+                    word = word[:-1]
+                elif _measure(word) == 1 and _ends_cvc(word):
+                    word += 'e'
+                break
+
+    if word.endswith('y') and _has_vowel(word[:-1]):
+        word = word[:-1] + 'i'
+
+    if word.endswith('e'):
+        measure = _measure(word[:-1])
+        if measure > 1 or (measure == 1 and not _ends_cvc(word[:-1])):
+            word = word[:-1]
+
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    """Lowercased, stemmed tokens of text without stop words"""
+    return [stem(token) for token in TOKEN_PATTERN.findall((text or '').lower())
+            if token not in STOP_WORDS]
+
+
+def field_terms(recipe: Dict) -> Dict[str, List[Optional[str]]]:
+    """Analyzed tokens of each searchable field.
+
+    List fields get a None between lines so a phrase cannot match across
+    two ingredients or two steps.
+    """
+    fields = {}
+    for field in SEARCH_FIELDS:
+        value = recipe.get(field)
+        if isinstance(value, list):
+            terms = []
+            for line in value:
+                if terms:
+                    terms.append(None)
+                terms.extend(analyze(line))
+        else:
+            terms = analyze(value)
+        fields[field] = terms
+    return fields
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Loose terms and "quoted phrases" of a query, each analyzed"""
+    phrases = [analyze(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+    terms = analyze(PHRASE_PATTERN.sub(' ', query))
+    return terms, [phrase for phrase in phrases if phrase]
+
+
+def _contains_phrase(terms: List[Optional[str]], phrase: List[str]) -> bool:
+    width = len(phrase)
+    first = phrase[0]
+    for start, term in enumerate(terms):
+        if term == first and terms[start:start + width] == phrase:
+            return True
+    return False
+
+
+class SearchIndex:
+    """BM25F inverted index over one user's recipe text.
+
+    Postings map each stemmed term to the recipes and fields it occurs in
+    with its frequency there. A score adds, per query term, the term's
+    IDF times a saturated, length-normalised frequency in which each
+    field counts FIELD_BOOSTS times. Quoted phrases must appear word for
+    word within one field.
+
+    With a path, the analyzed documents are kept on disk: a snapshot plus
+    a journal that every add and remove appends one line to. The journal
+    is folded back into the snapshot once it outgrows it, so writes never
+    cost a full rewrite of the index. Each document also keeps the store's
+    'updateTime' it was read at, so a loaded index can find the recipes
+    written while it was not in use.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._documents: Dict[str, Dict[str, List[Optional[str]]]] = {}
+        self._lengths: Dict[str, Dict[str, int]] = {}
+        self._field_totals: Dict[str, int] = {field: 0 for field in SEARCH_FIELDS}
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._versions: Dict[str, Optional[str]] = {}
+        self._journal_entries = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._documents
+
+    @property
+    def _journal_path(self) -> str:
+        return self.path + '.journal'
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SearchIndex']:
+        """The index saved at path with its journal replayed, or None if there
+        is none or it cannot be read, so that the caller rebuilds it"""
+        if not os.path.exists(path):
+            return None
+        index = cls(path)
+        try:
+            with open(path, encoding='utf-8') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                return None
+            for recipe_id, fields in snapshot['documents'].items():
+                index._add_terms(recipe_id, fields)
+            index._versions.update(snapshot['versions'])
+
+            if os.path.exists(index._journal_path):
+                with open(index._journal_path, encoding='utf-8') as journal_file:
+                    for line in journal_file:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # A write cut short by a crash: keep what came
+                            # before it, and start a clean journal so later
+                            # lines are not appended after the broken one
+                            index.save()
+                            break
+                        index._remove_terms(entry['id'])
+                        index._versions.pop(entry['id'], None)
+                        if entry['op'] == 'add':
+                            index._add_terms(entry['id'], entry['fields'])
+                            index._versions[entry['id']] = entry['version']
+                        index._journal_entries += 1
+        except (AttributeError, KeyError, TypeError, ValueError, OSError):
+            # A damaged snapshot or journal, or one from an unknown layout
+            return None
+        return index
+
+    def save(self) -> None:
+        """Write a fresh snapshot and empty the journal"""
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump({'version': SNAPSHOT_VERSION, 'documents': self._documents,
+                       'versions': self._versions}, snapshot_file)
+        os.replace(temp_path, self.path)
+        if os.path.exists(self._journal_path):
+            os.remove(self._journal_path)
+        self._journal_entries = 0
+
+    def _log(self, entry: Dict) -> None:
+        if not self.path:
+            return
+        if self._journal_entries >= max(1000, len(self._documents)):
+            self.save()
+            return
+        with open(self._journal_path, 'a', encoding='utf-8') as journal_file:
+            journal_file.write(json.dumps(entry) + '\n')
+        self._journal_entries += 1
+
+    def add(self, recipe_id: str, recipe: Dict, update_time: datetime = None) -> None:
+        """Index a recipe's text fields, replacing any previous entry.
+
+        update_time is the store's 'updateTime' the fields were read at;
+        without one the entry is re-read by the next reconcile.
+        """
+        fields = field_terms(recipe)
+        version = update_time.isoformat() if update_time else None
+        if self._documents.get(recipe_id) == fields and self._versions.get(recipe_id) == version:
+            return
+        self._remove_terms(recipe_id)
+        self._add_terms(recipe_id, fields)
+        self._versions[recipe_id] = version
+        self._log({'op': 'add', 'id': recipe_id, 'fields': fields, 'version': version})
+
+    def remove(self, recipe_id: str) -> None:
+        if recipe_id in self._documents:
+            self._remove_terms(recipe_id)
+            del self._versions[recipe_id]
+            self._log({'op': 'remove', 'id': recipe_id})
+
+    def stale(self, update_times: Dict[str, Optional[datetime]]) -> Tuple[List[str], List[str]]:
+        """IDs to re-read and IDs to drop for the index to match the store,
+        given the 'updateTime' of every recipe it should hold"""
+        changed = [recipe_id for recipe_id, update_time in update_times.items()
+                   if recipe_id not in self._documents
+                   or (update_time is not None and self._versions[recipe_id] != update_time.isoformat())]
+        removed = [recipe_id for recipe_id in self._documents if recipe_id not in update_times]
+        return changed, removed
+
+    def _add_terms(self, recipe_id: str, fields: Dict[str, List[Optional[str]]]) -> None:
+        self._documents[recipe_id] = fields
+        lengths = self._lengths[recipe_id] = {}
+        for field, terms in fields.items():
+            counts: Dict[str, int] = {}
+            for term in terms:
+                if term is not None:
+                    counts[term] = counts.get(term, 0) + 1
+            lengths[field] = sum(counts.values())
+            self._field_totals[field] += lengths[field]
+            for term, count in counts.items():
+                self._postings.setdefault(term, {}).setdefault(recipe_id, {})[field] = count
+
+    def _remove_terms(self, recipe_id: str) -> None:
+        fields = self._documents.pop(recipe_id, None)
+        if fields is None:
+            return
+        for field, length in self._lengths.pop(recipe_id).items():
+            self._field_totals[field] -= length
+        for term in {term for terms in fields.values() for term in terms if term is not None}:
+            postings = self._postings[term]
+            postings.pop(recipe_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int = None) -> List[Tuple[str, float]]:
+        """(recipe ID, score) of recipes matching query, best first.
+
+        Recipes must contain every quoted phrase and, when the query has
+        loose terms, at least one of them.
+        """
+        terms, phrases = parse_query(query)
+        if not terms and not phrases:
+            return []
+
+        if phrases:
+            candidates: Optional[Set[str]] = None
+            for term in {term for phrase in phrases for term in phrase}:
+                postings = self._postings.get(term, {})
+                candidates = set(postings) if candidates is None else candidates & postings.keys()
+            candidates = {
+                recipe_id for recipe_id in candidates
+                if all(any(_contains_phrase(field, phrase) for field in self._documents[recipe_id].values())
+                       for phrase in phrases)
+            }
+            if terms:
+                candidates &= {recipe_id for term in terms for recipe_id in self._postings.get(term, {})}
+        else:
+            candidates = None
+
+        document_count = len(self._documents)
+        average_lengths = {field: (total / document_count if document_count else 0.0)
+                           for field, total in self._field_totals.items()}
+        scores: Dict[str, float] = {}
+        for term in set(terms) | {term for phrase in phrases for term in phrase}:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for recipe_id, field_counts in postings.items():
+                if candidates is not None and recipe_id not in candidates:
+                    continue
+                lengths = self._lengths[recipe_id]
+                frequency = 0.0
+                for field, count in field_counts.items():
+                    relative_length = lengths[field] / average_lengths[field] if average_lengths[field] else 0.0
+                    frequency += FIELD_BOOSTS[field] * count / (1 - BM25_B + BM25_B * relative_length)
+                scores[recipe_id] = (scores.get(recipe_id, 0.0)
+                                     + idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1))
+
+        return heapq.nsmallest(limit if limit is not None else len(scores),
+                               scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,151 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pantry_index import ingredient_key
+
+
+def recipe_features(ingredients: Iterable[str], tags: Iterable[str], category: str) -> Dict[str, int]:
+    """Term counts describing a recipe: its ingredient names, tags and category"""
+    counts: Dict[str, int] = {}
+    terms = ['i:' + ingredient_key(line) for line in ingredients]
+    terms += ['t:' + tag.strip().lower() for tag in tags if tag.strip()]
+    if category:
+        terms.append('c:' + category.strip().lower())
+    for term in terms:
+        if term[2:]:
+            counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class SimilarityIndex:
+    """TF-IDF vectors of one user's recipes for "more like this" queries.
+
+    The rows form a sparse matrix in CSR layout: every recipe's term IDs
+    and counts sit end to end in flat NumPy arrays, with a start offset
+    and length per row. Adding a recipe appends a row, removing one
+    empties it, and the arrays are compacted once most entries are dead.
+    Document frequencies are kept as recipes come and go, so a query
+    weighs the whole matrix with current IDF in a few vectorized passes
+    and picks the top K with argpartition.
+    """
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("Similar recipes require numpy: pip install numpy")
+        self._term_ids: Dict[str, int] = {}
+        self._document_frequency = np.zeros(64)
+        self._rows: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = []
+        self._starts = np.zeros(64, dtype=np.int64)
+        self._lengths = np.zeros(64, dtype=np.int64)
+        # One spare slot past the last entry keeps reduceat offsets in range
+        self._terms = np.zeros(256, dtype=np.int64)
+        self._counts = np.zeros(256)
+        self._size = 0
+        self._live_entries = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._rows
+
+    @staticmethod
+    def _grow(array, needed: int):
+        if needed <= len(array):
+            return array
+        grown = np.zeros(max(needed, 2 * len(array)), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = self._term_ids[term] = len(self._term_ids)
+            self._document_frequency = self._grow(self._document_frequency, term_id + 1)
+        return term_id
+
+    def add(self, recipe_id: str, ingredients: Iterable[str], tags: Iterable[str],
+            category: str) -> None:
+        """Index a recipe, replacing any previous row for recipe_id"""
+        self.remove(recipe_id)
+        features = recipe_features(ingredients, tags, category)
+        term_ids = [self._term_id(term) for term in features]
+        self._document_frequency[term_ids] += 1
+
+        row = len(self._row_ids)
+        self._row_ids.append(recipe_id)
+        self._rows[recipe_id] = row
+        self._starts = self._grow(self._starts, row + 1)
+        self._lengths = self._grow(self._lengths, row + 1)
+        self._starts[row] = self._size
+        self._lengths[row] = len(term_ids)
+
+        end = self._size + len(term_ids)
+        self._terms = self._grow(self._terms, end + 1)
+        self._counts = self._grow(self._counts, end + 1)
+        self._terms[self._size:end] = term_ids
+        self._counts[self._size:end] = list(features.values())
+        self._size = end
+        self._live_entries += len(term_ids)
+
+    def remove(self, recipe_id: str) -> None:
+        row = self._rows.pop(recipe_id, None)
+        if row is None:
+            return
+        start, length = int(self._starts[row]), int(self._lengths[row])
+        self._document_frequency[self._terms[start:start + length]] -= 1
+        self._lengths[row] = 0
+        self._row_ids[row] = None
+        self._live_entries -= length
+        if len(self._row_ids) > 64 and len(self._rows) < len(self._row_ids) // 2:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop removed rows, renumbering the live ones in order"""
+        live = [row for row, recipe_id in enumerate(self._row_ids) if recipe_id is not None]
+        lengths = self._lengths[live]
+        entries = np.concatenate([np.arange(self._starts[row], self._starts[row] + self._lengths[row])
+                                  for row in live] or [np.zeros(0, dtype=np.int64)])
+        self._terms = np.append(self._terms[entries], 0)
+        self._counts = np.append(self._counts[entries], 0.0)
+        self._size = len(entries)
+        self._starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        self._lengths = lengths
+        self._row_ids = [self._row_ids[row] for row in live]
+        self._rows = {recipe_id: row for row, recipe_id in enumerate(self._row_ids)}
+
+    def most_similar(self, recipe_id: str, k: int = 5) -> List[Tuple[str, float]]:
+        """(recipe ID, cosine similarity) of the k recipes closest to recipe_id"""
+        row = self._rows.get(recipe_id)
+        if row is None or k <= 0:
+            return []
+        rows = len(self._row_ids)
+        start, length = int(self._starts[row]), int(self._lengths[row])
+
+        idf = np.log((1 + len(self._rows)) / (1 + self._document_frequency)) + 1
+        terms = self._terms[:self._size + 1]
+        weights = self._counts[:self._size + 1] * idf[terms]
+        query_vector = np.zeros(len(idf))
+        query_vector[terms[start:start + length]] = weights[start:start + length]
+
+        # reduceat sums each row's slice; empty rows would pick up their
+        # neighbour's first entry, so they are zeroed afterwards
+        starts, lengths = self._starts[:rows], self._lengths[:rows]
+        dots = np.add.reduceat(weights * query_vector[terms], starts)[:rows]
+        norms = np.sqrt(np.add.reduceat(weights * weights, starts)[:rows])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = dots / (norms * np.linalg.norm(query_vector))
+        scores[(lengths == 0) | ~np.isfinite(scores)] = 0.0
+        scores[row] = 0.0
+
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(self._row_ids[index], float(scores[index])) for index in top.tolist()]
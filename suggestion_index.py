@@ -0,0 +1,166 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+
+# Dead nodes tolerated before the tree is rebuilt without them
+MIN_REBUILD_DEAD_NODES = 64
+
+
+def _bit_pattern(text: str) -> Dict[str, int]:
+    """For each character of text, a bit mask of the positions it occurs at"""
+    pattern: Dict[str, int] = {}
+    for i, char in enumerate(text):
+        pattern[char] = pattern.get(char, 0) | (1 << i)
+    return pattern
+
+
+def _pattern_distance(pattern: Dict[str, int], length: int, text: str) -> int:
+    """Edit distance between the string of the given length behind pattern and text"""
+    if not length:
+        return len(text)
+    mask = (1 << length) - 1
+    last_bit = 1 << (length - 1)
+
+    positive, negative = mask, 0
+    distance = length
+    for char in text:
+        equal = pattern.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | (~(horizontal | positive) & mask)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last_bit:
+            distance += 1
+        elif horizontal_negative & last_bit:
+            distance -= 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & mask
+        horizontal_negative = (horizontal_negative << 1) & mask
+        positive = horizontal_negative | (~(vertical | horizontal_positive) & mask)
+        negative = horizontal_positive & vertical
+    return distance
+
+
+def levenshtein(first: str, second: str) -> int:
+    """Edit distance by Myers' bit-parallel algorithm.
+
+    Each column of the dynamic-programming table is held as bit vectors
+    in a Python int, so comparing two recipe titles costs a few integer
+    operations per character of second.
+    """
+    return _pattern_distance(_bit_pattern(first), len(first), second)
+
+
+def default_max_distance(text: str) -> int:
+    """Typos tolerated for a query: one per four characters, between 1 and 2"""
+    return max(1, min(2, len(text) // 4))
+
+
+class _Node:
+    __slots__ = ('key', 'recipe_ids', 'children')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.recipe_ids: Set[str] = set()
+        self.children: Dict[int, '_Node'] = {}
+
+
+class SuggestionIndex:
+    """BK-tree over one user's recipe IDs and lower-cased titles.
+
+    Every child of a node sits at a known edit distance from it, so by the
+    triangle inequality a lookup within distance k only descends into
+    children whose distance is within k of the query's distance to the
+    node, and skips most of the tree. BK-trees cannot drop a node, so a
+    removed recipe only leaves its nodes empty; the tree is rebuilt once
+    empty nodes outnumber live ones.
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self._nodes: Dict[str, _Node] = {}
+        self._titles: Dict[str, str] = {}
+        self._dead_nodes = 0
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._titles
+
+    @staticmethod
+    def _keys(recipe_id: str, title: str) -> Set[str]:
+        return {recipe_id.lower(), title.strip().lower()} - {''}
+
+    def _insert(self, key: str) -> _Node:
+        node = self._nodes[key] = _Node(key)
+        if self._root is None:
+            self._root = node
+            return node
+        parent = self._root
+        while True:
+            distance = levenshtein(key, parent.key)
+            child = parent.children.get(distance)
+            if child is None:
+                parent.children[distance] = node
+                return node
+            parent = child
+
+    def add(self, recipe_id: str, title: str) -> None:
+        """Index a recipe's ID and title, replacing any previous title"""
+        self.remove(recipe_id)
+        self._titles[recipe_id] = title
+        for key in self._keys(recipe_id, title):
+            node = self._nodes.get(key)
+            if node is None:
+                node = self._insert(key)
+            elif not node.recipe_ids:
+                self._dead_nodes -= 1
+            node.recipe_ids.add(recipe_id)
+
+    def remove(self, recipe_id: str) -> None:
+        title = self._titles.pop(recipe_id, None)
+        if title is None:
+            return
+        for key in self._keys(recipe_id, title):
+            node = self._nodes[key]
+            node.recipe_ids.discard(recipe_id)
+            if not node.recipe_ids:
+                self._dead_nodes += 1
+
+        live_nodes = len(self._nodes) - self._dead_nodes
+        if self._dead_nodes > max(MIN_REBUILD_DEAD_NODES, live_nodes):
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        live = [(node.key, node.recipe_ids) for node in self._nodes.values() if node.recipe_ids]
+        self._root = None
+        self._nodes = {}
+        self._dead_nodes = 0
+        for key, recipe_ids in live:
+            self._insert(key).recipe_ids = recipe_ids
+
+    def suggest(self, text: str, limit: int = 5,
+                max_distance: int = None) -> List[Tuple[str, str, int]]:
+        """(recipe ID, title, edit distance) of the recipes whose ID or title is
+        within max_distance edits of text, closest first"""
+        query = text.strip().lower()
+        if not query or self._root is None:
+            return []
+        if max_distance is None:
+            max_distance = default_max_distance(query)
+
+        pattern = _bit_pattern(query)
+        best: Dict[str, int] = {}
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = _pattern_distance(pattern, len(query), node.key)
+            if distance <= max_distance:
+                for recipe_id in node.recipe_ids:
+                    if distance < best.get(recipe_id, max_distance + 1):
+                        best[recipe_id] = distance
+            for child_distance, child in node.children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+        ranked = sorted(best.items(), key=lambda match: (match[1], match[0]))[:limit]
+        return [(recipe_id, self._titles[recipe_id], distance) for recipe_id, distance in ranked]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipe_book_manager import RecipeBookManager  # noqa: E402
+from recipe_storage import MemoryStorage, SQLiteStorage  # noqa: E402
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStorage()
+    return SQLiteStorage(str(tmp_path / 'recipes.db'))
+
+
+@pytest.fixture
+def manager(storage):
+    return RecipeBookManager(storage=storage)
+
+
+def add_recipe(manager, title, ingredients=('1 cup flour',), tags=(), category='Dessert',
+               user_id='alice', instructions=('Bake',), servings=4):
+    """create_recipe with defaults for the fields a test does not care about"""
+    return manager.create_recipe(user_id, title, f"{title} description", 10, 20, servings,
+                                 list(ingredients), list(instructions), category, list(tags))
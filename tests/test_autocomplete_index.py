@@ -0,0 +1,79 @@
+import random
+from datetime import datetime, timezone
+
+from autocomplete_index import TOP_COMPLETIONS, AutocompleteIndex, PrefixTrie
+from conftest import add_recipe
+
+
+def test_trie_removal_matches_a_scan():
+    rng = random.Random(11)
+    trie = PrefixTrie()
+    entries = {}
+    for step in range(3000):
+        key = ''.join(rng.choice('ab') for _ in range(rng.randrange(0, 7)))
+        value = f"v{rng.randrange(40)}"
+        if (key, value) in entries and rng.random() < 0.6:
+            trie.remove(key, value)
+            del entries[key, value]
+        else:
+            score = rng.randrange(20)
+            trie.insert(key, value, score, key)
+            entries[key, value] = score
+
+        if step % 50 == 0:
+            for prefix in ['', 'a', 'b', 'ab', 'ba', 'aab', 'bbb']:
+                # A value stored under several keys is listed once, at its best
+                best = {}
+                for (key, value), score in entries.items():
+                    if key.startswith(prefix):
+                        best[value] = min(best.get(value, (-score, key, value)), (-score, key, value))
+                assert trie.complete(prefix) == sorted(best.values())[:TOP_COMPLETIONS]
+
+
+def test_trie_drops_empty_branches():
+    trie = PrefixTrie()
+    trie.insert('apple pie', 'a', 1, 'Apple Pie')
+    trie.insert('apple tart', 'b', 2, 'Apple Tart')
+    trie.remove('apple tart', 'b')
+    trie.remove('apple pie', 'a')
+    trie.remove('apple pie', 'a')
+    assert trie.complete('') == []
+    assert not trie._root.edges
+
+
+def test_recipes_complete_by_id_or_title_newest_first():
+    index = AutocompleteIndex()
+    index.add('apple-pie', 'Apple Pie', ['fruit'], 'Dessert', datetime(2024, 1, 1, tzinfo=timezone.utc))
+    index.add('tarte-tatin', 'Apple Tart', ['fruit', 'french'], 'Dessert',
+              datetime(2024, 2, 1, tzinfo=timezone.utc))
+    index.add('bread', 'Bread', ['baking'], 'Bread', datetime(2024, 3, 1, tzinfo=timezone.utc))
+
+    assert index.complete_recipes('APP') == [('tarte-tatin', 'Apple Tart'), ('apple-pie', 'Apple Pie')]
+    assert index.complete_recipes('tarte') == [('tarte-tatin', 'Apple Tart')]
+    assert index.complete_labels('f') == ['fruit', 'french']
+    index.remove('tarte-tatin')
+    assert index.complete_recipes('app') == [('apple-pie', 'Apple Pie')]
+    assert index.complete_labels('f') == ['fruit']
+
+
+def test_ids_and_titles_of_one_recipe_fill_a_single_slot():
+    index = AutocompleteIndex()
+    for number in range(12):
+        index.add(f"cake-{number}", f"Cake {number}", [], 'Dessert',
+                  datetime(2024, 1, number + 1, tzinfo=timezone.utc))
+    completions = index.complete_recipes('cake', limit=10)
+    assert [recipe_id for recipe_id, _ in completions] == [f"cake-{number}" for number in range(11, 1, -1)]
+    index.remove('cake-11')
+    assert len(index.complete_recipes('cake', limit=10)) == 10
+
+
+def test_manager_completions_follow_writes(manager):
+    add_recipe(manager, 'Apple Pie', tags=['fruit'])
+    add_recipe(manager, 'Apple Pie', user_id='bob')
+    assert manager.complete_recipe_ids('alice', 'apple') == [{'id': 'apple-pie', 'title': 'Apple Pie'}]
+    assert manager.complete_labels('alice', 'd') == ['Dessert']
+
+    assert manager.update_recipe('apple-pie', 'alice', title='Pear Pie')
+    assert manager.complete_recipe_ids('alice', 'pear') == [{'id': 'apple-pie', 'title': 'Pear Pie'}]
+    assert manager.delete_recipe('apple-pie', 'alice')
+    assert manager.complete_recipe_ids('alice', 'a') == []
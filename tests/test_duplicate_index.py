@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import add_recipe
+
+pytest.importorskip('numpy')
+
+from duplicate_index import DuplicateIndex, minhash_signature, recipe_shingles, signature_similarity  # noqa: E402
+
+PANCAKES = ['2 cups flour', '2 eggs', '1 1/2 cups milk', '2 tbsp sugar', '1 tsp baking powder']
+
+
+def test_signatures_estimate_jaccard_similarity():
+    first = recipe_shingles('Fluffy Pancakes', PANCAKES)
+    second = recipe_shingles('Pancakes', PANCAKES[:4])
+    jaccard = len(first & second) / len(first | second)
+    estimate = signature_similarity(minhash_signature(first), minhash_signature(second))
+    assert estimate == pytest.approx(jaccard, abs=0.2)
+    assert signature_similarity(minhash_signature(first), minhash_signature(first)) == 1.0
+
+
+def test_near_copies_are_found_and_grouped():
+    index = DuplicateIndex()
+    index.add('pancakes', 'Pancakes', PANCAKES)
+    index.add('pancakes-1', 'Pancakes', ['2 large eggs'] + PANCAKES)
+    index.add('stew', 'Beef Stew', ['2 lb beef', '4 carrots', '3 potatoes', '1 onion'])
+
+    assert [recipe_id for recipe_id, _ in index.similar_to('Pancakes!', PANCAKES)] == ['pancakes', 'pancakes-1']
+    assert index.duplicate_groups() == [['pancakes', 'pancakes-1']]
+    index.remove('pancakes-1')
+    assert index.duplicate_groups() == []
+
+
+def test_duplicate_report_follows_writes(manager):
+    add_recipe(manager, 'Pancakes', ingredients=PANCAKES)
+    add_recipe(manager, 'Pancakes', ingredients=PANCAKES[::-1])
+    add_recipe(manager, 'Pancakes', ingredients=PANCAKES, user_id='bob')
+    add_recipe(manager, 'Beef Stew', ingredients=['2 lb beef', '4 carrots'])
+
+    assert [[recipe['id'] for recipe in group] for group in manager.duplicate_report('alice')] == [
+        ['pancakes', 'pancakes-1']]
+    matches = manager.find_duplicate_recipes('alice', 'Pancakes', PANCAKES)
+    assert [recipe['id'] for recipe in matches] == ['pancakes', 'pancakes-1']
+    assert matches[0]['similarity'] == 1.0
+
+    assert manager.update_recipe('pancakes-1', 'alice', title='Beef Stew', ingredients=['2 lb beef', '4 carrots'])
+    assert [[recipe['id'] for recipe in group] for group in manager.duplicate_report('alice')] == [
+        ['beef-stew', 'pancakes-1']]
@@ -0,0 +1,38 @@
+from conftest import add_recipe
+from favorites_sweeper import FavoritesSweeper
+
+
+def add_orphans(storage, count):
+    for n in range(count):
+        storage.set_favorite(f"fav-bob-gone-{n:02d}", {'recipeId': f"gone-{n}", 'userId': 'bob',
+                                                       'notes': '', 'addedDate': storage.server_timestamp()})
+
+
+def test_sweep_removes_only_orphans(manager):
+    for title in ('Apple Pie', 'Bread', 'Cake'):
+        manager.add_to_favorites(add_recipe(manager, title), 'bob')
+    add_orphans(manager.storage, 4)
+
+    report = manager.sweep_orphan_favorites(page_size=2)
+    assert report['complete']
+    assert (report['scanned'], report['removed']) == (7, 4)
+    assert manager.get_favorite_ids('bob') == {'apple-pie', 'bread', 'cake'}
+
+
+def test_interrupted_sweep_resumes_from_the_checkpoint(storage, tmp_path):
+    add_orphans(storage, 5)
+    checkpoint_path = str(tmp_path / 'sweep.json')
+    sweeper = FavoritesSweeper(storage, checkpoint_path=checkpoint_path, page_size=2)
+
+    reports = []
+    first = sweeper.run(max_pages=2, progress=reports.append)
+    assert not first['complete']
+    assert [report['totalScanned'] for report in reports] == [2, 4]
+    assert (tmp_path / 'sweep.json').exists()
+
+    # A new sweeper picks up the cursor and the running totals
+    second = FavoritesSweeper(storage, checkpoint_path=checkpoint_path, page_size=2).run()
+    assert second['complete']
+    assert (second['scanned'], second['totalScanned'], second['totalRemoved']) == (1, 5, 5)
+    assert not (tmp_path / 'sweep.json').exists()
+    assert storage.page_favorites(10) == []
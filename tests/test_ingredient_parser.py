@@ -0,0 +1,39 @@
+import pytest
+
+from ingredient_parser import ParsedIngredient, parse_ingredient, parse_ingredients
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('2 1/2 cups all-purpose flour, sifted', ParsedIngredient(2.5, 'cup', 'all-purpose flour', 'sifted')),
+    ('1½ Tbsp. sugar', ParsedIngredient(1.5, 'tbsp', 'sugar', None)),
+    ('3/4 fl oz (22 ml) lemon juice', ParsedIngredient(0.75, 'fl oz', 'lemon juice', '22 ml')),
+    ('2-3 cloves garlic, minced', ParsedIngredient(2.0, 'clove', 'garlic', 'minced', 3.0)),
+    ('.5 lb of butter', ParsedIngredient(0.5, 'lb', 'butter', None)),
+    ('3 eggs', ParsedIngredient(3.0, None, 'eggs', None)),
+    ('2 cans tomatoes', ParsedIngredient(2.0, 'can', 'tomatoes', None)),
+    ('Salt to taste', ParsedIngredient(None, None, 'Salt to taste', None)),
+])
+def test_lines_split_into_quantity_unit_item_and_note(line, expected):
+    assert parse_ingredient(line) == expected
+
+
+def test_units_need_a_word_boundary():
+    # 'c' is a cup, but not the first letter of 'carrots'
+    assert parse_ingredient('2 carrots') == ParsedIngredient(2.0, None, 'carrots', None)
+
+
+def test_stored_form_uses_recipe_field_names():
+    assert parse_ingredients(['1 cup milk']) == [
+        {'quantity': 1.0, 'quantityMax': None, 'unit': 'cup', 'item': 'milk', 'note': None}]
+
+
+@pytest.mark.parametrize('line', ['1/0 cup flour', '2/00 eggs'])
+def test_zero_denominators_leave_no_quantity(line):
+    parsed = parse_ingredient(line)
+    assert parsed.quantity is None
+    assert parsed.item == line
+
+
+def test_quantities_do_not_stop_inside_a_number():
+    assert parse_ingredient('1/2/3 cup flour').quantity is None
+    assert parse_ingredient('2 3/4 cups flour').quantity == 2.75
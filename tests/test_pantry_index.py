@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import add_recipe
+from pantry_index import PantryIndex, ingredient_key
+
+
+@pytest.mark.parametrize('line, key', [
+    ('2 large eggs, beaten', 'egg'),
+    ('1 cup all-purpose flour', 'all purpose flour'),
+    ('3 tomatoes', 'tomato'),
+    ('2 cups berries', 'berry'),
+    ('1 tbsp freshly ground black pepper', 'black pepper'),
+])
+def test_ingredient_keys_drop_quantities_and_descriptors(line, key):
+    assert ingredient_key(line) == key
+
+
+def test_recipes_rank_by_fewest_missing_then_most_on_hand():
+    index = PantryIndex()
+    index.add('cake', ['2 cups flour', '3 eggs', '1 cup sugar', '1 tsp salt'])
+    index.add('omelette', ['3 eggs', 'salt'])
+    index.add('bread', ['3 cups bread flour', '1 cup water', '1 tsp yeast'])
+    mask = index.pantry_mask(['Eggs', 'flour', 'sugar'])
+
+    assert index.match(mask) == [('cake', 0, 4), ('omelette', 0, 2), ('bread', 1, 2)]
+    assert index.match(mask, max_missing=0) == [('cake', 0, 4), ('omelette', 0, 2)]
+    assert index.missing_terms('bread', mask) == ['yeast']
+    assert index.missing_terms('omelette', index.pantry_mask([], assume_staples=False)) == ['egg', 'salt']
+
+
+def test_removed_recipes_stop_matching():
+    index = PantryIndex()
+    index.add('cake', ['flour'])
+    index.remove('cake')
+    assert 'cake' not in index
+    assert index.match(index.pantry_mask(['flour'])) == []
+
+
+def test_manager_search_follows_writes(manager):
+    add_recipe(manager, 'Omelette', ingredients=['3 eggs', 'salt'])
+    add_recipe(manager, 'Cake', ingredients=['2 cups flour', '3 eggs'])
+    add_recipe(manager, 'Not Mine', ingredients=['3 eggs'], user_id='bob')
+    results = manager.search_recipes_by_pantry('alice', ['eggs'])
+    assert [(recipe['id'], recipe['missingIngredients']) for recipe in results] == [
+        ('omelette', []), ('cake', ['flour'])]
+
+    assert manager.update_recipe('cake', 'alice', ingredients=['3 eggs'])
+    assert manager.delete_recipe('omelette', 'alice')
+    assert [recipe['id'] for recipe in manager.search_recipes_by_pantry('alice', ['eggs'], max_missing=0)] == ['cake']
+
+
+def test_staples_cover_only_their_own_ingredient():
+    index = PantryIndex()
+    index.add('stir-fry', ['1 red bell pepper', '1/2 cup water chestnuts', '1 tsp kosher salt', 'salt pork'])
+    mask = index.pantry_mask([])
+    assert index.missing_terms('stir-fry', mask) == ['red bell pepper', 'water chestnut', 'salt pork']
+    # What the user types still covers every term containing its words
+    assert index.missing_terms('stir-fry', index.pantry_mask(['pepper'])) == ['water chestnut', 'salt pork']
+
+
+@pytest.mark.parametrize('line', ['pinch of salt', 'salt and pepper to taste', 'dash of pepper',
+                                  'warm water', '1 cup cold water', 'kosher salt and black pepper'])
+def test_common_staple_lines_count_as_on_hand(line):
+    index = PantryIndex()
+    index.add('soup', [line, '2 carrots'])
+    assert index.missing_terms('soup', index.pantry_mask(['carrots'])) == []
+    assert index.missing_terms('soup', index.pantry_mask(['carrots'], assume_staples=False)) != []
+
+
+def test_measure_and_temperature_words_are_descriptors():
+    assert ingredient_key('pinch of nutmeg') == 'nutmeg'
+    assert ingredient_key('1 cup warm milk') == 'milk'
@@ -0,0 +1,477 @@
+from conftest import add_recipe
+from recipe_book_manager import RecipeBookManager, RecipeBookUI
+from recipe_storage import MemoryStorage, SQLiteStorage
+
+
+# ID allocation
+
+def test_slug_is_lowercase_and_hyphenated():
+    assert RecipeBookManager.slugify_title("  Grandma's  Apple--Pie! ") == 'grandmas-apple-pie'
+
+
+def test_next_free_id_takes_the_smallest_free_suffix():
+    assert RecipeBookManager.next_free_id('pie', set()) == 'pie'
+    assert RecipeBookManager.next_free_id('pie', {'pie'}) == 'pie-1'
+    assert RecipeBookManager.next_free_id('pie', {'pie', 'pie-1', 'pie-3'}) == 'pie-2'
+
+
+def test_next_free_id_ignores_longer_slugs():
+    # 'pie-crust' and 'pie-2-ways' share the prefix but are not suffixes of 'pie'
+    assert RecipeBookManager.next_free_id('pie', {'pie', 'pie-crust', 'pie-2-ways', 'pie-1'}) == 'pie-2'
+
+
+def test_ids_count_up_from_the_title_slug(manager):
+    assert [add_recipe(manager, 'Apple Pie') for _ in range(3)] == ['apple-pie', 'apple-pie-1', 'apple-pie-2']
+
+
+def test_freed_suffix_is_reused(manager):
+    for _ in range(3):
+        add_recipe(manager, 'Apple Pie')
+    assert manager.delete_recipe('apple-pie-1', 'alice')
+    assert add_recipe(manager, 'Apple Pie') == 'apple-pie-1'
+
+
+def test_longer_slugs_do_not_take_suffixes(manager):
+    add_recipe(manager, 'Pie Crust')
+    add_recipe(manager, 'Pie 2')
+    assert manager.generate_recipe_id('Pie', 'alice') == 'pie'
+    add_recipe(manager, 'Pie')
+    assert manager.generate_recipe_id('Pie', 'alice') == 'pie-1'
+
+
+# Reads and owner-guarded writes
+
+def test_recipes_round_trip_through_the_engine(manager):
+    recipe_id = add_recipe(manager, 'Apple Pie', ['3 apples'], ['fruit'])
+    recipe = manager.get_recipe(recipe_id)
+    assert recipe['id'] == recipe_id
+    assert recipe['title'] == 'Apple Pie'
+    assert recipe['ingredients'] == ['3 apples']
+    assert recipe['tags'] == ['fruit']
+    assert recipe['createdAt'].tzinfo is not None
+    assert manager.recipe_exists(recipe_id)
+    assert not manager.recipe_exists('nothing')
+
+
+def test_user_recipes_filter_by_category_and_tag(manager):
+    add_recipe(manager, 'Apple Pie', tags=['fruit'])
+    add_recipe(manager, 'Bread', tags=['baking'], category='Bread')
+    add_recipe(manager, 'Not Mine', tags=['fruit'], user_id='bob')
+    assert sorted(recipe['id'] for recipe in manager.get_user_recipes('alice')) == ['apple-pie', 'bread']
+    assert [recipe['id'] for recipe in manager.get_user_recipes('alice', category='Bread')] == ['bread']
+    assert [recipe['id'] for recipe in manager.get_user_recipes('alice', tag='fruit')] == ['apple-pie']
+
+
+def test_only_the_owner_can_update_or_delete(manager):
+    recipe_id = add_recipe(manager, 'Apple Pie')
+    assert not manager.update_recipe(recipe_id, 'bob', title='Stolen')
+    assert not manager.delete_recipe(recipe_id, 'bob')
+    assert manager.get_recipe(recipe_id)['title'] == 'Apple Pie'
+
+    assert manager.update_recipe(recipe_id, 'alice', title='Pear Pie')
+    assert manager.get_recipe(recipe_id)['title'] == 'Pear Pie'
+    assert manager.delete_recipe(recipe_id, 'alice')
+    assert manager.get_recipe(recipe_id) is None
+
+
+def test_writes_to_missing_recipes_fail(manager):
+    assert not manager.update_recipe('nothing', 'alice', title='x')
+    assert not manager.delete_recipe('nothing', 'alice')
+
+
+def test_favorites_toggle(manager):
+    recipe_id = add_recipe(manager, 'Apple Pie')
+    assert not manager.add_to_favorites('nothing', 'bob')
+    assert manager.add_to_favorites(recipe_id, 'bob', notes='for sunday')
+    assert not manager.add_to_favorites(recipe_id, 'bob')
+    assert manager.is_favorited(recipe_id, 'bob')
+    assert [recipe['id'] for recipe in manager.get_user_favorites('bob')] == [recipe_id]
+
+    assert manager.remove_from_favorites(recipe_id, 'bob')
+    assert not manager.is_favorited(recipe_id, 'bob')
+    assert manager.get_user_favorites('bob') == []
+
+
+def test_favorites_are_hydrated_in_one_batch(manager):
+    first = add_recipe(manager, 'Apple Pie')
+    second = add_recipe(manager, 'Bread', user_id='carol')
+    for recipe_id in (first, second):
+        assert manager.add_to_favorites(recipe_id, 'bob', notes=f"{recipe_id} notes")
+    # A favorite whose recipe is gone is skipped
+    manager.storage.set_favorite('fav-bob-gone', {'recipeId': 'gone', 'userId': 'bob', 'notes': '',
+                                                  'addedDate': manager.storage.server_timestamp()})
+
+    calls = []
+    get_recipes = manager.storage.get_recipes
+    manager.storage.get_recipes = lambda recipe_ids: calls.append(list(recipe_ids)) or get_recipes(recipe_ids)
+    favorites = manager.get_user_favorites('bob')
+
+    assert len(calls) == 1
+    assert sorted(recipe['id'] for recipe in favorites) == [first, second]
+    assert all(recipe['favoriteNotes'] == f"{recipe['id']} notes" for recipe in favorites)
+    assert all(recipe['favoritedDate'] is not None for recipe in favorites)
+
+
+def test_bulk_favorite_status(manager):
+    recipe_ids = [add_recipe(manager, title) for title in ('Apple Pie', 'Bread', 'Cake')]
+    manager.add_to_favorites(recipe_ids[0], 'bob')
+    manager.add_to_favorites(recipe_ids[2], 'bob')
+    manager.add_to_favorites(recipe_ids[1], 'carol')
+
+    assert manager.get_favorite_ids('bob') == {recipe_ids[0], recipe_ids[2]}
+    assert manager.are_favorited(recipe_ids + ['missing'], 'bob') == {recipe_ids[0], recipe_ids[2]}
+    assert manager.are_favorited([], 'bob') == set()
+    assert manager.get_favorite_ids('dave') == set()
+
+
+def test_title_search_follows_writes(storage):
+    manager = RecipeBookManager(storage=storage)
+    add_recipe(manager, 'Apple Pie')
+    add_recipe(manager, 'Apple Pie', user_id='bob')
+    assert [recipe['id'] for recipe in manager.search_recipes_by_title('alice', 'APPLE')] == ['apple-pie']
+
+    add_recipe(manager, 'Apple Tart')
+    assert manager.update_recipe('apple-pie', 'alice', title='Pear Pie')
+    assert [recipe['id'] for recipe in manager.search_recipes_by_title('alice', 'apple')] == ['apple-tart']
+    matches = manager.search_recipes_by_title('alice', 'pie pear', keywords=True)
+    assert [recipe['id'] for recipe in matches] == ['apple-pie']
+
+    assert manager.delete_recipe('apple-tart', 'alice')
+    assert manager.search_recipes_by_title('alice', 'apple') == []
+    # A fresh manager builds the same index from the store
+    fresh = RecipeBookManager(storage=storage)
+    assert [recipe['id'] for recipe in fresh.search_recipes_by_title('alice', 'pear')] == ['apple-pie']
+
+
+def test_reads_are_cached_and_writes_invalidate(manager):
+    recipe_id = add_recipe(manager, 'Apple Pie')
+    manager.get_recipe(recipe_id)
+    manager.get_recipe(recipe_id)
+    assert manager.cache_stats()['hits'] == 1
+
+    assert manager.update_recipe(recipe_id, 'alice', title='Pear Pie')
+    assert manager.get_recipe(recipe_id)['title'] == 'Pear Pie'
+    assert manager.delete_recipe(recipe_id, 'alice')
+    assert manager.get_recipe(recipe_id) is None
+
+
+def test_live_mirror_sees_other_writers():
+    storage = MemoryStorage()
+    manager = RecipeBookManager(storage=storage)
+    other = RecipeBookManager(storage=storage)
+    add_recipe(other, 'Apple Pie')
+    assert manager.enable_live_mirror('alice')
+    assert manager.get_recipe('apple-pie')['title'] == 'Apple Pie'
+    assert [recipe['id'] for recipe in manager.search_recipes_by_title('alice', 'apple')] == ['apple-pie']
+
+    add_recipe(other, 'Apple Tart')
+    assert other.update_recipe('apple-pie', 'alice', title='Pear Pie')
+    assert other.add_to_favorites('apple-tart', 'alice')
+    assert manager.get_recipe('apple-pie')['title'] == 'Pear Pie'
+    assert [recipe['id'] for recipe in manager.get_user_recipes('alice')] == ['apple-pie', 'apple-tart']
+    assert [recipe['id'] for recipe in manager.search_recipes_by_title('alice', 'apple')] == ['apple-tart']
+    assert manager.is_favorited('apple-tart', 'alice')
+
+    assert other.delete_recipe('apple-tart', 'alice')
+    assert [recipe['id'] for recipe in manager.get_user_recipes('alice')] == ['apple-pie']
+    manager.disable_live_mirror('alice')
+    add_recipe(other, 'Cake')
+    assert [recipe['id'] for recipe in manager.get_user_recipes('alice')] == ['apple-pie', 'cake']
+
+
+def test_pages_cover_the_library_in_id_order(manager):
+    for count in (0, 5, 6, 7):
+        user_id = f"user{count}"
+        expected = sorted(add_recipe(manager, f"Dish {n}", user_id=user_id) for n in range(count))
+        pages, page_token = [], None
+        while True:
+            page, page_token = manager.get_user_recipes_page(user_id, page_token, page_size=3)
+            pages.append([recipe['id'] for recipe in page])
+            if not page_token:
+                break
+        assert [recipe_id for page in pages for recipe_id in page] == expected
+        assert all(len(page) == 3 for page in pages[:-1])
+        assert [recipe['id'] for recipe in manager.iter_user_recipes(user_id, page_size=3)] == expected
+
+
+def test_pages_filter_by_tag(manager):
+    for n in range(5):
+        add_recipe(manager, f"Dish {n}", tags=['even'] if n % 2 == 0 else [])
+    recipes = manager.iter_user_recipes('alice', tag='even', page_size=2)
+    assert [recipe['id'] for recipe in recipes] == ['dish-0', 'dish-2', 'dish-4']
+
+
+def test_summary_listings_carry_only_the_list_fields(manager):
+    add_recipe(manager, 'Apple Pie', tags=['fruit'])
+    add_recipe(manager, 'Bread', category='Bread')
+    summaries = manager.get_user_recipes('alice', tag='fruit', summary=True)
+    assert [recipe['id'] for recipe in summaries] == ['apple-pie']
+    assert set(summaries[0]) == {'id', 'title', 'category', 'prepTime', 'cookTime', 'servings', 'tags', 'userId'}
+    page, _ = manager.get_user_recipes_page('alice', summary=True)
+    assert [recipe['title'] for recipe in page] == ['Apple Pie', 'Bread']
+    assert all('ingredients' not in recipe for recipe in page)
+    assert manager.get_user_recipes('alice')[0]['ingredients'] == ['1 cup flour']
+
+
+def test_counts_match_the_listings(manager):
+    add_recipe(manager, 'Apple Pie', tags=['fruit'])
+    add_recipe(manager, 'Bread', category='Bread')
+    add_recipe(manager, 'Cake', tags=['fruit'])
+    add_recipe(manager, 'Not Mine', user_id='bob')
+    manager.add_to_favorites('apple-pie', 'bob')
+    manager.add_to_favorites('cake', 'bob')
+
+    assert manager.count_user_recipes('alice') == 3
+    assert manager.count_user_recipes('alice', category='Bread') == 1
+    assert manager.count_user_recipes('alice', tag='fruit') == 2
+    assert manager.count_user_recipes('carol') == 0
+    assert manager.count_user_favorites('bob') == 2
+    assert manager.count_user_favorites('alice') == 0
+
+
+def test_stale_versions_are_rejected(storage):
+    manager = RecipeBookManager(storage=storage)
+    other = RecipeBookManager(storage=storage)
+    recipe_id = add_recipe(manager, 'Apple Pie')
+    version = manager.get_recipe(recipe_id)['updateTime']
+    assert version is not None
+
+    assert other.update_recipe(recipe_id, 'alice', title='Pear Pie')
+    assert not manager.update_recipe(recipe_id, 'alice', expected_update_time=version, title='Plum Pie')
+    assert not manager.delete_recipe(recipe_id, 'alice', expected_update_time=version)
+    assert storage.get_recipe(recipe_id)['title'] == 'Pear Pie'
+
+    current = storage.get_recipe(recipe_id)['updateTime']
+    assert manager.update_recipe(recipe_id, 'alice', expected_update_time=current, title='Plum Pie')
+    assert storage.get_recipe(recipe_id)['title'] == 'Plum Pie'
+    assert not other.update_recipe(recipe_id, 'bob', title='Stolen')
+
+
+def test_delete_removes_the_recipe_from_every_favorites_list(manager):
+    kept = add_recipe(manager, 'Apple Pie')
+    for recipe_id in (add_recipe(manager, 'Bread'), add_recipe(manager, 'Cake')):
+        for user_id in ('alice', 'bob', 'carol'):
+            manager.add_to_favorites(recipe_id, user_id)
+    manager.add_to_favorites(kept, 'bob')
+
+    assert manager.delete_recipe('bread', 'alice')
+    assert manager.count_user_favorites('bob') == 2
+    assert manager.get_favorite_ids('carol') == {'cake'}
+
+    assert manager.delete_recipe('cake', 'alice', background_cleanup=True)
+    assert manager.wait_for_background_cleanup(timeout=5)
+    assert manager.get_favorite_ids('bob') == {kept}
+    assert manager.count_user_favorites('carol') == 0
+
+
+def test_allocated_ids_are_distinct_from_each_other_and_the_store(manager):
+    add_recipe(manager, 'Apple Pie')
+    add_recipe(manager, 'Pie')
+    lookups = []
+    recipe_ids_with_prefixes = manager.storage.recipe_ids_with_prefixes
+    manager.storage.recipe_ids_with_prefixes = lambda prefixes: (
+        lookups.append(sorted(prefixes)) or recipe_ids_with_prefixes(prefixes))
+    titles = ['Apple Pie', 'Bread', 'Apple Pie', 'Pie Crust', 'Bread']
+    assert manager.allocate_recipe_ids(titles) == ['apple-pie-1', 'bread', 'apple-pie-2', 'pie-crust', 'bread-1']
+    # Only taken or repeated slugs need their ranges, all in one lookup
+    assert lookups == [['apple-pie', 'bread']]
+
+
+def test_create_recipes_reports_each_input(manager):
+    add_recipe(manager, 'Apple Pie')
+    results = manager.create_recipes('alice', [
+        {'title': 'Apple Pie', 'ingredients': ['3 apples'], 'tags': ['fruit']},
+        {'title': ''},
+        {'title': 'Bread', 'id': 'ignored'},
+    ])
+    assert [(result['id'], result['error'] is None) for result in results] == [
+        ('apple-pie-1', True), (None, False), ('bread', True)]
+    assert manager.get_recipe('apple-pie-1')['ingredients'] == ['3 apples']
+    assert manager.get_recipe('bread')['userId'] == 'alice'
+    assert [recipe['id'] for recipe in manager.search_recipes_by_title('alice', 'bread')] == ['bread']
+
+
+def test_parsed_ingredients_follow_the_ingredient_list(manager):
+    recipe_id = add_recipe(manager, 'Apple Pie')
+    assert 'parsedIngredients' not in manager.get_recipe(recipe_id)
+    assert manager.update_recipe(recipe_id, 'alice', ingredients=['3 apples', '1 cup sugar'])
+    parsed = manager.get_recipe(recipe_id)['parsedIngredients']
+    assert [(line['quantity'], line['unit'], line['item']) for line in parsed] == [
+        (3.0, None, 'apples'), (1.0, 'cup', 'sugar')]
+
+
+def test_versioned_delete_of_an_already_deleted_recipe_fails(storage):
+    first = RecipeBookManager(storage=storage)
+    second = RecipeBookManager(storage=storage)
+    recipe_id = add_recipe(first, 'Apple Pie')
+    first_version = first.get_recipe(recipe_id)['updateTime']
+    second_version = second.get_recipe(recipe_id)['updateTime']
+
+    assert first.delete_recipe(recipe_id, 'alice', expected_update_time=first_version)
+    assert not second.delete_recipe(recipe_id, 'alice', expected_update_time=second_version)
+    assert not second.update_recipe(recipe_id, 'alice', expected_update_time=second_version, title='x')
+
+
+def test_unparseable_quantities_do_not_fail_updates(manager):
+    recipe_id = manager.create_recipe('alice', 'Bread', '', 10, 30, 1, ['2 cups flour'], ['Bake'],
+                                      'Bread', store_parsed_ingredients=True)
+    assert manager.update_recipe(recipe_id, 'alice', ingredients=['1/0 cup flour'])
+    assert manager.get_recipe(recipe_id)['parsedIngredients'][0]['quantity'] is None
+
+
+
+# Indexes: every query must agree before and after writes, and with an index
+# built from scratch
+
+def index_answers(manager, recipe_id='apple-pie'):
+    return {
+        'title': [recipe['id'] for recipe in manager.search_recipes_by_title('alice', 'apple')],
+        'pantry': [recipe['id'] for recipe in
+                   manager.search_recipes_by_pantry('alice', ['apples', 'flour'], max_missing=0)],
+        'duplicate': sorted(recipe['id'] for recipe in manager.find_duplicate_recipes(
+            'alice', 'Apple Pie', ['3 apples', '1 cup flour'])),
+        'similarity': sorted(recipe['id'] for recipe in manager.similar_recipes(recipe_id, 'alice')),
+        'search': sorted(recipe['id'] for recipe in manager.search_recipes('alice', 'apple')),
+        'suggestion': sorted(match['id'] for match in manager.suggest_recipes('alice', 'aple pie')),
+        'autocomplete': sorted(match['id'] for match in manager.complete_recipe_ids('alice', 'apple')),
+        'labels': manager.complete_labels('alice', 'f'),
+    }
+
+
+def seed(manager):
+    add_recipe(manager, 'Apple Pie', ['3 apples', '1 cup flour'], ['fruit'])
+    add_recipe(manager, 'Apple Crumble', ['3 apples', '1 cup oats'], ['fruit'])
+    add_recipe(manager, 'Bread', ['3 cups flour', '1 tsp yeast'], ['baking'], category='Bread')
+    add_recipe(manager, 'Not Mine', ['3 apples'], ['fruit'], user_id='bob')
+
+
+def test_indexes_follow_creates_updates_and_deletes(storage):
+    manager = RecipeBookManager(storage=storage)
+    seed(manager)
+    assert index_answers(manager) == {
+        'title': ['apple-crumble', 'apple-pie'],
+        'pantry': ['apple-pie'],
+        'duplicate': ['apple-pie'],
+        'similarity': ['apple-crumble', 'bread'],
+        'search': ['apple-crumble', 'apple-pie'],
+        'suggestion': ['apple-pie'],
+        'autocomplete': ['apple-crumble', 'apple-pie'],
+        'labels': ['fruit'],
+    }
+
+    add_recipe(manager, 'Apple Tart', ['3 apples', '1 cup flour'], ['fruit'])
+    assert manager.update_recipe('apple-crumble', 'alice', title='Pear Crumble', description='',
+                                 ingredients=['3 pears', '1 cup oats'], tags=['fresh'])
+    assert manager.delete_recipe('bread', 'alice')
+    expected = {
+        'title': ['apple-pie', 'apple-tart'],
+        'pantry': ['apple-pie', 'apple-tart'],
+        'duplicate': ['apple-pie', 'apple-tart'],
+        'similarity': ['apple-crumble', 'apple-tart'],
+        'search': ['apple-pie', 'apple-tart'],
+        'suggestion': ['apple-pie'],
+        'autocomplete': ['apple-crumble', 'apple-pie', 'apple-tart'],
+        'labels': ['fruit', 'fresh'],
+    }
+    assert index_answers(manager) == expected
+    assert index_answers(RecipeBookManager(storage=storage)) == expected
+
+
+def test_indexes_are_rebuilt_from_a_live_mirror():
+    storage = MemoryStorage()
+    manager = RecipeBookManager(storage=storage)
+    seed(manager)
+    before = index_answers(manager)
+
+    assert manager.enable_live_mirror('alice')
+    assert index_answers(manager) == before
+
+    # A write by another client reaches the indexes through the mirror
+    RecipeBookManager(storage=storage).delete_recipe('apple-crumble', 'alice')
+    after = index_answers(manager)
+    assert after['title'] == ['apple-pie']
+    assert after['search'] == ['apple-pie']
+    assert after['similarity'] == ['bread']
+    manager.disable_live_mirror('alice')
+
+
+
+def test_stale_ui_edit_after_a_listing_is_rejected(tmp_path, monkeypatch, capsys):
+    storage = SQLiteStorage(str(tmp_path / 'recipes.db'))
+    ui = RecipeBookUI(None, 'alice', storage=storage)
+    monkeypatch.setattr(ui, 'clear_screen', lambda: None)
+    other = RecipeBookManager(storage=storage)
+    add_recipe(other, 'Apple Pie')
+    # The listing caches the recipe, which the edit screen then reads
+    assert [recipe['id'] for recipe in ui.manager.search_recipes_by_title('alice', 'apple')] == ['apple-pie']
+
+    def concurrent_edit():
+        assert other.update_recipe('apple-pie', 'alice', title='Pear Pie')
+        return 'Plum Pie'
+
+    answers = iter([lambda: 'apple-pie', concurrent_edit, lambda: '', lambda: '', lambda: ''])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers)())
+    ui.update_recipe()
+
+    assert 'Failed to update recipe' in capsys.readouterr().out
+    assert storage.get_recipe('apple-pie')['title'] == 'Pear Pie'
+
+
+def test_batched_and_mirrored_reads_carry_versions(storage):
+    manager = RecipeBookManager(storage=storage)
+    recipe_id = add_recipe(manager, 'Apple Pie')
+    version = storage.get_recipe(recipe_id)['updateTime']
+    assert storage.get_recipes([recipe_id])[recipe_id]['updateTime'] == version
+    if isinstance(storage, MemoryStorage):
+        assert manager.enable_live_mirror('alice')
+        assert manager.get_recipe(recipe_id)['updateTime'] == version
+        manager.disable_live_mirror('alice')
+
+
+def test_prompt_takes_any_existing_id_without_suggesting(manager, monkeypatch, capsys):
+    ui = RecipeBookUI(None, 'alice', storage=manager.storage)
+    add_recipe(ui.manager, 'Apple Pie', user_id='bob')
+    add_recipe(ui.manager, 'Apple Tart')
+    suggested = []
+    monkeypatch.setattr(ui.manager, 'suggest_recipes', lambda *args, **kwargs: suggested.append(args) or [])
+
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'apple-pie')
+    assert ui.prompt_recipe_id('Enter Recipe ID') == 'apple-pie'
+    assert suggested == []
+    assert 'No recipe' not in capsys.readouterr().out
+
+
+def test_prompt_offers_the_users_recipes_for_a_miss(manager, monkeypatch, capsys):
+    ui = RecipeBookUI(None, 'alice', storage=manager.storage)
+    add_recipe(ui.manager, 'Apple Tart')
+    answers = iter(['aple-tart', '1'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    assert ui.prompt_recipe_id('Enter Recipe ID') == 'apple-tart'
+    assert "No recipe with ID 'aple-tart'" in capsys.readouterr().out
+
+
+def test_failed_favorites_cleanup_does_not_fail_the_delete(manager, monkeypatch, caplog):
+    for title in ('Apple Pie', 'Bread'):
+        manager.add_to_favorites(add_recipe(manager, title), 'bob')
+    delete_favorites = manager.storage.delete_favorites_for_recipe
+    failures = iter([True, False, True, True])
+
+    def flaky_delete(recipe_id):
+        if next(failures):
+            raise ConnectionError('unavailable')
+        return delete_favorites(recipe_id)
+
+    monkeypatch.setattr(manager.storage, 'delete_favorites_for_recipe', flaky_delete)
+    # The first attempt fails and the background retry succeeds
+    assert manager.delete_recipe('apple-pie', 'alice')
+    assert manager.wait_for_background_cleanup(timeout=5)
+    assert manager.get_favorite_ids('bob') == {'bread'}
+
+    # Both attempts fail: the recipe is still reported deleted, and the
+    # sweeper removes the orphan later
+    assert manager.delete_recipe('bread', 'alice')
+    assert manager.wait_for_background_cleanup(timeout=5)
+    assert manager.get_recipe('bread') is None
+    assert 'deleted recipe bread' in caplog.text
+    assert manager.sweep_orphan_favorites()['removed'] == 1
+    assert manager.get_favorite_ids('bob') == set()
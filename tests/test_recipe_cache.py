@@ -0,0 +1,57 @@
+from recipe_cache import RecipeCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = RecipeCache(ttl=10, clock=clock)
+    cache.put('a', {'title': 'A'})
+    clock.now = 9.9
+    assert cache.get('a') == {'title': 'A'}
+    clock.now = 10
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RecipeCache(max_size=2)
+    cache.put('a', {})
+    cache.put('b', {})
+    cache.get('a')
+    cache.put('c', {})
+    assert cache.get('b') is None
+    assert cache.get('a') == {} and cache.get('c') == {}
+
+
+def test_copies_protect_the_cached_entry():
+    cache = RecipeCache()
+    recipe = {'tags': ['fruit']}
+    cache.put('a', recipe)
+    recipe['tags'].append('changed')
+    cache.get('a')['tags'].append('changed')
+    assert cache.get('a') == {'tags': ['fruit']}
+
+
+def test_stats_count_hits_and_misses():
+    cache = RecipeCache()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'hitRate': 0.0}
+    cache.put('a', {})
+    cache.get('a')
+    cache.get('a')
+    cache.get('b')
+    cache.invalidate('a')
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'size': 0, 'hitRate': 0.5}
+
+
+def test_zero_size_disables_the_cache():
+    cache = RecipeCache(max_size=0)
+    cache.put('a', {})
+    assert cache.get('a') is None
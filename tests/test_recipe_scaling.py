@@ -0,0 +1,70 @@
+import pytest
+
+from conftest import add_recipe
+from recipe_scaling import format_ingredient, format_quantity
+
+np = pytest.importorskip('numpy')
+
+from recipe_scaling import round_to_kitchen_fractions, scale_recipes  # noqa: E402
+
+
+def test_rounding_uses_measurable_fractions():
+    rounded = round_to_kitchen_fractions([0.3, 2.1, 7.3, 12.4, 0.01, 152.6, np.nan],
+                                         whole_units=[False] * 5 + [True, False])
+    assert rounded[:6].tolist() == [0.25, 2.0, 7.5, 12.0, 0.125, 153.0]
+    assert np.isnan(rounded[6])
+
+
+@pytest.mark.parametrize('value, text', [(2.5, '2 1/2'), (0.375, '3/8'), (3.0, '3'), (1.99, '2')])
+def test_quantities_format_as_fractions(value, text):
+    assert format_quantity(value) == text
+
+
+def test_units_are_pluralized_unless_abbreviated():
+    assert format_ingredient({'quantity': 2, 'unit': 'pinch', 'item': 'salt'}) == '2 pinches salt'
+    assert format_ingredient({'quantity': 2, 'unit': 'tbsp', 'item': 'oil', 'note': 'divided'}) == \
+        '2 tbsp oil, divided'
+
+
+def test_meal_plan_scales_each_recipe_by_its_own_factor():
+    recipes = [
+        {'id': 'pie', 'title': 'Pie', 'servings': 4,
+         'ingredients': ['1 1/2 cups flour', '2-3 apples', 'Salt to taste']},
+        {'id': 'soup', 'title': 'Soup', 'servings': 2, 'ingredients': ['250 ml stock']},
+    ]
+    pie, soup = scale_recipes(recipes, [6, 3])
+    assert pie['scaleFactor'] == 1.5
+    assert pie['ingredients'] == ['2 1/4 cups flour', '3-4 1/2 apples', 'Salt to taste']
+    assert soup['ingredients'] == ['375 ml stock']
+    assert (soup['servings'], soup['originalServings']) == (3, 2)
+
+
+def test_scaling_needs_servings():
+    with pytest.raises(ValueError):
+        scale_recipes([{'id': 'pie', 'servings': 0, 'ingredients': []}], [2])
+    with pytest.raises(ValueError):
+        scale_recipes([{'id': 'pie', 'servings': 4, 'ingredients': []}], [0])
+
+
+def test_manager_skips_missing_recipes(manager):
+    recipe_id = add_recipe(manager, 'Apple Pie', ingredients=['3 apples'], servings=2)
+    assert manager.scale_recipe(recipe_id, 4)['ingredients'] == ['6 apples']
+    assert manager.scale_recipe('nothing', 4) is None
+    assert [recipe['id'] for recipe in manager.scale_meal_plan({'nothing': 2, recipe_id: 1})] == [recipe_id]
+
+
+def test_normalized_units_read_naturally():
+    recipe = {'id': 'pie', 'servings': 1, 'ingredients': ['4 tbsp butter', '600 g flour']}
+    assert scale_recipes([recipe], [4], normalize_units=True)[0]['ingredients'] == [
+        '1 cup butter', '2 1/2 kg flour']
+
+
+def test_shopping_list_adds_up_a_meal_plan(manager):
+    pie = add_recipe(manager, 'Apple Pie', ingredients=['1 cup flour', '2 apples'], servings=2)
+    bread = add_recipe(manager, 'Bread', ingredients=['2 cups flour', 'Salt'], servings=1)
+    lines = {entry['item']: (entry['line'], entry['sources']) for entry in manager.shopping_list({pie: 4, bread: 1})}
+    assert lines == {
+        'flour': ('4 cups flour', [pie, bread]),
+        'apples': ('4 apples', [pie]),
+        'Salt': ('Salt', [bread]),
+    }
@@ -0,0 +1,30 @@
+import recipe_storage
+
+
+def put_recipes(storage, count, user_id='alice'):
+    for number in range(count):
+        storage.create_recipe(f"r{number}", {'title': f"Recipe {number}", 'userId': user_id,
+                                             'category': 'Dessert', 'tags': []})
+
+
+def test_batched_reads_skip_missing_and_repeated_ids(storage, monkeypatch):
+    monkeypatch.setattr(recipe_storage, 'GET_ALL_CHUNK_SIZE', 3)
+    put_recipes(storage, 8)
+    recipes = storage.get_recipes(['r7', 'r0', 'missing', 'r0', 'r3', 'r4', 'r5', 'r6'])
+    assert sorted(recipes) == ['r0', 'r3', 'r4', 'r5', 'r6', 'r7']
+    assert recipes['r7']['title'] == 'Recipe 7' and recipes['r7']['id'] == 'r7'
+    assert storage.get_recipes([]) == {}
+
+
+def test_chunked_splits_in_order():
+    assert list(recipe_storage.chunked(list(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_prefix_ranges_for_many_slugs_match_one_at_a_time(storage, monkeypatch):
+    monkeypatch.setattr(recipe_storage, 'GET_ALL_CHUNK_SIZE', 2)
+    for recipe_id in ['pie', 'pie-1', 'pie-crust', 'pie-crust-2', 'pies', 'tart', 'tart-10', 'cake-x', 'cakes']:
+        storage.create_recipe(recipe_id, {'title': recipe_id, 'userId': 'alice', 'tags': []})
+    prefixes = ['pie', 'pie-crust', 'tart', 'cake', 'bread', 'pie']
+    assert storage.recipe_ids_with_prefixes(prefixes) == {
+        prefix: storage.recipe_ids_with_prefix(prefix) for prefix in prefixes}
+    assert storage.recipe_ids_with_prefixes([]) == {}
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+from conftest import add_recipe
+from recipe_book_manager import RecipeBookManager
+from recipe_storage import SQLiteStorage
+
+
+def without_versions(documents):
+    return [{key: value for key, value in document.items() if key != 'updateTime'}
+            for document in documents]
+
+
+def test_export_import_round_trip_keeps_ids_and_timestamps(manager, tmp_path):
+    for n in range(7):
+        add_recipe(manager, f"Dish {n}", tags=['weeknight'] if n % 2 else [])
+    add_recipe(manager, 'Not Mine', user_id='bob')
+    manager.add_to_favorites('dish-3', 'alice', notes='twice a week')
+
+    exported = io.StringIO()
+    reports = []
+    report = manager.export_recipes('alice', exported, progress=reports.append)
+    assert (report['recipes'], report['favorites'], report['complete']) == (7, 1, True)
+
+    target = RecipeBookManager(storage=SQLiteStorage(str(tmp_path / 'copy.db')))
+    exported.seek(0)
+    report = target.import_recipes(exported, batch_size=3, max_in_flight=2)
+    assert (report['recipes'], report['favorites']) == (7, 1)
+
+    source_recipes = without_versions(manager.storage.query_recipes('alice'))
+    assert without_versions(target.storage.query_recipes('alice')) == source_recipes
+    assert source_recipes[0]['createdAt'].tzinfo is not None
+    assert without_versions(target.storage.query_favorites('alice')) == \
+        without_versions(manager.storage.query_favorites('alice'))
+    assert target.count_user_recipes('bob') == 0
+    # Imported recipes are searchable straight away
+    assert len(target.search_recipes_by_title('alice', 'dish')) == 7
+
+
+def test_import_rejects_unknown_kinds(manager):
+    lines = io.StringIO('{"kind": "comment", "id": "x", "data": {}}\n')
+    with pytest.raises(ValueError, match='Line 1'):
+        manager.import_recipes(lines)
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from conftest import add_recipe
+from recipe_book_manager import RecipeBookManager
+from search_index import SearchIndex, analyze, parse_query, stem
+
+RECIPES = {
+    'apple-pie': {'title': 'Apple Pie', 'ingredients': ['3 apples', '1 cup flour']},
+    'pear-tart': {'title': 'Pear Tart', 'description': 'Like an apple tart'},
+    'bread': {'title': 'Bread', 'instructions': ['Knead', 'Bake']},
+}
+
+
+def test_words_are_stemmed_and_stop_words_dropped():
+    assert [stem(word) for word in ('baking', 'baked', 'apples', 'caresses', 'ponies')] == \
+        ['bake', 'bake', 'appl', 'caress', 'poni']
+    assert analyze('Bake the apples until golden') == ['bake', 'appl', 'golden']
+    assert parse_query('apple "whole wheat" bread') == (['appl', 'bread'], [['whole', 'wheat']])
+
+
+def test_title_matches_rank_first_and_phrases_are_exact():
+    index = SearchIndex()
+    for recipe_id, recipe in RECIPES.items():
+        index.add(recipe_id, recipe)
+    assert [recipe_id for recipe_id, _ in index.search('apple')] == ['apple-pie', 'pear-tart']
+    assert [recipe_id for recipe_id, _ in index.search('"apple tart"')] == ['pear-tart']
+    assert [recipe_id for recipe_id, _ in index.search('"tart apple"')] == []
+    index.remove('apple-pie')
+    assert [recipe_id for recipe_id, _ in index.search('apples')] == ['pear-tart']
+
+
+def test_search_journal_replays_over_the_snapshot(tmp_path):
+    path = str(tmp_path / 'alice.search.json')
+    index = SearchIndex(path)
+    for recipe_id, recipe in RECIPES.items():
+        index.add(recipe_id, recipe)
+    index.save()
+
+    index.remove('bread')
+    index.add('pear-tart', {'title': 'Pear Tart'})
+    index.add('plum-cake', {'title': 'Plum Cake', 'description': 'Not apple'})
+    with open(path + '.journal', encoding='utf-8') as journal_file:
+        assert len(journal_file.readlines()) == 3
+
+    loaded = SearchIndex.load(path)
+    assert loaded.search('apple') == index.search('apple')
+    assert sorted(loaded._documents) == ['apple-pie', 'pear-tart', 'plum-cake']
+
+
+def test_search_journal_stops_at_a_truncated_line(tmp_path):
+    path = str(tmp_path / 'alice.search.json')
+    index = SearchIndex(path)
+    index.add('apple-pie', RECIPES['apple-pie'])
+    index.save()
+    index.add('pear-tart', RECIPES['pear-tart'])
+    with open(path + '.journal', 'a', encoding='utf-8') as journal_file:
+        journal_file.write(json.dumps({'op': 'add', 'id': 'bread', 'fields': {}})[:20])
+
+    loaded = SearchIndex.load(path)
+    assert sorted(loaded._documents) == ['apple-pie', 'pear-tart']
+    # The broken tail is folded away, so later writes replay cleanly
+    loaded.add('bread', RECIPES['bread'])
+    assert sorted(SearchIndex.load(path)._documents) == ['apple-pie', 'bread', 'pear-tart']
+
+
+def test_manager_search_is_saved_between_runs(storage, tmp_path):
+    search_index_dir = str(tmp_path / 'search')
+    manager = RecipeBookManager(storage=storage, search_index_dir=search_index_dir)
+    add_recipe(manager, 'Apple Pie', ingredients=['3 apples'])
+    add_recipe(manager, 'Baked Apples', user_id='bob')
+    add_recipe(manager, 'Bread', instructions=['Knead', 'Bake'])
+    assert [recipe['id'] for recipe in manager.search_recipes('alice', 'apples')] == ['apple-pie']
+    assert manager.delete_recipe('bread', 'alice')
+
+    fresh = RecipeBookManager(storage=storage, search_index_dir=search_index_dir)
+    assert [recipe['id'] for recipe in fresh.search_recipes('alice', 'kneading')] == []
+    results = fresh.search_recipes('alice', 'apple')
+    assert [recipe['id'] for recipe in results] == ['apple-pie']
+    assert results[0]['score'] > 0
+
+
+def test_stale_finds_new_changed_and_deleted_recipes():
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    index = SearchIndex()
+    index.add('apple-pie', RECIPES['apple-pie'], now)
+    index.add('pear-tart', RECIPES['pear-tart'], now)
+    index.add('bread', RECIPES['bread'])
+
+    changed, removed = index.stale({'apple-pie': now, 'pear-tart': now + timedelta(seconds=1),
+                                    'bread': now, 'plum-cake': now})
+    assert sorted(changed) == ['bread', 'pear-tart', 'plum-cake']
+    assert removed == []
+    assert index.stale({'apple-pie': now}) == ([], ['pear-tart', 'bread'])
+
+
+def test_versions_survive_the_journal(tmp_path):
+    path = str(tmp_path / 'alice.search.json')
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    index = SearchIndex(path)
+    index.add('apple-pie', RECIPES['apple-pie'], now)
+    index.save()
+    index.add('pear-tart', RECIPES['pear-tart'], now)
+    assert SearchIndex.load(path).stale({'apple-pie': now, 'pear-tart': now}) == ([], [])
+
+
+def test_saved_search_index_catches_up_with_other_writers(storage, tmp_path):
+    search_index_dir = str(tmp_path / 'search')
+    first = RecipeBookManager(storage=storage, search_index_dir=search_index_dir)
+    add_recipe(first, 'Apple Pie', ['3 apples'])
+    add_recipe(first, 'Apple Crumble', ['4 apples'])
+    assert sorted(recipe['id'] for recipe in first.search_recipes('alice', 'apple')) == ['apple-crumble', 'apple-pie']
+
+    other = RecipeBookManager(storage=storage)
+    add_recipe(other, 'Apple Tart', ['3 apples'])
+    assert other.update_recipe('apple-crumble', 'alice', title='Pear Crumble', description='',
+                               ingredients=['3 pears'])
+    assert other.delete_recipe('apple-pie', 'alice')
+
+    second = RecipeBookManager(storage=storage, search_index_dir=search_index_dir)
+    assert [recipe['id'] for recipe in second.search_recipes('alice', 'apple')] == ['apple-tart']
+    assert [recipe['id'] for recipe in second.search_recipes('alice', 'pear')] == ['apple-crumble']
+    second.rebuild_search_index('alice')
+    assert [recipe['id'] for recipe in second.search_recipes('alice', 'apple')] == ['apple-tart']
+
+
+def test_damaged_snapshots_are_not_loaded(tmp_path):
+    path = tmp_path / 'alice.search.json'
+    for damage in ['{"version": 2, "docum', '[1, 2]', '{"version": 2}', '\udcff']:
+        path.write_text(damage, encoding='utf-8', errors='surrogateescape')
+        assert SearchIndex.load(str(path)) is None
+
+
+def test_search_rebuilds_a_damaged_saved_index(storage, tmp_path):
+    search_index_dir = tmp_path / 'search'
+    manager = RecipeBookManager(storage=storage, search_index_dir=str(search_index_dir))
+    add_recipe(manager, 'Apple Pie')
+    assert [recipe['id'] for recipe in manager.search_recipes('alice', 'apple')] == ['apple-pie']
+    (snapshot_path,) = search_index_dir.glob('*.search.json')
+    snapshot_path.write_text(snapshot_path.read_text(encoding='utf-8')[:-10], encoding='utf-8')
+
+    fresh = RecipeBookManager(storage=storage, search_index_dir=str(search_index_dir))
+    assert [recipe['id'] for recipe in fresh.search_recipes('alice', 'apple')] == ['apple-pie']
+    assert SearchIndex.load(str(snapshot_path)) is not None
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from conftest import add_recipe
+
+pytest.importorskip('numpy')
+
+from similar_recipes import SimilarityIndex  # noqa: E402
+
+
+def test_shared_ingredients_rank_first():
+    index = SimilarityIndex()
+    index.add('pancakes', ['2 cups flour', '2 eggs', '1 cup milk'], ['breakfast'], 'Breakfast')
+    index.add('crepes', ['1 cup flour', '2 eggs', '2 cups milk'], ['breakfast'], 'Breakfast')
+    index.add('omelette', ['3 eggs', 'salt'], ['quick'], 'Breakfast')
+    index.add('stew', ['2 lb beef', '4 carrots'], ['slow'], 'Main')
+
+    matches = index.most_similar('pancakes', 3)
+    assert [recipe_id for recipe_id, _ in matches][:2] == ['crepes', 'omelette']
+    assert matches[0][1] > matches[1][1] > 0
+    assert index.most_similar('missing') == []
+
+
+def test_similarity_compaction_keeps_the_scores():
+    rng = random.Random(5)
+    recipes = {f"r{number}": ([f"{rng.randrange(30)} item" for _ in range(rng.randrange(1, 6))],
+                              [rng.choice(['quick', 'sweet', 'spicy'])], rng.choice(['Dessert', 'Main']))
+               for number in range(200)}
+    index = SimilarityIndex()
+    for recipe_id, features in recipes.items():
+        index.add(recipe_id, *features)
+    for recipe_id in rng.sample(sorted(recipes), 150):
+        index.remove(recipe_id)
+        del recipes[recipe_id]
+    # Compacted once fewer than half the rows were live
+    assert len(index._row_ids) < 100
+
+    fresh = SimilarityIndex()
+    for recipe_id, features in recipes.items():
+        fresh.add(recipe_id, *features)
+    # Every neighbour, as ties at a cut-off could fall either way
+    for recipe_id in recipes:
+        assert (dict(index.most_similar(recipe_id, len(recipes)))
+                == pytest.approx(dict(fresh.most_similar(recipe_id, len(recipes)))))
+
+
+def test_manager_recommendations_stay_within_the_user(manager):
+    add_recipe(manager, 'Apple Pie', ingredients=['3 apples', '1 cup flour'], tags=['fruit'])
+    add_recipe(manager, 'Apple Tart', ingredients=['2 apples', '1 cup flour'], tags=['fruit'])
+    add_recipe(manager, 'Apple Cake', ingredients=['3 apples', '1 cup flour'], tags=['fruit'], user_id='bob')
+    add_recipe(manager, 'Stew', ingredients=['2 lb beef'], category='Main')
+
+    similar = manager.similar_recipes('apple-pie', 'alice', limit=1)
+    assert [recipe['id'] for recipe in similar] == ['apple-tart']
+    assert 0 < similar[0]['similarity'] <= 1
+    assert manager.delete_recipe('apple-tart', 'alice')
+    assert 'apple-tart' not in [recipe['id'] for recipe in manager.similar_recipes('apple-pie', 'alice')]
@@ -0,0 +1,63 @@
+import random
+
+from conftest import add_recipe
+from suggestion_index import SuggestionIndex, levenshtein
+
+
+def reference_levenshtein(first, second):
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (first_char != second_char)))
+        previous = current
+    return previous[-1]
+
+
+def test_myers_distance_matches_the_dynamic_programming_table():
+    rng = random.Random(7)
+    pairs = [('', ''), ('', 'abc'), ('abc', ''), ('kitten', 'sitting'), ('pie', 'pie')]
+    for _ in range(500):
+        # Lengths past 64 cover bit vectors wider than a machine word
+        pairs.append((''.join(rng.choice('abcd') for _ in range(rng.randrange(0, 80))),
+                      ''.join(rng.choice('abcd') for _ in range(rng.randrange(0, 80)))))
+    for first, second in pairs:
+        assert levenshtein(first, second) == reference_levenshtein(first, second), (first, second)
+
+
+def test_bk_tree_matches_a_scan_after_removals_and_rebuilds():
+    rng = random.Random(3)
+    index = SuggestionIndex()
+    titles = {}
+    for number in range(400):
+        title = ''.join(rng.choice('abcde ') for _ in range(rng.randrange(3, 12)))
+        titles[f"r{number}"] = title
+        index.add(f"r{number}", title)
+    # Enough removals to push the dead nodes past the rebuild threshold
+    for recipe_id in rng.sample(sorted(titles), 300):
+        index.remove(recipe_id)
+        del titles[recipe_id]
+    assert index._dead_nodes <= max(64, len(index._nodes) - index._dead_nodes)
+
+    for query in ['abc', 'dead', 'ba ce', 'r12', 'eeee']:
+        expected = {}
+        for recipe_id, title in titles.items():
+            distance = min(levenshtein(query, key) for key in index._keys(recipe_id, title))
+            if distance <= 1:
+                expected[recipe_id] = distance
+        matches = index.suggest(query, limit=len(titles), max_distance=1)
+        assert {recipe_id: distance for recipe_id, _, distance in matches} == expected
+
+
+def test_manager_suggests_the_users_closest_recipes(manager):
+    add_recipe(manager, 'Apple Pie')
+    add_recipe(manager, 'Apple Tart')
+    add_recipe(manager, 'Apple Pies', user_id='bob')
+    suggestions = manager.suggest_recipes('alice', 'aple-pie')
+    assert suggestions[0] == {'id': 'apple-pie', 'title': 'Apple Pie', 'distance': 1}
+    assert 'apple-pies' not in [suggestion['id'] for suggestion in suggestions]
+    assert manager.suggest_recipes('alice', 'apple-tart')[0]['distance'] == 0
+
+    assert manager.update_recipe('apple-tart', 'alice', title='Plum Cake')
+    assert manager.suggest_recipes('alice', 'plum cak')[0]['id'] == 'apple-tart'
@@ -0,0 +1,43 @@
+import random
+
+from title_index import TitleIndex
+
+
+def test_search_matches_a_substring_scan():
+    rng = random.Random(2)
+    words = ['apple', 'pie', 'tart', 'bread', 'rye', 'sour', 'dough', 'app']
+    titles = {f"r{number}": ' '.join(rng.choice(words) for _ in range(rng.randrange(1, 4))).title()
+              for number in range(200)}
+    index = TitleIndex()
+    for recipe_id, title in titles.items():
+        index.add(recipe_id, title)
+    for recipe_id in rng.sample(sorted(titles), 50):
+        index.remove(recipe_id)
+        del titles[recipe_id]
+
+    for term in ['ap', 'APPLE', 'e p', 'ough', 'rye sour', 'xyz', '']:
+        assert index.search(term) == sorted(recipe_id for recipe_id, title in titles.items()
+                                            if term.lower() in title.lower())
+
+
+def test_keywords_must_all_appear_as_words():
+    index = TitleIndex()
+    index.add('a', 'Apple Pie')
+    index.add('b', 'Pie with Apples')
+    index.add('c', 'Apple Tart')
+    assert index.search_keywords('pie apple') == ['a']
+    assert index.search_keywords('apple') == ['a', 'c']
+    assert index.search_keywords('') == []
+
+
+def test_add_replaces_the_previous_title():
+    index = TitleIndex()
+    index.add('a', 'Apple Pie')
+    index.add('a', 'Pear Tart')
+    assert index.search('apple') == []
+    assert index.search('pear') == ['a']
+    assert len(index) == 1
+    index.remove('a')
+    index.remove('a')
+    assert 'a' not in index
+    assert not index._ngram_postings and not index._token_postings
@@ -0,0 +1,94 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from unit_conversion import convert, convert_quantities, density_hint, display_units, merge_rows  # noqa: E402
+
+
+def test_units_convert_within_a_dimension():
+    assert convert(3, 'tsp', 'tbsp') == pytest.approx(1.0)
+    assert convert(2, 'lb', 'kg') == pytest.approx(0.90718474)
+    assert convert(1, 'cup', 'ml') == pytest.approx(236.5882365)
+    assert convert(2, 'clove', 'g') is None
+
+
+def test_volume_and_mass_convert_through_a_density_hint():
+    assert convert(1, 'cup', 'g', item='all-purpose flour') == pytest.approx(236.5882365 * 0.53)
+    assert convert(100, 'g', 'ml', item='water') == pytest.approx(100.0)
+    assert convert(1, 'cup', 'g') is None
+    assert convert(1, 'cup', 'g', item='mystery') is None
+
+
+def test_longest_density_hint_wins():
+    assert density_hint('Light Brown Sugar') == 0.93
+    assert density_hint('sugar') == 0.85
+    assert density_hint('eggs') is None
+
+
+def test_display_units_stay_in_the_same_system():
+    units, factors = display_units([48, 2, 1500, 3, 2, 4], ['tsp', 'tsp', 'g', 'pinch', 'clove', 'oz'])
+    assert units == ['cup', 'tsp', 'kg', 'pinch', 'clove', 'oz']
+    assert (np.array([48, 2, 1500, 3, 2, 4]) * factors).tolist() == pytest.approx([1, 2, 1.5, 3, 2, 4])
+
+
+def test_convert_quantities_converts_a_batch_at_once():
+    result = convert_quantities([2, 1, 3, 1], ['cup', 'l', 'clove', None], 'ml')
+    assert result[:2].tolist() == pytest.approx([473.176473, 1000.0])
+    assert np.isnan(result[2:]).all()
+
+
+def test_convert_quantities_uses_densities_when_items_are_given():
+    result = convert_quantities([1, 500, 1], ['cup', 'g', 'cup'], 'g',
+                                items=['flour', 'sugar', 'mystery'])
+    assert result[:2].tolist() == pytest.approx([236.5882365 * 0.53, 500.0])
+    assert np.isnan(result[2])
+
+
+def test_convert_quantities_rejects_unknown_units():
+    with pytest.raises(ValueError):
+        convert_quantities([1], ['cup'], 'handful')
+
+
+def test_merge_rows_adds_up_volumes_of_one_item():
+    merged = merge_rows([
+        {'item': 'flour', 'quantity': 1, 'unit': 'cup', 'source': 'bread'},
+        {'item': 'Flour', 'quantity': 4, 'unit': 'tbsp', 'source': 'cake'},
+        {'item': 'flour', 'quantity': 0.5, 'unit': 'cup', 'source': 'bread'},
+    ])
+    assert len(merged) == 1
+    assert merged[0]['item'] == 'flour'
+    assert merged[0]['unit'] == 'cup'
+    assert merged[0]['quantity'] == pytest.approx(1.75)
+    assert merged[0]['sources'] == ['bread', 'cake']
+
+
+def test_merge_rows_weighs_volumes_of_an_item_also_given_by_weight():
+    merged = merge_rows([
+        {'item': 'sugar', 'quantity': 100, 'unit': 'g'},
+        {'item': 'sugar', 'quantity': 1, 'unit': 'cup'},
+        {'item': 'milk', 'quantity': 1, 'unit': 'cup'},
+    ])
+    by_item = {entry['item']: entry for entry in merged}
+    assert by_item['sugar']['unit'] == 'g'
+    assert by_item['sugar']['quantity'] == pytest.approx(100 + 236.5882365 * 0.85)
+    # milk never appears by weight, so it stays a volume
+    assert (by_item['milk']['quantity'], by_item['milk']['unit']) == (pytest.approx(1.0), 'cup')
+
+
+def test_merge_rows_totals_count_units_per_unit():
+    merged = merge_rows([
+        {'item': 'garlic', 'quantity': 2, 'unit': 'clove'},
+        {'item': 'garlic', 'quantity': 3, 'unit': 'clove'},
+        {'item': 'garlic', 'quantity': 1, 'unit': 'head'},
+    ])
+    assert sorted((entry['quantity'], entry['unit']) for entry in merged) == [(1.0, 'head'), (5.0, 'clove')]
+
+
+def test_merge_rows_lists_rows_without_a_quantity_once():
+    merged = merge_rows([
+        {'item': 'salt', 'quantity': None, 'unit': None},
+        {'item': 'salt', 'quantity': None, 'unit': None},
+        {'item': 'butter', 'quantity': 2, 'unit': 'tbsp'},
+    ])
+    assert [(entry['item'], entry['quantity']) for entry in merged] == [('butter', pytest.approx(2.0)), ('salt', None)]
+    assert merge_rows([]) == []
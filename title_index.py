@@ -0,0 +1,94 @@
+import re
+from typing import Dict, List, Set
+
+
+NGRAM_SIZE = 3
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def title_ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class TitleIndex:
+    """In-memory token and trigram postings over one user's recipe titles.
+
+    Substring search intersects the trigram postings of the search term and
+    only then checks the surviving titles, so the work done is proportional
+    to the candidates rather than to the whole library.
+    """
+
+    def __init__(self):
+        self._titles: Dict[str, str] = {}
+        self._ngram_postings: Dict[str, Set[str]] = {}
+        self._token_postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self._titles
+
+    def add(self, recipe_id: str, title: str) -> None:
+        """Index a title, replacing any title previously stored for recipe_id"""
+        self.remove(recipe_id)
+
+        title_lower = title.lower()
+        self._titles[recipe_id] = title_lower
+        for ngram in title_ngrams(title_lower):
+            self._ngram_postings.setdefault(ngram, set()).add(recipe_id)
+        for token in TOKEN_PATTERN.findall(title_lower):
+            self._token_postings.setdefault(token, set()).add(recipe_id)
+
+    def remove(self, recipe_id: str) -> None:
+        title_lower = self._titles.pop(recipe_id, None)
+        if title_lower is None:
+            return
+
+        for ngram in title_ngrams(title_lower):
+            self._discard(self._ngram_postings, ngram, recipe_id)
+        for token in TOKEN_PATTERN.findall(title_lower):
+            self._discard(self._token_postings, token, recipe_id)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[str]], key: str, recipe_id: str) -> None:
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(recipe_id)
+            if not ids:
+                del postings[key]
+
+    @staticmethod
+    def _intersect(posting_lists: List[Set[str]]) -> Set[str]:
+        if not posting_lists:
+            return set()
+        posting_lists = sorted(posting_lists, key=len)
+        result = set(posting_lists[0])
+        for ids in posting_lists[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    def search(self, search_term: str) -> List[str]:
+        """IDs of recipes whose title contains search_term (case-insensitive)"""
+        term = search_term.lower()
+        if len(term) < NGRAM_SIZE:
+            # Too short to have a trigram; the titles are local, so a scan
+            # here costs no round trips.
+            candidates = self._titles.keys()
+        else:
+            ngrams = title_ngrams(term)
+            if any(ngram not in self._ngram_postings for ngram in ngrams):
+                return []
+            candidates = self._intersect([self._ngram_postings[ngram] for ngram in ngrams])
+
+        return sorted(recipe_id for recipe_id in candidates if term in self._titles[recipe_id])
+
+    def search_keywords(self, search_term: str) -> List[str]:
+        """IDs of recipes whose title contains every word of search_term"""
+        tokens = set(TOKEN_PATTERN.findall(search_term.lower()))
+        if not tokens or any(token not in self._token_postings for token in tokens):
+            return []
+        return sorted(self._intersect([self._token_postings[token] for token in tokens]))
@@ -0,0 +1,271 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+VOLUME = 'volume'
+MASS = 'mass'
+
+# unit -> (dimension, size in the dimension's base unit, measuring system).
+# Volumes are in millilitres and masses in grams; units missing here
+# (cloves, cans, slices...) are counts and only convert to themselves.
+UNIT_TABLE = {
+    'pinch': (VOLUME, 0.3080575, 'us'),
+    'dash': (VOLUME, 0.616115, 'us'),
+    'tsp': (VOLUME, 4.92892159375, 'us'),
+    'tbsp': (VOLUME, 14.78676478125, 'us'),
+    'fl oz': (VOLUME, 29.5735295625, 'us'),
+    'cup': (VOLUME, 236.5882365, 'us'),
+    'pint': (VOLUME, 473.176473, 'us'),
+    'quart': (VOLUME, 946.352946, 'us'),
+    'gallon': (VOLUME, 3785.411784, 'us'),
+    'ml': (VOLUME, 1.0, 'metric'),
+    'l': (VOLUME, 1000.0, 'metric'),
+    'oz': (MASS, 28.349523125, 'us'),
+    'lb': (MASS, 453.59237, 'us'),
+    'g': (MASS, 1.0, 'metric'),
+    'kg': (MASS, 1000.0, 'metric'),
+}
+
+# Grams per millilitre, for converting between volume and mass. The
+# longest key found in an item name wins, so "brown sugar" beats "sugar".
+DENSITY_HINTS = {
+    'water': 1.0,
+    'milk': 1.03,
+    'buttermilk': 1.03,
+    'cream': 1.01,
+    'yogurt': 1.03,
+    'stock': 1.0,
+    'broth': 1.0,
+    'flour': 0.53,
+    'bread flour': 0.55,
+    'whole wheat flour': 0.51,
+    'cornstarch': 0.54,
+    'sugar': 0.85,
+    'brown sugar': 0.93,
+    'powdered sugar': 0.51,
+    'honey': 1.42,
+    'maple syrup': 1.32,
+    'butter': 0.96,
+    'oil': 0.92,
+    'salt': 1.22,
+    'baking soda': 0.93,
+    'baking powder': 0.9,
+    'cocoa': 0.42,
+    'rice': 0.85,
+    'oats': 0.41,
+    'cheese': 0.45,
+    'chocolate chips': 0.72,
+}
+
+# Units an amount is rewritten into, smallest first, per system and
+# dimension; each applies from the amount (in base units) next to it.
+DISPLAY_UNITS = {
+    ('us', VOLUME): [('tsp', 0.0), ('tbsp', 14.78676478125), ('cup', 59.147059125)],
+    ('metric', VOLUME): [('ml', 0.0), ('l', 1000.0)],
+    ('us', MASS): [('oz', 0.0), ('lb', 453.59237)],
+    ('metric', MASS): [('g', 0.0), ('kg', 1000.0)],
+}
+
+# Too imprecise to be rewritten into spoons by display_units
+KEEP_AS_WRITTEN = {'pinch', 'dash'}
+
+# Lookup arrays precomputed from UNIT_TABLE; index len(UNIT_TABLE) stands
+# for every count unit (and no unit at all).
+_UNITS = list(UNIT_TABLE)
+_UNIT_CODES = {unit: code for code, unit in enumerate(_UNITS)}
+_COUNT_CODE = len(_UNITS)
+_DIMENSIONS = [VOLUME, MASS]
+_LADDERS = list(DISPLAY_UNITS)
+
+if np is not None:
+    _FACTORS = np.array([UNIT_TABLE[unit][1] for unit in _UNITS] + [np.nan])
+    _DIMENSION_CODES = np.array([_DIMENSIONS.index(UNIT_TABLE[unit][0]) for unit in _UNITS] + [-1])
+    _LADDER_CODES = np.array([-1 if unit in KEEP_AS_WRITTEN
+                              else _LADDERS.index((UNIT_TABLE[unit][2], UNIT_TABLE[unit][0]))
+                              for unit in _UNITS] + [-1])
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Unit conversion requires numpy: pip install numpy")
+
+
+def unit_dimension(unit: Optional[str]) -> Optional[str]:
+    """VOLUME, MASS, or None for count units"""
+    entry = UNIT_TABLE.get(unit)
+    return entry[0] if entry else None
+
+
+def unit_system(unit: Optional[str]) -> Optional[str]:
+    entry = UNIT_TABLE.get(unit)
+    return entry[2] if entry else None
+
+
+@lru_cache(maxsize=4096)
+def density_hint(item: str) -> Optional[float]:
+    """Grams per millilitre for an ingredient name, if one of the hints matches"""
+    item = item.lower()
+    matches = [name for name in DENSITY_HINTS if name in item]
+    return DENSITY_HINTS[max(matches, key=len)] if matches else None
+
+
+def unit_codes(units: Sequence[Optional[str]]):
+    """Index of each unit into the precomputed factor and dimension arrays"""
+    _require_numpy()
+    return np.array([_UNIT_CODES.get(unit, _COUNT_CODE) for unit in units], dtype=int)
+
+
+def to_base_units(quantities, units: Sequence[Optional[str]]):
+    """Amounts in millilitres or grams, plus each row's dimension code
+    (0 volume, 1 mass, -1 count). Count rows come back as NaN.
+    """
+    _require_numpy()
+    codes = unit_codes(units)
+    return np.asarray(quantities, dtype=float) * _FACTORS[codes], _DIMENSION_CODES[codes]
+
+
+def convert_quantities(quantities, from_units: Sequence[Optional[str]], to_unit: str,
+                       items: Sequence[str] = None):
+    """Convert a batch of amounts to to_unit in one vectorized pass.
+
+    Volume and mass convert into each other when items are given and a
+    density hint matches the item. Amounts that cannot be converted come
+    back as NaN.
+    """
+    _require_numpy()
+    if to_unit not in UNIT_TABLE:
+        raise ValueError(f"Unknown unit: {to_unit}")
+    target_dimension = _DIMENSIONS.index(UNIT_TABLE[to_unit][0])
+    base, dimensions = to_base_units(quantities, from_units)
+
+    if items is not None:
+        densities = np.array([density_hint(item) or np.nan for item in items], dtype=float)
+        # grams = millilitres * density, millilitres = grams / density
+        base = np.where(dimensions == target_dimension, base,
+                        np.where(target_dimension == 1, base * densities, base / densities))
+    else:
+        base = np.where(dimensions == target_dimension, base, np.nan)
+
+    return base / UNIT_TABLE[to_unit][1]
+
+
+def convert(quantity: float, from_unit: str, to_unit: str, item: str = None) -> Optional[float]:
+    """Single-amount form of convert_quantities; None if it cannot be converted"""
+    result = convert_quantities([quantity], [from_unit], to_unit,
+                                [item] if item is not None else None)[0]
+    return None if np.isnan(result) else float(result)
+
+
+def display_units(quantities, units: Sequence[Optional[str]]) -> Tuple[List[Optional[str]], object]:
+    """The friendliest unit for each amount within its own measuring system.
+
+    48 tsp becomes 1 cup and 1500 g becomes 1.5 kg. Returns the chosen
+    units and the factor to multiply each amount by. Count units and
+    KEEP_AS_WRITTEN units stay as they are, with a factor of 1.
+    """
+    _require_numpy()
+    codes = unit_codes(units)
+    base = np.asarray(quantities, dtype=float) * _FACTORS[codes]
+    chosen = list(units)
+    factors = np.ones(len(chosen))
+    ladder_codes = _LADDER_CODES[codes]
+
+    for ladder_code, ladder in enumerate(DISPLAY_UNITS.values()):
+        in_ladder = ladder_codes == ladder_code
+        if not in_ladder.any():
+            continue
+        thresholds = np.array([threshold for _, threshold in ladder])
+        steps = np.clip(np.searchsorted(thresholds, base[in_ladder], side='right') - 1, 0, None)
+        ladder_units = [unit for unit, _ in ladder]
+        ladder_factors = np.array([UNIT_TABLE[unit][1] for unit in ladder_units])
+        factors[in_ladder] = _FACTORS[codes[in_ladder]] / ladder_factors[steps]
+        for row, step in zip(np.flatnonzero(in_ladder).tolist(), steps.tolist()):
+            chosen[row] = ladder_units[step]
+
+    return chosen, factors
+
+
+def merge_rows(rows: List[Dict]) -> List[Dict]:
+    """Add up parsed rows that name the same ingredient.
+
+    Volumes and masses of one item are totalled together in base units
+    (volume becomes mass when the item has a density hint and also appears
+    by weight); count units are totalled per unit. Each result has 'item',
+    'quantity' and 'unit' in the friendliest unit of the first row's
+    system, and the 'sources' it came from. Rows without a quantity are
+    listed once with quantity None.
+    """
+    _require_numpy()
+    if not rows:
+        return []
+    items = [(row.get('item') or '').strip().lower() for row in rows]
+    units = [row.get('unit') for row in rows]
+    quantities = np.array([np.nan if row.get('quantity') is None else row['quantity']
+                           for row in rows], dtype=float)
+    base, dimensions = to_base_units(quantities, units)
+
+    weighed = {item for item, dimension in zip(items, dimensions.tolist()) if dimension == 1}
+    densities = np.array([(density_hint(item) or np.nan) if item in weighed else np.nan
+                          for item in items], dtype=float)
+    as_mass = (dimensions == 0) & ~np.isnan(densities)
+    base = np.where(as_mass, base * densities, base)
+    dimensions = np.where(as_mass, 1, dimensions)
+    # Count rows add up their own quantities
+    base = np.where(dimensions == -1, quantities, base)
+
+    groups: Dict[tuple, int] = {}
+    keys = []
+    for item, unit, dimension, quantity in zip(items, units, dimensions.tolist(), quantities.tolist()):
+        if np.isnan(quantity):
+            key = (item, None, None)
+        elif dimension == -1:
+            key = (item, 'count', unit)
+        else:
+            key = (item, _DIMENSIONS[dimension], None)
+        keys.append(groups.setdefault(key, len(groups)))
+    group_ids = np.array(keys, dtype=int)
+    totals = np.bincount(group_ids, weights=np.nan_to_num(base), minlength=len(groups))
+
+    first_rows: Dict[int, int] = {}
+    mixed_units: Set[int] = set()
+    sources: Dict[int, List] = {}
+    for index, group in enumerate(keys):
+        first = first_rows.setdefault(group, index)
+        if units[index] != units[first] or as_mass[index]:
+            mixed_units.add(group)
+        source = rows[index].get('source')
+        if source is not None and source not in sources.setdefault(group, []):
+            sources[group].append(source)
+
+    # Express each total in the unit all its rows share, or else the
+    # smallest unit of the first row's system, then let display_units pick
+    # the friendliest one for all of them at once
+    group_units = []
+    for group, (item, dimension, count_unit) in enumerate(groups):
+        first_unit = units[first_rows[group]]
+        if dimension in _DIMENSIONS:
+            if group in mixed_units:
+                system = unit_system(first_unit) or 'metric'
+                first_unit = DISPLAY_UNITS[(system, dimension)][0][0]
+            totals[group] /= UNIT_TABLE[first_unit][1]
+            group_units.append(first_unit)
+        else:
+            group_units.append(count_unit)
+    display, factors = display_units(totals, group_units)
+    totals = (totals * factors).tolist()
+
+    merged = []
+    for group, (item, dimension, _) in enumerate(groups):
+        merged.append({
+            'item': rows[first_rows[group]].get('item') or item,
+            'quantity': None if dimension is None else totals[group],
+            'unit': display[group],
+            'sources': sources.get(group, []),
+        })
+
+    return sorted(merged, key=lambda entry: entry['item'].lower())